@@ -0,0 +1,171 @@
+import hashlib
+import re
+import tracing
+
+# lambda to remove a user from a dataframe, takes the dataframe and current user as params
+remove_user = lambda df, current_user : df.drop(current_user['id'])
+
+# the regular expression for a valid pokedex password
+password_regex = re.compile("^(?!.*[,])(?=.*[A-Za-z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$")
+
+
+@tracing.traced('hashing')
+def hash_password(password):
+    '''
+    Hashes password using sha256
+    :param password: password to hash
+    :returns: hashed password
+    '''
+    # encode the password as bytes
+    password_bytes = password.encode('utf-8')
+    
+    # create a hash object with the password
+    hashed_obj = hashlib.sha256(password_bytes)
+    
+    # get the hexadecimal representation of the hash
+    hashed_password = hashed_obj.hexdigest()
+    
+    # return the now hashed password
+    return hashed_password
+    
+
+def check_user_exists(df, name):
+    '''
+    Checks if a user exists in a dataframe by checking
+    for the username
+    :param df: pandas dataframe
+    :param name: the name of the user you are searching for (str)
+    :returns: True if user is found, False if not (bool)
+    '''
+    # if the user is located in the dataframe
+    if len(df.index[df['username'] == name].tolist()) > 0: 
+        #return that the user is found
+        return True 
+    # if the user is not found
+    else: 
+        # return that the user was not found
+        return False 
+        
+
+def add_user(app, name, password):
+    '''
+    Adds a new user to the user store
+    :param app: instance of application
+    :param name: desired name for new user (str)
+    :param password: desired password for new user (str)
+    :returns: True if the user was added, False if another
+    user took the name first (bool)
+    '''
+    # hash the password
+    hashed_password = hash_password(password)
+    # add a new row of the new user's data, the empty party slots are filled with None
+    return app.store.commit('add', name, {
+        'username': name,
+        'password': hashed_password
+    })
+
+def rename_user(app, new_name):
+    '''
+    Function to rename the currently logged
+    in user.
+    :param app: instance of application
+    :param new_name: The new name for the user (str)
+    :returns: True if renamed, False if another user
+    took the name first (bool)
+    '''
+    #change the username of the current user to the new name
+    if not app.store.commit('update', app.current_user['name'], {'username': new_name}):
+        return False
+    
+    # change current_user data to contain new name
+    app.current_user['name'] = new_name 
+    return True
+
+def change_password(app, new_pass):
+    '''
+    Function to change the password of the current user.
+    :param app: instance of application
+    :param new_pass: the new password for the user (str)
+    :returns: none
+    '''
+    # hash the new password
+    hashed_new_pass = hash_password(new_pass)
+    # change the password of the current user to the new hashed password
+    app.store.commit('update', app.current_user['name'], {'password': hashed_new_pass})
+    
+    return
+
+def replace_pokemon(app, pokemon, slot):
+    '''
+    Function to replace a party member of the current user.
+    :param app: instance of application
+    :param pokemon: the pokemon to add to the party (str)
+    :param slot: the party slot to replace, from 1 to 6 (int)
+    :returns: True if the party was changed, False if the user no longer exists, e.g. renamed or deleted by another copy (bool)
+    '''
+    # locate the selected slot of the current user and set it equal to the pokemon to add
+    return app.store.commit('update', app.current_user['name'], {'Pokemon'+str(slot): pokemon})
+
+def login(app, username, password):
+    '''
+    Attempts to login to a users account.
+    :param app: instance of application
+    :param username: the name of the user to log in (str)
+    :param password: the attempted password of the user (str)
+    :returns: True if successful and False if not (bool), this will
+    also set the global dictionary current_user's "name" and "id"
+    keys to the value of the username and the row of the users data on the
+    dataframe.
+    '''
+    # get the row in the dataframe of the user attempting to sign in from the username index, instead of searching every row
+    row = app.store.row(username)
+
+    # if the user does not exist
+    if row is None: 
+        # return that the login failed
+        return False 
+    
+    # if the password matches
+    if hash_password(password) == app.user_data.loc[row, 'password']: 
+        # set current users name to the username
+        app.current_user['name'] = username 
+        
+        # set the current users ID to the row the user was found on in the dataframe
+        app.current_user['id'] = row 
+        
+        # return that the login was successful
+        return True 
+        
+    # if failed: 
+    else: 
+        # return that the credentials did not match a user on the system
+        return False 
+        
+
+def logout(app):
+    '''
+    Logs out of the current users
+    account, setting the current user values
+    of "name" and "id" to None.
+    :param app: MainApplication class
+    :returns: None
+    '''
+    # set the current_user data back to default (None)
+    app.current_user = {
+        'name': None,
+        'id' : None
+    } 
+    return
+
+def delete_user(app):
+    '''
+    Deletes the user given in the parameters
+    from the user store
+    :param app: instance of application
+    :returns: none
+    '''
+    # removes the current user from the store, deleting them
+    app.store.commit('delete', app.current_user['name'])
+
+    # logout of the user's account to finalise this
+    logout(app)
@@ -0,0 +1,184 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+import datasource
+from userstore import UserStore, PARTY_COLUMNS
+
+
+def fetch_species_names(api_url=None):
+    '''
+    Fetches every pokemon and species name pokeapi recognises, which are the names a party may hold
+    :param api_url: the base url of pokeapi, defaults to the one in use (str)
+    :returns: set of names (str)
+    '''
+    api_url = api_url or datasource.API_URL
+    names = set()
+    for resource in ['pokemon', 'pokemon-species']:
+        response = requests.get(api_url+resource+'?limit=100000')
+        response.raise_for_status()
+        names.update(entry['name'] for entry in response.json()['results'])
+    return names
+
+
+def load_species_names(path):
+    '''
+    Loads the names a party may hold from a file, for running without network access
+    :param path: text file with one name per line (str)
+    :returns: set of names (str)
+    '''
+    with open(path, encoding='utf-8') as file:
+        return {line.strip().lower() for line in file if line.strip()}
+
+
+def select_users(user_data, usernames=None, pattern=None):
+    '''
+    Finds the users matching a list of usernames or a regular expression, or every user if neither is given
+    :param user_data: pandas dataframe of user data
+    :param usernames: optional collection of usernames
+    :param pattern: optional regular expression a username must match from its start (str)
+    :returns: boolean series of the matching users
+    '''
+    selected = pd.Series(usernames is None and pattern is None, index=user_data.index)
+    if usernames is not None:
+        selected |= user_data['username'].isin(usernames)
+    if pattern is not None:
+        selected |= user_data['username'].str.match(pattern)
+    return selected
+
+
+def purge(user_data, selected):
+    '''
+    Deletes users
+    :param user_data: pandas dataframe of user data
+    :param selected: boolean series of the users to delete
+    :returns: the user data without them
+    '''
+    return user_data[~selected]
+
+
+def invalid_party_entries(user_data, species):
+    '''
+    Finds every party slot holding a name pokeapi does not recognise, checking all six columns at once
+    :param user_data: pandas dataframe of user data
+    :param species: set of recognised names
+    :returns: boolean dataframe of the party columns, True where the slot is invalid
+    '''
+    # check every slot as one flat array, empty slots are always valid
+    party = user_data[PARTY_COLUMNS].to_numpy(dtype=object).ravel()
+    valid = pd.Index(party).isin(list(species) + ['None'])
+    return pd.DataFrame(~valid.reshape(-1, len(PARTY_COLUMNS)), index=user_data.index, columns=PARTY_COLUMNS)
+
+
+def fix_parties(user_data, species):
+    '''
+    Empties every party slot holding a name pokeapi does not recognise
+    :param user_data: pandas dataframe of user data
+    :param species: set of recognised names
+    :returns: the user data with the invalid slots set to "None"
+    '''
+    user_data = user_data.copy()
+    user_data[PARTY_COLUMNS] = user_data[PARTY_COLUMNS].mask(invalid_party_entries(user_data, species), 'None')
+    return user_data
+
+
+def reset_parties(user_data, selected):
+    '''
+    Empties the whole party of some users
+    :param user_data: pandas dataframe of user data
+    :param selected: boolean series of the users whose parties are emptied
+    :returns: the updated user data
+    '''
+    user_data = user_data.copy()
+    user_data.loc[selected, PARTY_COLUMNS] = 'None'
+    return user_data
+
+
+def diff(before, after):
+    '''
+    Finds what a batch of operations changed
+    :param before: pandas dataframe of user data before the operations
+    :param after: pandas dataframe of user data after the operations, with the same row labels for the remaining users
+    :returns: tuple of the deleted usernames (list) and a dataframe of every changed cell with columns
+    "username", "column", "before" and "after"
+    '''
+    # find the deleted users
+    removed = before.loc[~before.index.isin(after.index), 'username'].tolist()
+
+    # compare the remaining users cell by cell
+    old = before.loc[after.index, after.columns].to_numpy(dtype=object)
+    new = after.to_numpy(dtype=object)
+    rows, columns = np.nonzero(old != new)
+    changes = pd.DataFrame({
+        'username': before['username'].to_numpy(dtype=object)[before.index.get_indexer(after.index[rows])],
+        'column': after.columns.to_numpy()[columns],
+        'before': old[rows, columns],
+        'after': new[rows, columns]
+    })
+    return removed, changes
+
+
+def print_report(removed, changes, limit=20):
+    '''
+    Prints a summary of what a batch of operations changed
+    :param removed: the deleted usernames (list)
+    :param changes: dataframe of every changed cell, see diff
+    :param limit: the most deletions and changes listed (int)
+    :returns: None
+    '''
+    print(f'{len(removed)} users deleted, {len(changes)} cells changed across {changes["username"].nunique()} users')
+    for username in removed[:limit]:
+        print(f'  - {username}')
+    for change in changes.head(limit).itertuples():
+        print(f'  ~ {change.username} {change.column}: {change.before} -> {change.after}')
+    if len(removed) > limit or len(changes) > limit:
+        print('  ...')
+
+
+if __name__ == "__main__":
+    # read the command line options
+    parser = argparse.ArgumentParser(description='Apply admin operations to every account at once, saving once at the end.')
+    parser.add_argument('--purge', metavar='FILE', help='delete the users listed in a file, one username per line')
+    parser.add_argument('--purge-pattern', metavar='REGEX', help='delete the users whose username matches a regular expression')
+    parser.add_argument('--fix-parties', action='store_true', help='empty party slots holding names pokeapi does not recognise')
+    parser.add_argument('--species-file', help='file of recognised names, one per line, instead of fetching them from pokeapi')
+    parser.add_argument('--reset-parties', nargs='?', const='', metavar='REGEX', help='empty the parties of users matching a regular expression, or every user')
+    parser.add_argument('--dry-run', action='store_true', help='report the changes without saving them')
+    parser.add_argument('--report', metavar='FILE', help='csv to write every changed cell to')
+    args = parser.parse_args()
+
+    # read the operations' inputs before keeping other writers out
+    usernames = species = None
+    if args.purge:
+        with open(args.purge, encoding='utf-8') as file:
+            usernames = {line.strip() for line in file if line.strip()}
+    if args.fix_parties:
+        species = load_species_names(args.species_file) if args.species_file else fetch_species_names()
+
+    # retrieve user data from the csv and its journal, keeping other writers out until every change is saved
+    store = UserStore('UserData.csv')
+    with store.exclusive():
+        before = store.user_data
+        user_data = before
+
+        # apply each operation in turn
+        if args.purge or args.purge_pattern:
+            user_data = purge(user_data, select_users(user_data, usernames, args.purge_pattern))
+        if args.fix_parties:
+            user_data = fix_parties(user_data, species)
+        if args.reset_parties is not None:
+            user_data = reset_parties(user_data, select_users(user_data, pattern=args.reset_parties or None))
+
+        # report what changed
+        removed, changes = diff(before, user_data)
+        print_report(removed, changes)
+        if args.report:
+            pd.concat([pd.DataFrame({'username': removed, 'column': 'deleted'}), changes]).to_csv(args.report, index=False)
+
+        # save every change at once
+        if args.dry_run:
+            print('Dry run, nothing was saved')
+        elif removed or len(changes):
+            store.compact(user_data)
@@ -0,0 +1,229 @@
+import os
+import time
+import tkinter as tk
+from collections import OrderedDict
+
+import requests
+
+import datasource
+
+# whether the search and party pages show animated sprites, set the POKEDEX_ANIMATE environment variable to 1 to turn them on
+enabled = os.environ.get('POKEDEX_ANIMATE') == '1'
+
+# the url the animated sprite of each pokemon is found under as "<id>.gif", set the POKEDEX_ANIMATED_URL
+# environment variable to use another server
+ANIMATED_URL = os.environ.get('POKEDEX_ANIMATED_URL', datasource.SPRITE_URL + 'versions/generation-v/black-white/animated/')
+
+# the delay in milliseconds used for frames that ask for less than MIN_DELAY, the same as web browsers
+DEFAULT_DELAY = 100
+MIN_DELAY = 20
+
+# the milliseconds between checks for hidden animations being shown again
+HIDDEN_POLL = 250
+
+
+def gif_delays(data):
+    '''
+    Reads the delay of each frame of a gif, which tkinter does not expose
+    :param data: the gif (bytes)
+    :returns: list of the delay of each frame in milliseconds (int)
+    '''
+    # skip the header, and the global colour table if there is one
+    position = 13
+    if data[10] & 0x80:
+        position += 3 * 2 ** ((data[10] & 0x07) + 1)
+
+    delays, delay = [], DEFAULT_DELAY
+    while position < len(data):
+        block = data[position]
+
+        # a graphic control extension holds the delay of the next frame in hundredths of a second
+        if block == 0x21:
+            if data[position + 1] == 0xF9:
+                delay = int.from_bytes(data[position + 4:position + 6], 'little') * 10
+            position += 2
+        # an image is a frame, skip its descriptor, local colour table and minimum code size
+        elif block == 0x2C:
+            delays.append(delay if delay >= MIN_DELAY else DEFAULT_DELAY)
+            delay = DEFAULT_DELAY
+            packed = data[position + 9]
+            position += 11 + (3 * 2 ** ((packed & 0x07) + 1) if packed & 0x80 else 0)
+        # anything else is the end of the file
+        else:
+            break
+
+        # skip the data sub-blocks of the extension or image
+        while position < len(data) and data[position]:
+            position += data[position] + 1
+        position += 1
+    return delays
+
+
+def download_gif(pokedex_id, animated_url=None):
+    '''
+    Downloads the animated sprite of a pokemon
+    :param pokedex_id: the pokedex ID (int)
+    :param animated_url: the url the animated sprites are found under, defaults to the one in use (str)
+    :returns: the gif (bytes), or None if the pokemon has no animated sprite
+    '''
+    response = requests.get(f'{animated_url or ANIMATED_URL}{pokedex_id}.gif')
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.content
+
+
+class FrameCache:
+    '''class for the decoded frames of every animated sprite shown, shared by every page and holding a bounded number of frames'''
+    def __init__(self, master, max_frames=600):
+        '''
+        initialises the frame cache
+        :param self: instance of the frame cache
+        :param master: the tkinter window the frames belong to
+        :param max_frames: the most frames held, the least recently used animations are dropped past this (int)
+        '''
+        self.master = master
+        self.max_frames = max_frames
+
+        # stores the frames and delays of each animation, most recently used last
+        self.animations = OrderedDict()
+        self.frames = 0
+
+    def __contains__(self, key):
+        return key in self.animations
+
+    def get(self, key):
+        '''
+        Gets a decoded animation
+        :param self: instance of the frame cache
+        :param key: the key of the animation, e.g. the pokedex ID
+        :returns: tuple of the frames (list of tk.PhotoImage) and delays (list of int), or None if it is not held
+        '''
+        if key not in self.animations:
+            return None
+        self.animations.move_to_end(key)
+        return self.animations[key]
+
+    def put(self, key, data):
+        '''
+        Decodes every frame of a gif once and holds them
+        :param self: instance of the frame cache
+        :param key: the key of the animation, e.g. the pokedex ID
+        :param data: the gif (bytes)
+        :returns: tuple of the frames (list of tk.PhotoImage) and delays (list of int)
+        '''
+        # decode frames until tkinter reports there are no more
+        frames = []
+        while True:
+            try:
+                frames.append(tk.PhotoImage(master=self.master, data=data, format=f'gif -index {len(frames)}'))
+            except tk.TclError:
+                break
+
+        # pad the delays in case a frame had no graphic control extension
+        delays = gif_delays(data)[:len(frames)]
+        delays += [DEFAULT_DELAY] * (len(frames) - len(delays))
+
+        # hold the animation, dropping the least recently used ones once there are too many frames
+        self.animations[key] = (frames, delays)
+        self.frames += len(frames)
+        while self.frames > self.max_frames and len(self.animations) > 1:
+            dropped, _ = self.animations.popitem(last=False)[1]
+            self.frames -= len(dropped)
+        return frames, delays
+
+
+class Animator:
+    '''class for playing every animation shown on a single timer, pausing those whose label is hidden and
+    forgetting those whose label has been destroyed'''
+    def __init__(self, master):
+        '''
+        initialises the animator
+        :param self: instance of the animator
+        :param master: the tkinter window the timer runs on
+        '''
+        self.master = master
+
+        # stores the frames, delays, current frame and time the next frame is due of each label playing
+        self.playing = {}
+
+        # stores the scheduled after() call, None when nothing is playing
+        self.job = None
+
+    def play(self, label, frames, delays):
+        '''
+        Starts playing an animation on a label, replacing any it was playing
+        :param self: instance of the animator
+        :param label: the label to show the frames on
+        :param frames: the decoded frames (list of tk.PhotoImage)
+        :param delays: the delay of each frame in milliseconds (list of int)
+        :returns: None
+        '''
+        # forget labels destroyed since the last tick before touching any, a second search destroys the first one's label
+        self.prune()
+        if not frames or not label.winfo_exists():
+            return
+        label.configure(image=frames[0])
+        if len(frames) > 1:
+            self.playing[label] = [frames, delays, 0, self.now() + delays[0]]
+            self.schedule()
+
+    def prune(self):
+        '''
+        Stops playing on every label that has been destroyed, e.g. by clear_window
+        :param self: instance of the animator
+        :returns: None
+        '''
+        for label in [label for label in self.playing if not label.winfo_exists()]:
+            del self.playing[label]
+
+    def now(self):
+        '''
+        Gets the current time in milliseconds
+        :param self: instance of the animator
+        :returns: int
+        '''
+        return time.monotonic_ns() // 1000000
+
+    def schedule(self):
+        '''
+        Schedules the next tick for when the soonest frame is due, or a slow check if every animation is hidden
+        :param self: instance of the animator
+        :returns: None
+        '''
+        if self.job is not None:
+            self.master.after_cancel(self.job)
+            self.job = None
+        # labels destroyed since the last tick can no longer be asked whether they are shown
+        self.prune()
+        if not self.playing:
+            return
+
+        # wake for the soonest frame of the labels shown
+        due = [state[3] for label, state in self.playing.items() if label.winfo_viewable()]
+        wait = max(0, min(due) - self.now()) if due else HIDDEN_POLL
+        self.job = self.master.after(wait, self.tick)
+
+    def tick(self):
+        '''
+        Advances every shown animation whose next frame is due, then schedules the next tick
+        :param self: instance of the animator
+        :returns: None
+        '''
+        self.job = None
+        self.prune()
+        now = self.now()
+
+        for label, state in self.playing.items():
+            frames, delays, index, due = state
+
+            # hidden labels keep their frame until they are shown again
+            if due > now or not label.winfo_viewable():
+                continue
+
+            # show the next frame, and find when the one after it is due
+            index = (index + 1) % len(frames)
+            label.configure(image=frames[index])
+            state[2], state[3] = index, now + delays[index]
+
+        self.schedule()
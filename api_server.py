@@ -0,0 +1,389 @@
+import argparse
+import json
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+import accounts
+import datasource
+from userstore import UserStore, ConflictError, PARTY_COLUMNS
+
+# the seconds a session lasts from logging in
+SESSION_SECONDS = 60 * 60 * 24
+
+
+class PooledHTTPServer(HTTPServer):
+    '''class for an http server that handles requests on a fixed pool of worker threads'''
+    def __init__(self, address, handler, workers=32):
+        '''
+        initialises the server
+        :param self: instance of the server
+        :param address: tuple of the host and port to listen on
+        :param handler: the request handler class
+        :param workers: the number of requests handled at once (int)
+        '''
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='api')
+
+    def process_request(self, request, client_address):
+        '''
+        Hands a connection to a worker instead of handling it on the listening thread
+        '''
+        self.pool.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        '''
+        Handles a connection on a worker thread, the same way socketserver's threading mixin does
+        '''
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        '''
+        Stops the server and waits for its workers to finish
+        '''
+        super().server_close()
+        self.pool.shutdown()
+
+
+class Account:
+    '''class for a user of the api, standing in for the application in the account functions'''
+    def __init__(self, store, username=None):
+        '''
+        initialises the account
+        :param self: instance of the account
+        :param store: the shared user data (UserStore)
+        :param username: the logged in user, whose row is looked up (str)
+        '''
+        # stores the shared user data
+        self.store = store
+
+        # stores the logged in user, like the application does
+        self.current_user = {'name': None, 'id': None}
+        if store.row(username) is not None:
+            self.current_user = {'name': username, 'id': store.row(username)}
+
+    @property
+    def user_data(self):
+        '''
+        gets the shared user data
+        :param self: instance of the account
+        :returns: pandas dataframe
+        '''
+        return self.store.user_data
+
+
+@lru_cache(maxsize=2048)
+def search(pokemon):
+    '''
+    Fetches a pokemon and its pokedex entry, keeping the most recent searches so repeats cost nothing
+    :param pokemon: the name or pokedex ID of the pokemon (str)
+    :returns: the record (PokemonRecord)
+    '''
+    record, = datasource.fetch_records([pokemon], flavor_text=True)
+    return record
+
+
+class APIError(Exception):
+    '''class for an error sent back to the client with an http status'''
+    def __init__(self, status, message):
+        '''
+        initialises the error
+        :param self: instance of the error
+        :param status: the http status code (int)
+        :param message: the message shown to the client (str)
+        '''
+        super().__init__(message)
+        self.status = status
+
+
+class PokedexAPI:
+    '''class for a json http api serving the pokedex's accounts, parties and search without tkinter'''
+    def __init__(self, store, host='127.0.0.1', port=8000, workers=32):
+        '''
+        initialises the api and starts serving in the background
+        :param self: instance of the api
+        :param store: the user data shared by every request, and with any copies of the application (UserStore)
+        :param host: the address to listen on (str)
+        :param port: the port to listen on, 0 picks any free port (int)
+        :param workers: the number of requests handled at once (int)
+        '''
+        # stores the user data shared by every request
+        self.store = store
+
+        # stores the username, row label and expiry time of each session token, the row label stays with the user
+        # through renames and is never reused, so it tells a user apart from a later account of the same name
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+
+        # stores when expired sessions are next cleared out
+        self.next_expiry = time.monotonic() + SESSION_SECONDS
+
+        # stores each route as (method, path pattern, handler)
+        self.routes = [
+            ('POST', re.compile(r'/users'), self.register),
+            ('POST', re.compile(r'/sessions'), self.login),
+            ('DELETE', re.compile(r'/sessions'), self.logout),
+            ('GET', re.compile(r'/party'), self.get_party),
+            ('PUT', re.compile(r'/party/([1-6])'), self.set_party_member),
+            ('GET', re.compile(r'/pokemon/([^/]+)'), self.get_pokemon)
+        ]
+
+        # start the server
+        self.server = PooledHTTPServer((host, port), self.handler(), workers)
+        self.url = f'http://{host}:{self.server.server_address[1]}'
+
+        # run the server in the background
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def account(self, token):
+        '''
+        Gets the account logged into with a session token
+        :param self: instance of the api
+        :param token: the session token (str)
+        :returns: the account (Account)
+        '''
+        # see changes made by other copies first, which only costs a stat of the journal when there are none
+        self.store.catch_up()
+        with self.sessions_lock:
+            username, row, expires = self.sessions.get(token, (None, None, 0))
+
+        # a session ends when it expires, or once its user is renamed or deleted, even if the name is registered again
+        if time.monotonic() >= expires or self.store.row(username) != row:
+            with self.sessions_lock:
+                self.sessions.pop(token, None)
+            raise APIError(401, 'Please log in.')
+        return Account(self.store, username)
+
+    def register(self, body, token):
+        '''
+        Creates an account, with the same checks as the register page
+        :param self: instance of the api
+        :param body: dictionary with "username" and "password"
+        :param token: unused
+        :returns: tuple of the status and response
+        '''
+        username, password = str(body.get('username', '')), str(body.get('password', ''))
+        if not username or not password:
+            raise APIError(400, 'Please make sure to fill in all of the required information.')
+        if not accounts.password_regex.fullmatch(password):
+            raise APIError(400, 'For security reasons, passwords require at least 8 characters, including a number and a special character. No commas may be used.')
+
+        # adding fails if the name is taken, even by another copy of the application at the same moment
+        if not accounts.add_user(Account(self.store), username, password):
+            raise APIError(409, 'A user with this information already exists on the system, try logging in.')
+        return 201, {'username': username}
+
+    def login(self, body, token):
+        '''
+        Logs into an account, starting a session
+        :param self: instance of the api
+        :param body: dictionary with "username" and "password"
+        :param token: unused
+        :returns: tuple of the status and response, which holds the session token
+        '''
+        with self.store.lock:
+            self.store.catch_up()
+            account = Account(self.store)
+            if not accounts.login(account, str(body.get('username', '')), str(body.get('password', ''))):
+                raise APIError(401, 'Username or password is incorrect.')
+
+        # start the session, clearing out expired ones now and then so they never build up
+        token = secrets.token_urlsafe(24)
+        now = time.monotonic()
+        with self.sessions_lock:
+            if now >= self.next_expiry:
+                self.sessions = {key: session for key, session in self.sessions.items() if session[2] > now}
+                self.next_expiry = now + SESSION_SECONDS
+            self.sessions[token] = (account.current_user['name'], account.current_user['id'], now + SESSION_SECONDS)
+        return 200, {'token': token}
+
+    def logout(self, body, token):
+        '''
+        Ends a session
+        :param self: instance of the api
+        :param body: unused
+        :param token: the session token (str)
+        :returns: tuple of the status and response
+        '''
+        with self.sessions_lock:
+            self.sessions.pop(token, None)
+        return 200, {}
+
+    def get_party(self, body, token):
+        '''
+        Gets the party of the logged in user
+        :param self: instance of the api
+        :param body: unused
+        :param token: the session token (str)
+        :returns: tuple of the status and response, which lists the pokemon in each slot or null if it is empty
+        '''
+        with self.store.lock:
+            account = self.account(token)
+            party = account.user_data.loc[account.current_user['id'], PARTY_COLUMNS].tolist()
+        return 200, {'party': [None if pokemon == 'None' else pokemon for pokemon in party]}
+
+    def set_party_member(self, body, token, slot):
+        '''
+        Replaces a party member of the logged in user, storing the species name like the search page does
+        :param self: instance of the api
+        :param body: dictionary with "pokemon", its name or pokedex ID
+        :param token: the session token (str)
+        :param slot: the party slot, from 1 to 6 (str)
+        :returns: tuple of the status and response
+        '''
+        # check the pokemon exists before taking the lock, so the lookup never holds up other requests
+        pokemon = body.get('pokemon')
+        if pokemon is None or not str(pokemon).strip():
+            raise APIError(400, 'Please choose a pokemon.')
+        pokemon = self.find(str(pokemon).strip()).species
+
+        # changes to different users are made in parallel, see UserStore, the user may be renamed or deleted
+        # by another copy after the session was checked, which ends the session like it would have
+        if not accounts.replace_pokemon(self.account(token), pokemon, int(slot)):
+            with self.sessions_lock:
+                self.sessions.pop(token, None)
+            raise APIError(401, 'Please log in.')
+        return 200, {'slot': int(slot), 'pokemon': pokemon}
+
+    def get_pokemon(self, body, token, pokemon):
+        '''
+        Gets the details of a pokemon shown by the search page
+        :param self: instance of the api
+        :param body: unused
+        :param token: unused
+        :param pokemon: the name or pokedex ID of the pokemon (str)
+        :returns: tuple of the status and response
+        '''
+        record = self.find(pokemon)
+        return 200, {field: getattr(record, field) for field in record.__slots__}
+
+    def find(self, pokemon):
+        '''
+        Looks up a pokemon from the shared search cache
+        :param self: instance of the api
+        :param pokemon: the name or pokedex ID of the pokemon (str)
+        :returns: the record (PokemonRecord)
+        '''
+        try:
+            return search(pokemon.lower())
+        except (requests.HTTPError, ValueError):
+            raise APIError(404, f'No pokemon called {pokemon} was found.')
+
+    def handler(self):
+        '''
+        Creates the request handler class used by the server
+        :param self: instance of the api
+        :returns: request handler class
+        '''
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            '''class for handling a single request to the api'''
+            def do_GET(self):
+                self.dispatch('GET')
+
+            def do_POST(self):
+                self.dispatch('POST')
+
+            def do_PUT(self):
+                self.dispatch('PUT')
+
+            def do_DELETE(self):
+                self.dispatch('DELETE')
+
+            def dispatch(self, method):
+                '''
+                Runs the route matching the request and sends its response as json
+                :param self: instance of the request handler
+                :param method: the http method (str)
+                :returns: None
+                '''
+                # read the session token
+                token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+
+                try:
+                    # read the json body
+                    try:
+                        length = int(self.headers.get('Content-Length', 0))
+                        if length < 0:
+                            raise ValueError(length)
+                    except ValueError:
+                        raise APIError(400, 'The Content-Length header is not a valid length.')
+                    try:
+                        body = json.loads(self.rfile.read(length)) if length else {}
+                    except ValueError:
+                        raise APIError(400, 'The request body is not valid json.')
+                    if not isinstance(body, dict):
+                        raise APIError(400, 'The request body must be a json object.')
+
+                    # find the route and run it
+                    for route_method, pattern, route in api.routes:
+                        found = pattern.fullmatch(self.path.split('?')[0])
+                        if found is not None and route_method == method:
+                            status, response = route(body, token, *found.groups())
+                            break
+                    else:
+                        raise APIError(404, 'Not found.')
+                except APIError as error:
+                    status, response = error.status, {'error': str(error)}
+                except requests.RequestException:
+                    status, response = 502, {'error': 'Could not reach pokeapi.'}
+                except ConflictError:
+                    status, response = 409, {'error': 'Someone else kept changing this account at the same time, please try again.'}
+                except Exception:
+                    # answer anything unexpected rather than dropping the connection, and log it like the server would
+                    api.server.handle_error(self.request, self.client_address)
+                    status, response = 500, {'error': 'Something went wrong.'}
+
+                content = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                '''
+                Silences the log line printed for each request
+                '''
+                return
+
+        return Handler
+
+    def close(self):
+        '''
+        Stops the api, every change is already saved
+        :param self: instance of the api
+        :returns: None
+        '''
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    # read the command line options
+    parser = argparse.ArgumentParser(description='Serve the pokedex as a json api.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=32, help='number of requests handled at once')
+    args = parser.parse_args()
+
+    # serve the user data and every change journalled since it was saved until stopped
+    api = PokedexAPI(UserStore('UserData.csv'), args.host, args.port, args.workers)
+    print(f'Serving the pokedex api at {api.url}')
+    try:
+        api.thread.join()
+    except KeyboardInterrupt:
+        api.close()
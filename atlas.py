@@ -0,0 +1,165 @@
+import argparse
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import datasource
+
+# the file every front sprite is packed into, build it with "python atlas.py"
+ATLAS_FILE = 'sprites.atlas'
+
+# the display sizes sprites are precomputed at, in pixels along the longest side, build them with "python thumbnails.py",
+# the medium size is the front sprite as pokeapi serves it and is kept in the atlas above
+SIZES = {'small': 48, 'medium': 96, 'large': 192, 'huge': 384}
+
+# the start of the file, the format marker and the number of index entries
+HEADER = struct.Struct('<4sI')
+MAGIC = b'PKSA'
+
+# each index entry, the offset and length of a sprite in the file, one for every pokedex ID from 0 so finding
+# a sprite is a single unpack at a known position, a length of 0 marks a pokemon without a sprite
+ENTRY = struct.Struct('<II')
+
+
+def atlas_path(size):
+    '''
+    Gets the atlas file of a display size
+    :param size: one of SIZES (str)
+    :returns: the path (str)
+    '''
+    return ATLAS_FILE if size == 'medium' else f'sprites-{size}.atlas'
+
+
+def size_for(pixels):
+    '''
+    Picks the largest display size that fits in a space
+    :param pixels: the most pixels a sprite may take up along its longest side (int)
+    :returns: one of SIZES, the smallest if none fit (str)
+    '''
+    return max((size for size in SIZES if SIZES[size] <= pixels), key=SIZES.get, default='small')
+
+
+def download_sprites(ids, sprite_url=None, workers=16):
+    '''
+    Downloads the front sprite or artwork of many pokemon, several at a time
+    :param ids: the pokedex IDs (int)
+    :param sprite_url: the url the sprites are found under as "<id>.png", defaults to the front sprites in use (str)
+    :param workers: the number of sprites downloaded at once (int)
+    :returns: dictionary of pokedex ID to png (bytes), leaving out any pokemon without a sprite
+    '''
+    sprite_url = sprite_url or datasource.SPRITE_URL
+    session = requests.Session()
+
+    # download a sprite, or None if there is not one
+    def download(pokedex_id):
+        response = session.get(f'{sprite_url}{pokedex_id}.png')
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    with ThreadPoolExecutor(workers) as pool:
+        sprites = dict(zip(ids, pool.map(download, ids)))
+    return {pokedex_id: sprite for pokedex_id, sprite in sprites.items() if sprite is not None}
+
+
+def build_atlas(sprites, path=ATLAS_FILE):
+    '''
+    Packs sprites into one file, the header and index followed by every sprite one after another
+    :param sprites: dictionary of pokedex ID to png (bytes)
+    :param path: the file to write (str)
+    :returns: None
+    '''
+    # index every ID up to the largest, so the entry of any ID is found by its position
+    count = max(sprites, default=0) + 1
+    offset = HEADER.size + count * ENTRY.size
+    index = bytearray(count * ENTRY.size)
+    for pokedex_id in sorted(sprites):
+        ENTRY.pack_into(index, pokedex_id * ENTRY.size, offset, len(sprites[pokedex_id]))
+        offset += len(sprites[pokedex_id])
+
+    # write beside the old atlas and swap it in, so a reader never sees half a file
+    with open(path + '.tmp', 'wb') as file:
+        file.write(HEADER.pack(MAGIC, count))
+        file.write(index)
+        for pokedex_id in sorted(sprites):
+            file.write(sprites[pokedex_id])
+    os.replace(path + '.tmp', path)
+
+
+class SpriteAtlas:
+    '''class for reading sprites out of an atlas file, which is memory mapped so only the sprites used are read from disk'''
+    def __init__(self, path=ATLAS_FILE):
+        '''
+        initialises the atlas, opening and mapping the file
+        :param self: instance of the atlas
+        :param path: the atlas file (str)
+        '''
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # check the file is an atlas, and read the number of index entries
+        magic, self.count = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError(f'{path} is not a sprite atlas')
+
+        # stores a view of the whole file, which sprites are sliced from without copying
+        self.view = memoryview(self.map)
+
+    def get(self, pokedex_id):
+        '''
+        Finds the sprite of a pokemon
+        :param self: instance of the atlas
+        :param pokedex_id: the pokedex ID (int)
+        :returns: the png as a view into the file (memoryview), or None if the atlas does not hold it
+        '''
+        if not 0 <= pokedex_id < self.count:
+            return None
+        offset, length = ENTRY.unpack_from(self.map, HEADER.size + pokedex_id * ENTRY.size)
+        return self.view[offset:offset + length] if length else None
+
+    def close(self):
+        '''
+        Closes the atlas file, no sprite from it may be used afterwards
+        :param self: instance of the atlas
+        :returns: None
+        '''
+        self.view.release()
+        self.map.close()
+
+
+def open_atlas(path=ATLAS_FILE):
+    '''
+    Opens the sprite atlas if it has been built
+    :param path: the atlas file (str)
+    :returns: the atlas (SpriteAtlas), or None if there is not a valid one
+    '''
+    try:
+        return SpriteAtlas(path)
+    except (OSError, ValueError):
+        return None
+
+
+def open_atlases():
+    '''
+    Opens the atlas of every display size that has been built
+    :returns: dictionary of size to atlas (SpriteAtlas), or None for each size not built
+    '''
+    return {size: open_atlas(atlas_path(size)) for size in SIZES}
+
+
+if __name__ == "__main__":
+    # read the command line options
+    parser = argparse.ArgumentParser(description='Download every front sprite and pack them into one memory mapped file.')
+    parser.add_argument('--max-id', type=int, default=1025, help='the largest pokedex ID to download')
+    parser.add_argument('--workers', type=int, default=16, help='sprites downloaded at once')
+    parser.add_argument('--output', default=ATLAS_FILE, help='atlas file to write')
+    args = parser.parse_args()
+
+    sprites = download_sprites(range(1, args.max_id + 1), workers=args.workers)
+    build_atlas(sprites, args.output)
+    print(f'{len(sprites)} sprites packed into {args.output}, {os.path.getsize(args.output)} bytes')
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import accounts
+import atlas
+import datasource
+import main
+from benchmarks.loadgen import make_users
+from benchmarks.stub_server import StubPokeAPI
+from userstore import UserStore
+
+# the folder holding main.py and the cursor file the application loads
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize(times):
+    '''
+    Summarizes a list of timings
+    :param times: list of durations in seconds
+    :returns: dictionary of the run count and the mean, median, 95th percentile and minimum in milliseconds
+    '''
+    # sort the timings to find the percentiles
+    times = sorted(times)
+    return {
+        'runs': len(times),
+        'mean_ms': statistics.fmean(times) * 1000,
+        'median_ms': statistics.median(times) * 1000,
+        'p95_ms': times[min(len(times) - 1, int(len(times) * 0.95))] * 1000,
+        'min_ms': times[0] * 1000
+    }
+
+
+def measure(function, repeat, setup=None):
+    '''
+    Times a function over several runs
+    :param function: the function to time, called with no arguments
+    :param repeat: the number of timed runs (int)
+    :param setup: optional function called before each run, outside of the timing
+    :returns: the summary of the timings (dict)
+    '''
+    # stores the duration of each run
+    times = []
+
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return summarize(times)
+
+
+def start_display():
+    '''
+    Makes sure there is a display for tkinter, starting a virtual Xvfb display when running headless
+    :returns: the Xvfb process if one was started, otherwise None
+    '''
+    # nothing is needed if a display already exists or on windows and mac
+    if os.environ.get('DISPLAY') or sys.platform != 'linux' or shutil.which('Xvfb') is None:
+        return None
+
+    # start a virtual display and point tkinter at it
+    process = subprocess.Popen(['Xvfb', ':97', '-screen', '0', '1280x1024x24'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = ':97'
+    time.sleep(0.5)
+    return process
+
+
+def bench_accounts(results, sizes, repeat):
+    '''
+    Benchmarks the non gui account functions and saving
+    :param results: dictionary to add the results to
+    :param sizes: list of user counts to benchmark at
+    :param repeat: the number of timed runs of each benchmark (int)
+    :returns: None
+    '''
+    # time hashing a batch of passwords and report the throughput
+    start = time.perf_counter()
+    for number in range(20000):
+        accounts.hash_password(f'Password{number}!')
+    results['hash_password'] = {'hashes_per_second': 20000 / (time.perf_counter() - start)}
+
+    # for each number of users
+    for size in sizes:
+        # make the users and an application stand in holding them
+        users = make_users(size)
+        store = UserStore(f'UserData-{size}.csv', users)
+        app = SimpleNamespace(store=store, user_data=users, current_user={'name': None, 'id': None})
+
+        # look up the last user, the worst case for a scan
+        name = f'user{size - 1}'
+        results[f'check_user_exists[{size}]'] = measure(lambda: accounts.check_user_exists(users, name), repeat)
+        results[f'login[{size}]'] = measure(lambda: accounts.login(app, name, 'Password1!'), repeat)
+
+        # catching up with another copy costs a stat of the journal when nothing changed, and otherwise depends on the
+        # number of changes rather than the number of users
+        other = UserStore(f'UserData-{size}.csv', users.copy())
+        results[f'catch_up_idle[{size}]'] = measure(store.catch_up, repeat)
+        results[f'catch_up_100[{size}]'] = measure(store.catch_up, repeat, lambda: [
+            other.commit('update', f'user{number}', {'Pokemon1': f'pokemon-{number}'}) for number in range(100)])
+
+        # saving a change appends one line to the journal whatever the number of users, while compacting writes
+        # the whole csv, so fewer runs are used for large tables
+        results[f'commit[{size}]'] = measure(lambda: store.commit('update', name, {'Pokemon1': 'pikachu'}), repeat)
+        results[f'compact[{size}]'] = measure(store.compact, max(1, repeat // 10) if size >= 1000000 else repeat)
+
+
+def bench_gui(results, stub, repeat):
+    '''
+    Benchmarks the pages of the application against the stub server
+    :param results: dictionary to add the results to
+    :param stub: the running stub server (StubPokeAPI)
+    :param repeat: the number of timed runs of each benchmark (int)
+    :returns: None
+    '''
+    import tkinter as tk
+
+    # create the application with one logged in user who has a full party
+    try:
+        app = main.MainApplication(dataframe=make_users(1, party=[f'pokemon-{number}' for number in range(1, 7)]))
+    except tk.TclError as error:
+        results['gui'] = {'skipped': f'no display available: {error}'}
+        return
+    app.current_user = {'name': 'user0', 'id': 0}
+
+    # time searching for a pokemon, including drawing the result
+    app.search_page()
+    app.search_input.insert(0, '25')
+    results['single_search_pressed'] = measure(lambda: [app.single_search_pressed(), app.update()], repeat)
+
+    # subroutine to wait for the party fetched in the background to be drawn
+    def wait_for_party():
+        while app.party_refresh is not None:
+            app.update()
+
+    # time the first paint of the party page from an empty window, without a snapshot only the names are painted
+    results['party_page[no snapshot]'] = measure(lambda: [app.party_page(), app.update()], repeat,
+                                                 setup=lambda: [wait_for_party(), app.clear_window(), shutil.rmtree('snapshots', ignore_errors=True)])
+    results['party_page'] = measure(lambda: [app.party_page(), app.update()], repeat, setup=lambda: [wait_for_party(), app.clear_window()])
+
+    # time the whole party page, until the background fetch has been checked against the snapshot
+    results['party_page_refreshed'] = measure(lambda: [app.party_page(), wait_for_party()], repeat, setup=app.clear_window)
+
+    app.destroy()
+
+
+def bench_data_sources(results, stub, repeat):
+    '''
+    Benchmarks fetching a full party and a single search from each data source
+    :param results: dictionary to add the results to
+    :param stub: the running stub server (StubPokeAPI)
+    :param repeat: the number of timed runs of each benchmark (int)
+    :returns: None
+    '''
+    datasource.GRAPHQL_URL = stub.graphql_url
+    party = [f'pokemon-{number}' for number in range(1, 7)]
+
+    # time each data source, putting back the one in use afterwards
+    previous = datasource.DATA_SOURCE
+    for source in datasource.DATA_SOURCES:
+        datasource.set_data_source(source)
+        results[f'fetch_party[{source}]'] = measure(lambda: datasource.fetch_records(party), repeat)
+        results[f'fetch_search[{source}]'] = measure(lambda: datasource.fetch_records(['25'], flavor_text=True), repeat)
+    datasource.set_data_source(previous)
+
+
+def bench_sprites(results, stub, repeat):
+    '''
+    Benchmarks getting the six sprites of a party over http and from a sprite atlas
+    :param results: dictionary to add the results to
+    :param stub: the running stub server (StubPokeAPI)
+    :param repeat: the number of timed runs of each benchmark (int)
+    :returns: None
+    '''
+    import requests
+
+    # build an atlas of every sprite the stub serves
+    sprites = atlas.download_sprites(range(1, 152), stub.host + '/sprites/')
+    atlas.build_atlas(sprites)
+    sprite_atlas = atlas.open_atlas()
+
+    ids = range(1, 7)
+    results['sprites[http]'] = measure(lambda: [requests.get(f'{stub.host}/sprites/{pokedex_id}.png').content for pokedex_id in ids], repeat)
+    results['sprites[atlas]'] = measure(lambda: [bytes(sprite_atlas.get(pokedex_id)) for pokedex_id in ids], repeat)
+    results['atlas_open'] = measure(lambda: atlas.open_atlas().close(), repeat)
+    sprite_atlas.close()
+    os.remove(atlas.ATLAS_FILE)
+
+
+def compare(results, previous, threshold=1.2):
+    '''
+    Prints how each result changed from a previous run
+    :param results: the results of this run (dict)
+    :param previous: the results of the previous run (dict)
+    :param threshold: the slowdown ratio reported as a regression (float)
+    :returns: True if any benchmark regressed (bool)
+    '''
+    regressed = False
+
+    # for each benchmark in both runs
+    for name, result in results.items():
+        if name not in previous:
+            continue
+
+        # compare the median time, or the throughput for hashing
+        if 'median_ms' in result and 'median_ms' in previous[name]:
+            ratio = result['median_ms'] / max(previous[name]['median_ms'], 1e-9)
+        elif 'hashes_per_second' in result:
+            ratio = previous[name]['hashes_per_second'] / result['hashes_per_second']
+        else:
+            continue
+
+        # report the change, marking regressions
+        flag = 'REGRESSION' if ratio > threshold else ''
+        print(f'{name:32} {ratio:6.2f}x {flag}', file=sys.stderr)
+        regressed = regressed or ratio > threshold
+
+    return regressed
+
+
+if __name__ == "__main__":
+    # read the command line options
+    parser = argparse.ArgumentParser(description='Benchmark the pokedex against a local stub pokeapi.')
+    parser.add_argument('--output', help='file to write the json results to, defaults to stdout')
+    parser.add_argument('--compare', help='json results of a previous run to compare against')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs of each benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='user counts to benchmark at')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of latency the stub adds to each response')
+    args = parser.parse_args()
+
+    # stores every result
+    results = {}
+
+    # start a virtual display if needed, and the stub server with the api pointed at it
+    display = start_display()
+    stub = StubPokeAPI(delay=args.latency)
+    datasource.API_URL = stub.url
+
+    # run in a temporary folder so saving never touches the real user data
+    workdir = tempfile.mkdtemp()
+    shutil.copy(os.path.join(REPO, '132.cur'), workdir)
+    os.chdir(workdir)
+
+    try:
+        bench_gui(results, stub, args.repeat)
+        bench_data_sources(results, stub, args.repeat)
+        bench_sprites(results, stub, args.repeat)
+        bench_accounts(results, args.sizes, args.repeat)
+    finally:
+        stub.close()
+        os.chdir(REPO)
+        shutil.rmtree(workdir, ignore_errors=True)
+        if display is not None:
+            display.terminate()
+
+    # write the results with details of the machine they were measured on
+    report = json.dumps({
+        'meta': {'time': time.time(), 'python': platform.python_version(), 'platform': platform.platform()},
+        'results': results
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+
+    # compare against the previous run, failing if anything regressed
+    if args.compare:
+        with open(args.compare) as file:
+            sys.exit(1 if compare(results, json.load(file)['results']) else 0)
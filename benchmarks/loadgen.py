@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import requests
+
+import accounts
+import datasource
+from benchmarks.stub_server import StubPokeAPI
+from projection import fetch_pokemon, fetch_flavor_text
+from proxy import CachingProxy
+from userstore import UserStore, COLUMNS
+
+# the default share of each operation a simulated user performs once registered
+DEFAULT_MIX = {
+    'login': 30,
+    'replace_pokemon': 25,
+    'fetch': 25,
+    'rename_user': 8,
+    'change_password': 8,
+    'delete_user': 4
+}
+
+# the password every simulated user registers with
+PASSWORD = 'Password1!'
+
+
+def make_users(count, party=('None',) * 6):
+    '''
+    Makes a dataframe of user data like the one loaded from UserData.csv
+    :param count: the number of users (int)
+    :param party: the party given to every user
+    :returns: pandas dataframe
+    '''
+    return pd.DataFrame({
+        'username': [f'user{number}' for number in range(count)],
+        'password': [accounts.hash_password(PASSWORD)] * count,
+        **{f'Pokemon{slot}': [party[slot - 1]] * count for slot in range(1, 7)}
+    }, columns=COLUMNS)
+
+
+class Session:
+    '''class for a simulated user, standing in for the application in the account functions'''
+    def __init__(self, store, number):
+        '''
+        initialises the session
+        :param self: instance of the session
+        :param store: the user data shared by every session (UserStore)
+        :param number: a number unique to this session, used to make unique usernames (int)
+        '''
+        # stores the shared user data
+        self.store = store
+
+        # stores the logged in user, like the application does
+        self.current_user = {'name': None, 'id': None}
+
+        # stores the session's number and how many accounts it has made, to make unique usernames
+        self.number = number
+        self.accounts = 0
+
+    @property
+    def user_data(self):
+        '''
+        gets the shared user data, so the account functions see every session's changes
+        :param self: instance of the session
+        :returns: pandas dataframe
+        '''
+        return self.store.user_data
+
+    def new_name(self):
+        '''
+        makes a username no other session will use
+        :param self: instance of the session
+        :returns: the username (str)
+        '''
+        self.accounts += 1
+        return f'load{self.number}-{self.accounts}'
+
+
+def run_operation(session, operation, stub):
+    '''
+    Runs one operation the same way the application's button handlers do
+    :param session: the simulated user (Session)
+    :param operation: the name of the operation (str)
+    :param stub: the running stub server (StubPokeAPI)
+    :returns: None, raises an error if the operation failed
+    '''
+    # fetching pokemon data does not touch the user data
+    if operation == 'fetch':
+        record = fetch_pokemon(random.randint(1, 151), datasource.API_URL)
+        fetch_flavor_text(record.id, datasource.API_URL)
+        requests.get(record.sprite)
+        return
+
+    # changes are journalled by the store, so sessions changing different users never wait on each other
+    match operation:
+        case 'add_user':
+            # register a new account and log into it, like register_button_pressed
+            name = session.new_name()
+            if not accounts.add_user(session, name, PASSWORD):
+                raise ValueError('username already taken')
+            with session.store.lock:
+                if not accounts.login(session, name, PASSWORD):
+                    raise ValueError('could not log into new account')
+        case 'login':
+            with session.store.lock:
+                if not accounts.login(session, session.current_user['name'], PASSWORD):
+                    raise ValueError('login failed')
+        case 'rename_user':
+            if not accounts.rename_user(session, session.new_name()):
+                raise ValueError('username already taken')
+        case 'change_password':
+            accounts.change_password(session, PASSWORD)
+        case 'replace_pokemon':
+            accounts.replace_pokemon(session, f'pokemon-{random.randint(1, 151)}', random.randint(1, 6))
+        case 'delete_user':
+            accounts.delete_user(session)
+
+
+def simulate_user(session, stub, mix, think_time, end, latencies, errors):
+    '''
+    Runs a simulated user until the end time, recording the latency of every operation
+    :param session: the simulated user (Session)
+    :param stub: the running stub server (StubPokeAPI)
+    :param mix: dictionary of operation name to relative weight
+    :param think_time: the average seconds waited between operations (float)
+    :param end: the perf_counter time to stop at (float)
+    :param latencies: dictionary of operation name to a list of latencies, shared by every user
+    :param errors: dictionary of operation name to error count, shared by every user
+    :returns: None
+    '''
+    # get the operations and their weights
+    operations, weights = list(mix), list(mix.values())
+
+    while time.perf_counter() < end:
+        # a user without an account registers first, otherwise it picks an operation from the mix
+        operation = 'add_user' if session.current_user['name'] is None else random.choices(operations, weights)[0]
+
+        # run and time the operation
+        start = time.perf_counter()
+        try:
+            run_operation(session, operation, stub)
+            latencies[operation].append(time.perf_counter() - start)
+        except Exception:
+            errors[operation] += 1
+
+            # start again with a new account after a failure
+            session.current_user = {'name': None, 'id': None}
+
+        # wait before the next operation, randomised so users do not move in lockstep
+        if think_time:
+            time.sleep(random.expovariate(1 / think_time))
+
+
+def percentile(times, fraction):
+    '''
+    Gets a percentile of a sorted list of timings
+    :param times: sorted list of durations in seconds
+    :param fraction: the percentile as a fraction, e.g. 0.99 (float)
+    :returns: the percentile in milliseconds (float)
+    '''
+    return times[min(len(times) - 1, int(len(times) * fraction))] * 1000
+
+
+def report(latencies, errors, duration):
+    '''
+    Builds the throughput and latency report of each operation
+    :param latencies: dictionary of operation name to a list of latencies
+    :param errors: dictionary of operation name to error count
+    :param duration: the seconds the load ran for (float)
+    :returns: dictionary of operation name to its results
+    '''
+    results = {}
+
+    for operation, times in latencies.items():
+        if not times and not errors[operation]:
+            continue
+        times = sorted(times)
+        results[operation] = {
+            'count': len(times),
+            'errors': errors[operation],
+            'per_second': len(times) / duration,
+            **({'p50_ms': percentile(times, 0.5), 'p90_ms': percentile(times, 0.9),
+                'p99_ms': percentile(times, 0.99), 'max_ms': times[-1] * 1000} if times else {})
+        }
+
+    return results
+
+
+def parse_mix(text):
+    '''
+    Reads an operation mix from the command line
+    :param text: comma separated operation=weight pairs, e.g. "login=50,fetch=50" (str)
+    :returns: dictionary of operation name to weight
+    '''
+    mix = {}
+    for pair in text.split(','):
+        operation, weight = pair.split('=')
+        if operation not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'unknown operation {operation}, choose from {", ".join(DEFAULT_MIX)}')
+        mix[operation] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    # read the command line options
+    parser = argparse.ArgumentParser(description='Drive the account functions and pokemon fetching from many simulated users.')
+    parser.add_argument('--sessions', type=int, default=20, help='number of simultaneous simulated users')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run the load for')
+    parser.add_argument('--think-time', type=float, default=0.05, help='average seconds each user waits between operations')
+    parser.add_argument('--users', type=int, default=10000, help='number of existing accounts in the user data')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='operation weights, e.g. login=50,fetch=50')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of latency the stub adds to each response')
+    parser.add_argument('--proxy', action='store_true', help='send every request through a caching proxy in front of the stub')
+    parser.add_argument('--output', help='file to write the json results to, defaults to stdout')
+    args = parser.parse_args()
+
+    # start the stub server with the api pointed at it
+    stub = StubPokeAPI(delay=args.latency)
+    datasource.API_URL = stub.url
+
+    # put a caching proxy in front of the stub, like one shared by every pokedex on a network
+    proxy = None
+    if args.proxy:
+        proxy = CachingProxy({'/api/v2/': stub.url, '/graphql/v1beta': stub.graphql_url, '/sprites/': stub.host+'/sprites/'},
+                             host='127.0.0.1', port=0)
+        datasource.API_URL = proxy.url
+
+    # run in a temporary folder so saving never touches the real user data
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+
+    # create the shared user data and the results shared by every user
+    store = UserStore('UserData.csv', make_users(args.users))
+    latencies = {operation: [] for operation in ['add_user', *DEFAULT_MIX]}
+    errors = {operation: 0 for operation in latencies}
+
+    # start every simulated user
+    end = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=simulate_user, args=(Session(store, number), stub, args.mix, args.think_time, end, latencies, errors))
+               for number in range(args.sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    stub.close()
+    if proxy is not None:
+        proxy.close()
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    # write the results
+    output = json.dumps({'sessions': args.sessions, 'duration': duration, 'users': args.users,
+                         'operations': report(latencies, errors, duration),
+                         **({'proxy': proxy.stats()} if proxy is not None else {})}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
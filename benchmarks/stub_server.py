@@ -0,0 +1,361 @@
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# the folder recorded pokeapi payloads are saved to and served from
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# the languages used for synthetic pokedex entries, english is deliberately not first
+LANGUAGES = ['ja-Hrkt', 'ko', 'zh-Hant', 'fr', 'de', 'es', 'it', 'en', 'ja', 'zh-Hans']
+
+
+def make_png(seed, size=96):
+    '''
+    Makes a small png image to stand in for a sprite
+    :param seed: number used to vary the colours of the image (int)
+    :param size: the width and height of the image in pixels (int)
+    :returns: the png file contents (bytes)
+    '''
+    # build each row of pixels, every row starts with a filter type byte of 0
+    rows = b''.join(
+        b'\x00' + bytes((x * 7 + seed) % 256 if (x // 8 + y // 8) % 2 else 0 for x in range(size) for _ in range(3))
+        for y in range(size))
+
+    # builds a png chunk with its length and checksum
+    chunk = lambda kind, data: struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows, 9)) + chunk(b'IEND', b''))
+
+
+def synthetic_pokemon(pokedex_id, sprite_url):
+    '''
+    Makes a /pokemon/ payload shaped like a real pokeapi response, including the large moves array
+    :param pokedex_id: the pokedex ID of the pokemon (int)
+    :param sprite_url: the url the sprite of this pokemon is served from (str)
+    :returns: the payload (dict)
+    '''
+    # builds a named api resource like those used throughout pokeapi
+    resource = lambda kind, name, number: {'name': name, 'url': f'https://pokeapi.co/api/v2/{kind}/{number}/'}
+
+    # most real pokemon learn around 80 moves, each listed once per version group
+    moves = [{
+        'move': resource('move', f'move-{move}', move),
+        'version_group_details': [{
+            'level_learned_at': group % 50,
+            'move_learn_method': resource('move-learn-method', 'level-up', 1),
+            'version_group': resource('version-group', f'group-{group}', group)
+        } for group in range(20)]
+    } for move in range(80)]
+
+    return {
+        'abilities': [
+            {'ability': resource('ability', f'ability-{pokedex_id}', pokedex_id), 'is_hidden': False, 'slot': 1},
+            {'ability': resource('ability', f'hidden-ability-{pokedex_id}', pokedex_id + 1000), 'is_hidden': True, 'slot': 3}
+        ],
+        'base_experience': 64,
+        'forms': [resource('pokemon-form', f'pokemon-{pokedex_id}', pokedex_id)],
+        'game_indices': [{'game_index': pokedex_id, 'version': resource('version', f'version-{version}', version)} for version in range(20)],
+        'height': 7,
+        'held_items': [],
+        'id': pokedex_id,
+        'is_default': True,
+        'location_area_encounters': f'https://pokeapi.co/api/v2/pokemon/{pokedex_id}/encounters',
+        'moves': moves,
+        'name': f'pokemon-{pokedex_id}',
+        'order': pokedex_id,
+        'past_types': [],
+        'species': resource('pokemon-species', f'pokemon-{pokedex_id}', pokedex_id),
+        'sprites': {'front_default': sprite_url, 'back_default': None, 'front_shiny': None, 'back_shiny': None,
+                    'other': {'official-artwork': {'front_default': None}}, 'versions': {}},
+        'stats': [{'base_stat': 45 + (pokedex_id * 7 + stat) % 100, 'effort': 0, 'stat': resource('stat', name, stat + 1)}
+                  for stat, name in enumerate(['hp', 'attack', 'defense', 'special-attack', 'special-defense', 'speed'])],
+        'types': [{'slot': 1, 'type': resource('type', 'grass', 12)}, {'slot': 2, 'type': resource('type', 'poison', 4)}],
+        'weight': 69
+    }
+
+
+def synthetic_species(pokedex_id):
+    '''
+    Makes a /pokemon-species/ payload shaped like a real pokeapi response
+    :param pokedex_id: the pokedex ID of the pokemon (int)
+    :returns: the payload (dict)
+    '''
+    # real species list one pokedex entry per language for each game
+    entries = [{
+        'flavor_text': f'Pokedex entry {game} for pokemon {pokedex_id} written in {language}.\nIt is about this long.',
+        'language': {'name': language, 'url': 'https://pokeapi.co/api/v2/language/1/'},
+        'version': {'name': f'version-{game}', 'url': f'https://pokeapi.co/api/v2/version/{game}/'}
+    } for game in range(15) for language in LANGUAGES]
+
+    return {
+        'base_happiness': 50,
+        'capture_rate': 45,
+        'color': {'name': 'green', 'url': 'https://pokeapi.co/api/v2/pokemon-color/5/'},
+        'flavor_text_entries': entries,
+        'id': pokedex_id,
+        'name': f'pokemon-{pokedex_id}',
+        'names': [{'language': {'name': language, 'url': ''}, 'name': f'pokemon-{pokedex_id}'} for language in LANGUAGES]
+    }
+
+
+class StubPokeAPI:
+    '''class for a local http server that serves pokeapi payloads and sprites'''
+    def __init__(self, count=151, delay=0.0, fixtures=FIXTURES):
+        '''
+        initialises the stub server and starts it on a free local port
+        :param self: instance of the stub server
+        :param count: the number of synthetic pokemon to serve when no recordings exist (int)
+        :param delay: seconds to wait before each response, to mimic network latency (float)
+        :param fixtures: the folder of recorded payloads (str)
+        '''
+        # stores the delay added to each response
+        self.delay = delay
+
+        # stores the bodies served for each path
+        self.routes = {}
+
+        # stores the graphql fields of each pokemon by both its name and ID
+        self.graphql_rows = {}
+
+        # stores the species name of each pokemon by its name, for the lists of every pokemon
+        self.names = {}
+
+        # start the server on any free port, serving each request on its own thread
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.host = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+        # stores the base url to use in place of https://pokeapi.co/api/v2/
+        self.url = self.host + '/api/v2/'
+
+        # stores the url to use in place of pokeapi's graphql endpoint
+        self.graphql_url = self.host + '/graphql/v1beta'
+
+        # serve the recorded payloads if there are any, otherwise make synthetic ones
+        if os.path.isdir(fixtures) and os.listdir(fixtures):
+            self.load_recordings(fixtures)
+        else:
+            for pokedex_id in range(1, count + 1):
+                self.add(pokedex_id, synthetic_pokemon(pokedex_id, f'{self.host}/sprites/{pokedex_id}.png'),
+                         synthetic_species(pokedex_id), make_png(pokedex_id))
+
+        # run the server in the background
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def handler(self):
+        '''
+        Creates the request handler class used by the server
+        :param self: instance of the stub server
+        :returns: request handler class
+        '''
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            '''class for handling a single request to the stub server'''
+            # keep connections open between requests like a real server
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self):
+                '''
+                Handles the requests on a connection, ignoring clients that close it part way through a response,
+                which streaming clients do once they have read what they need
+                :param self: instance of the request handler
+                :returns: None
+                '''
+                try:
+                    super().handle()
+                except ConnectionError:
+                    pass
+
+            def do_GET(self):
+                '''
+                Serves the body stored for the requested path
+                :param self: instance of the request handler
+                :returns: None
+                '''
+                # wait to mimic network latency
+                if stub.delay:
+                    time.sleep(stub.delay)
+
+                # look up the path, ignoring any trailing slash and query string
+                body = stub.routes.get(self.path.split('?')[0].rstrip('/'))
+
+                # send a 404 for unknown paths, just like pokeapi
+                if body is None:
+                    body, status, kind = b'Not Found', 404, 'text/plain'
+                else:
+                    status, kind = 200, 'image/png' if self.path.endswith('.png') else 'application/json'
+
+                self.send_response(status)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                '''
+                Answers a graphql query for many pokemon, only its variables are read
+                since the stub only stands in for the query sent by pokeapi_graphql
+                :param self: instance of the request handler
+                :returns: None
+                '''
+                # wait to mimic network latency
+                if stub.delay:
+                    time.sleep(stub.delay)
+
+                # read the query
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+
+                # send a 404 for anything other than the graphql endpoint
+                if self.path.rstrip('/') != stub.graphql_url[len(stub.host):]:
+                    body, status = json.dumps({'errors': [{'message': 'not found'}]}).encode('utf-8'), 404
+                else:
+                    # find each pokemon asked for once, whether it was asked for by name or ID
+                    variables = request.get('variables', {})
+                    rows = {}
+                    for key in [*variables.get('names', []), *map(str, variables.get('ids', []))]:
+                        if key in stub.graphql_rows:
+                            rows[stub.graphql_rows[key]['id']] = stub.graphql_rows[key]
+                    body, status = json.dumps({'data': {'pokemon_v2_pokemon': list(rows.values())}}).encode('utf-8'), 200
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                '''
+                Silences the log line printed for each request
+                '''
+                return
+
+        return Handler
+
+    def add(self, pokedex_id, pokemon, species, sprite):
+        '''
+        Adds a pokemon to the paths served
+        :param self: instance of the stub server
+        :param pokedex_id: the pokedex ID of the pokemon (int)
+        :param pokemon: the /pokemon/ payload (dict)
+        :param species: the /pokemon-species/ payload (dict)
+        :param sprite: the front sprite png (bytes)
+        :returns: None
+        '''
+        # encode the payloads once so serving them costs nothing
+        pokemon_body = json.dumps(pokemon).encode('utf-8')
+        species_body = json.dumps(species).encode('utf-8')
+
+        # serve the pokemon by both its ID and its name, like pokeapi
+        for key in [str(pokedex_id), pokemon['name']]:
+            self.routes['/api/v2/pokemon/'+key] = pokemon_body
+            self.routes['/api/v2/pokemon-species/'+key] = species_body
+        self.routes[f'/sprites/{pokedex_id}.png'] = sprite
+
+        # store the fields pokeapi's graphql endpoint would give for the pokemon
+        english = [entry for entry in species['flavor_text_entries'] if entry['language']['name'] == 'en']
+        row = {
+            'id': pokedex_id,
+            'name': pokemon['name'],
+            'height': pokemon['height'],
+            'weight': pokemon['weight'],
+            'pokemon_v2_pokemonspecy': {
+                'name': pokemon['species']['name'],
+                'pokemon_v2_pokemonspeciesflavortexts': [{'flavor_text': entry['flavor_text']} for entry in english[:1]]
+            },
+            'pokemon_v2_pokemontypes': [{'pokemon_v2_type': {'name': entry['type']['name']}}
+                                        for entry in sorted(pokemon['types'], key=lambda entry: entry['slot'])],
+            'pokemon_v2_pokemonabilities': [{'pokemon_v2_ability': {'name': entry['ability']['name']}}
+                                            for entry in sorted(pokemon['abilities'], key=lambda entry: entry['slot'])],
+            'pokemon_v2_pokemonsprites': [{'sprites': pokemon['sprites']['front_default']}]
+        }
+        self.graphql_rows[str(pokedex_id)] = self.graphql_rows[pokemon['name']] = row
+
+        # list every pokemon served, like pokeapi's paginated lists asked for with a large limit
+        self.names[pokemon['name']] = pokemon['species']['name']
+        for resource, names in [('pokemon', self.names), ('pokemon-species', self.names.values())]:
+            self.routes['/api/v2/'+resource] = json.dumps({'count': len(self.names), 'results': [
+                {'name': name, 'url': f'{self.url}{resource}/{name}/'} for name in names]}).encode('utf-8')
+
+    def load_recordings(self, fixtures):
+        '''
+        Loads recorded payloads, pointing their sprite urls at this server
+        :param self: instance of the stub server
+        :param fixtures: the folder of recorded payloads (str)
+        :returns: None
+        '''
+        # for each recorded pokemon
+        for file in sorted(os.listdir(fixtures)):
+            if not file.endswith('.pokemon.json'):
+                continue
+            pokedex_id = int(file.split('.')[0])
+
+            # load the recorded payloads and sprite
+            with open(os.path.join(fixtures, file), encoding='utf-8') as pokemon_file:
+                pokemon = json.load(pokemon_file)
+            with open(os.path.join(fixtures, f'{pokedex_id}.species.json'), encoding='utf-8') as species_file:
+                species = json.load(species_file)
+            with open(os.path.join(fixtures, f'{pokedex_id}.png'), 'rb') as sprite_file:
+                sprite = sprite_file.read()
+
+            # serve the sprite from this server rather than github
+            pokemon['sprites']['front_default'] = f'{self.host}/sprites/{pokedex_id}.png'
+            self.add(pokedex_id, pokemon, species, sprite)
+
+    def close(self):
+        '''
+        Stops the server
+        :param self: instance of the stub server
+        :returns: None
+        '''
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def record(names, fixtures=FIXTURES, api_url='https://pokeapi.co/api/v2/'):
+    '''
+    Records real pokeapi payloads and sprites for the stub server to serve
+    :param names: list of pokemon names or IDs to record
+    :param fixtures: the folder to save the recordings to (str)
+    :param api_url: the base url of pokeapi (str)
+    :returns: None
+    '''
+    import requests
+
+    # create the fixtures folder if it does not exist
+    os.makedirs(fixtures, exist_ok=True)
+
+    # for each pokemon to record
+    for name in names:
+        # download the pokemon, its species and its sprite
+        pokemon = requests.get(api_url+'pokemon/'+str(name)).json()
+        species = requests.get(api_url+'pokemon-species/'+str(pokemon['id'])).json()
+        sprite = requests.get(pokemon['sprites']['front_default']).content
+
+        # save them under the pokemon's ID
+        with open(os.path.join(fixtures, f"{pokemon['id']}.pokemon.json"), 'w', encoding='utf-8') as file:
+            json.dump(pokemon, file)
+        with open(os.path.join(fixtures, f"{pokemon['id']}.species.json"), 'w', encoding='utf-8') as file:
+            json.dump(species, file)
+        with open(os.path.join(fixtures, f"{pokemon['id']}.png"), 'wb') as file:
+            file.write(sprite)
+
+
+if __name__ == "__main__":
+    # record the given pokemon, e.g. python -m benchmarks.stub_server bulbasaur pikachu
+    if len(sys.argv) > 1:
+        record(sys.argv[1:])
+    else:
+        # otherwise serve the stub until stopped
+        stub = StubPokeAPI()
+        print(f'Serving stub pokeapi at {stub.url}')
+        try:
+            stub.thread.join()
+        except KeyboardInterrupt:
+            stub.close()
@@ -0,0 +1,168 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from accounts import password_regex, hash_password
+from userstore import UserStore, COLUMNS
+
+# the number of passwords sent to a worker process at a time, large enough that sending them costs less than hashing them
+HASH_BATCH = 20000
+
+
+def hash_passwords(passwords):
+    '''
+    Hashes many passwords with hash_password, which calls straight through while tracing is disabled
+    :param passwords: list of passwords (str)
+    :returns: list of hashed passwords (str)
+    '''
+    return [hash_password(password) for password in passwords]
+
+
+def hash_all(passwords, pool=None):
+    '''
+    Hashes passwords, spreading them across a process pool in batches if one is given
+    :param passwords: list of passwords (str)
+    :param pool: the process pool to hash with, or None to hash in this process (ProcessPoolExecutor)
+    :returns: list of hashed passwords (str)
+    '''
+    if pool is None or len(passwords) <= HASH_BATCH:
+        return hash_passwords(passwords)
+    batches = [passwords[start:start + HASH_BATCH] for start in range(0, len(passwords), HASH_BATCH)]
+    return [hashed for batch in pool.map(hash_passwords, batches) for hashed in batch]
+
+
+def validate(chunk, taken):
+    '''
+    Finds the rows of an import chunk that can be added, checking every row at once
+    :param chunk: pandas dataframe with "username" and "password" columns
+    :param taken: set of usernames already in use, which the valid usernames are added to
+    :returns: tuple of a boolean series of the valid rows and a series of the reason each other row was rejected
+    '''
+    usernames = chunk['username']
+    passwords = chunk['password']
+
+    # find each kind of invalid row, looking usernames up in the set directly since isin would copy all of it for every chunk
+    empty = usernames.eq('') | passwords.eq('')
+    weak = ~empty & ~passwords.str.fullmatch(password_regex.pattern)
+    duplicate = ~empty & ~weak & (usernames.map(taken.__contains__).astype(bool) | usernames.duplicated())
+
+    # remember the new usernames so later chunks cannot reuse them
+    valid = ~(empty | weak | duplicate)
+    taken.update(usernames[valid])
+
+    reasons = pd.Series('', index=chunk.index)
+    reasons[empty] = 'empty'
+    reasons[weak] = 'invalid password'
+    reasons[duplicate] = 'username taken'
+    return valid, reasons[~valid]
+
+
+def import_users(path, user_data, chunk_size=100000, workers=1, rejects=None):
+    '''
+    Adds every valid account from a csv of usernames and plain text passwords, reading it in chunks
+    :param path: the csv to import, with "username" and "password" columns and optionally party columns (str)
+    :param user_data: pandas dataframe of the existing user data
+    :param chunk_size: the number of rows read at a time (int)
+    :param workers: the number of processes hashing passwords, None uses every cpu, the default of 1 hashes in this
+    process since sha256 is faster than sending passwords to other processes, a pool only pays off for slower hashes (int)
+    :param rejects: optional csv to write the rejected rows to, with the reason for each (str)
+    :returns: tuple of a pandas dataframe of the new accounts, and a dictionary counting the rows added and rejected
+    '''
+    # stores the usernames in use, the new rows and the counts of each outcome
+    taken = set(user_data['username'])
+    added = []
+    counts = {'added': 0, 'empty': 0, 'invalid password': 0, 'username taken': 0}
+
+    pool = None if workers == 1 else ProcessPoolExecutor(workers)
+    try:
+        # read the import in chunks, keeping every value as text
+        for number, chunk in enumerate(pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False)):
+            valid, reasons = validate(chunk, taken)
+
+            # record the rejected rows and why
+            for reason, count in reasons.value_counts().items():
+                counts[reason] += count
+            if rejects is not None:
+                chunk[~valid].assign(reason=reasons).to_csv(rejects, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+
+            # hash the valid passwords and keep the new rows, with empty party slots where none were given
+            new_users = chunk.loc[valid].reindex(columns=COLUMNS, fill_value='None')
+            new_users['password'] = hash_all(new_users['password'].tolist(), pool)
+            added.append(new_users)
+            counts['added'] += len(new_users)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    new_users = pd.concat(added) if added else pd.DataFrame(columns=COLUMNS)
+    return new_users.replace('', 'None'), counts
+
+
+def merge_users(user_data, new_users, counts):
+    '''
+    Adds imported accounts to the latest user data, rejecting any whose username was taken while the import was read
+    :param user_data: pandas dataframe of the latest user data
+    :param new_users: pandas dataframe of the new accounts made by import_users
+    :param counts: dictionary counting the rows added and rejected, updated with the accounts rejected here
+    :returns: tuple of the user data with the new accounts added, and the counts
+    '''
+    # reject the accounts registered elsewhere since the import started
+    taken = new_users['username'].isin(user_data['username'])
+    counts['added'] -= int(taken.sum())
+    counts['username taken'] += int(taken.sum())
+
+    # add every new account at once, numbering them after the existing rows
+    start = user_data.index.max() + 1 if len(user_data) else 0
+    new_users = new_users[~taken].set_axis(pd.RangeIndex(start, start + int((~taken).sum())))
+    return pd.concat([user_data, new_users]), counts
+
+
+def export_users(user_data, output, columns=COLUMNS, chunk_size=100000):
+    '''
+    Copies the user data to a csv in chunks, so only one chunk of it is ever converted to text at once
+    :param user_data: pandas dataframe of user data, e.g. from a UserStore so journalled changes are included
+    :param output: the csv to write (str)
+    :param columns: the columns to export, e.g. without "password" (list)
+    :param chunk_size: the number of rows copied at a time (int)
+    :returns: the number of rows exported (int)
+    '''
+    # write just the header if there are no users
+    if not len(user_data):
+        pd.DataFrame(columns=columns).to_csv(output, index=False, encoding='utf-8')
+    for start in range(0, len(user_data), chunk_size):
+        chunk = user_data[columns].iloc[start:start + chunk_size]
+        chunk.to_csv(output, mode='w' if start == 0 else 'a', header=start == 0, index=False, encoding='utf-8')
+    return len(user_data)
+
+
+if __name__ == "__main__":
+    # read the command line options
+    parser = argparse.ArgumentParser(description='Import or export many pokedex accounts at once.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    importer = commands.add_parser('import', help='add the accounts in a csv of usernames and plain text passwords')
+    importer.add_argument('input', help='csv with username and password columns, and optionally Pokemon1 to Pokemon6')
+    importer.add_argument('--chunk-size', type=int, default=100000, help='rows read at a time')
+    importer.add_argument('--workers', type=int, default=1, help='processes hashing passwords, 1 hashes without a pool')
+    importer.add_argument('--rejects', help='csv to write the rejected rows to')
+    exporter = commands.add_parser('export', help='copy the user data to another csv')
+    exporter.add_argument('output', help='csv to write')
+    exporter.add_argument('--no-passwords', action='store_true', help='leave out the password hashes')
+    exporter.add_argument('--chunk-size', type=int, default=100000, help='rows copied at a time')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        # retrieve user data from the csv and its journal
+        store = UserStore('UserData.csv')
+
+        # read and hash the new accounts, then keep other writers out while adding them to the latest user data
+        # and saving them all at once, along with every journalled change
+        new_users, counts = import_users(args.input, store.user_data, args.chunk_size, args.workers, args.rejects)
+        if counts['added']:
+            with store.exclusive():
+                user_data, counts = merge_users(store.user_data, new_users, counts)
+                store.compact(user_data)
+        print(', '.join(f'{count} {outcome}' for outcome, count in counts.items()))
+    else:
+        columns = [column for column in COLUMNS if not (args.no_passwords and column == 'password')]
+        print(f"{export_users(UserStore('UserData.csv').user_data, args.output, columns, args.chunk_size)} users exported")
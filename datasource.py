@@ -0,0 +1,57 @@
+import os
+import pokeapi_graphql
+from projection import fetch_pokemon, fetch_flavor_text
+
+# the base url of pokeapi, every request for pokemon data is sent here, set the POKEDEX_API_URL
+# environment variable to use another server such as a caching proxy started with "python proxy.py"
+API_URL = os.environ.get('POKEDEX_API_URL', 'https://pokeapi.co/api/v2/')
+
+# the url of pokeapi's graphql endpoint, used when the data source is "graphql", set the
+# POKEDEX_GRAPHQL_URL environment variable to use another server
+GRAPHQL_URL = os.environ.get('POKEDEX_GRAPHQL_URL', pokeapi_graphql.GRAPHQL_URL)
+
+# the url the front sprite of each pokemon is found under as "<id>.png", used to build the sprite atlas, set the
+# POKEDEX_SPRITE_URL environment variable to use another server
+SPRITE_URL = os.environ.get('POKEDEX_SPRITE_URL', 'https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/')
+
+# the url the official artwork of each pokemon is found under as "<id>.png", used for the larger precomputed sprites,
+# set the POKEDEX_ARTWORK_URL environment variable to use another server
+ARTWORK_URL = os.environ.get('POKEDEX_ARTWORK_URL', 'https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/other/official-artwork/')
+
+# the ways pokemon data can be fetched, "rest" sends a request per pokemon and
+# "graphql" fetches any number of pokemon in one request
+DATA_SOURCES = ['rest', 'graphql']
+
+# the data source in use, set the POKEDEX_DATA_SOURCE environment variable to choose it at startup,
+# it can also be changed while running from the debug overlay
+DATA_SOURCE = os.environ.get('POKEDEX_DATA_SOURCE', 'rest')
+
+def fetch_records(pokemon, flavor_text=False):
+    '''
+    Fetches the details of many pokemon from the data source in use
+    :param pokemon: list of pokemon names or pokedex IDs (str or int)
+    :param flavor_text: whether the pokedex entries are needed, graphql always fetches them (bool)
+    :returns: list of records (PokemonRecord) in the same order as the pokemon given
+    '''
+    # fetch every pokemon in a single request
+    if DATA_SOURCE == 'graphql':
+        return pokeapi_graphql.fetch_records(pokemon, GRAPHQL_URL)
+
+    # otherwise request each pokemon, and its species if the pokedex entry is needed
+    records = [fetch_pokemon(key, API_URL) for key in pokemon]
+    if flavor_text:
+        for record in records:
+            record.flavor_text = fetch_flavor_text(record.id, API_URL)
+    return records
+
+
+def set_data_source(source):
+    '''
+    Changes where pokemon data is fetched from
+    :param source: one of DATA_SOURCES (str)
+    :returns: None
+    '''
+    global DATA_SOURCE
+    if source not in DATA_SOURCES:
+        raise ValueError(f'unknown data source {source}, choose from {", ".join(DATA_SOURCES)}')
+    DATA_SOURCE = source
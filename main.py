@@ -1,183 +1,39 @@
 import tkinter as tk
 from tkinter import ttk
-import hashlib
-import pandas as pd
 import requests
-import re
-import json
-import os
+import queue
+import threading
+from stats import load_stats, STAT_COLUMNS, TYPE_NAMES
+from similar import load_index
+from type_coverage import CoverageAnalyzer
+from party_builder import PartyBuilder
+import tracing
+import stall_watchdog
+import memtrack
+from tracing import span
+import datasource
+from datasource import fetch_records
+from accounts import (password_regex, check_user_exists, add_user, rename_user,
+                      change_password, login, logout, delete_user)
+import accounts
+from userstore import UserStore, PARTY_COLUMNS, REFRESH_INTERVAL
+from snapshot import load_snapshot, save_snapshot, fetch_members
+from atlas import open_atlases, size_for
+import animation
+from animation import FrameCache, Animator, download_gif
+
+# the milliseconds between checks for a party fetched in the background
+PARTY_REFRESH_POLL = 20
 
-# lambda to remove a user from a dataframe, takes the dataframe and current user as params
-remove_user = lambda df, current_user : df.drop(current_user['id'])
-
-# lambda to save data to the csv
-save_data = lambda df : df.to_csv("UserData.csv", encoding="utf-8", index=False) 
-
-
-def hash_password(password):
-    '''
-    Hashes password using sha256
-    :param password: password to hash
-    :returns: hashed password
-    '''
-    # encode the password as bytes
-    password_bytes = password.encode('utf-8')
-    
-    # create a hash object with the password
-    hashed_obj = hashlib.sha256(password_bytes)
-    
-    # get the hexadecimal representation of the hash
-    hashed_password = hashed_obj.hexdigest()
-    
-    # return the now hashed password
-    return hashed_password
-    
-
-def check_user_exists(df, name):
-    '''
-    Checks if a user exists in a dataframe by checking
-    for the username
-    :param df: pandas dataframe
-    :param name: the name of the user you are searching for (str)
-    :returns: True if user is found, False if not (bool)
-    '''
-    # if the user is located in the dataframe
-    if len(df.index[df['username'] == name].tolist()) > 0: 
-        #return that the user is found
-        return True 
-    # if the user is not found
-    else: 
-        # return that the user was not found
-        return False 
-        
-
-def add_user(df, name, password):
-    '''
-    Adds a new user to a dataframe
-    :param df: pandas dataframe
-    :param name: desired name for new user (str)
-    :param password: desired password for new user (str)
-    :returns: the dataframe entered in the parameters updated with
-    the new user.
-    '''
-    # hash the password
-    hashed_password = hash_password(password)
-    # create a dictionary of the new users data
-    new_user_data = {
-        'username': name,
-        'password': hashed_password
-    } 
-    # add a new row of the new user's data
-    df.loc[len(df)] = new_user_data 
-    # fill the empty new slots with None
-    df = df.fillna('None') 
-    # return the dataframe
-    return df
-
-def rename_user(app, new_name):
-    '''
-    Function to rename the currently logged
-    in user.
-    :param app: instance of application
-    :param new_name: The new name for the user (str)
-    :returns: none
-    '''
-    #change the username of the current user to the new name
-    app.user_data.loc[app.current_user['id'], 'username'] = new_name 
-    
-    # change current_user data to contain new name
-    app.current_user['name'] = new_name 
-    return
-
-def change_password(app, new_pass):
-    '''
-    Function to change the password of the current user.
-    :param app: instance of application
-    :param new_pass: the new password for the user (str)
-    :returns: none
-    '''
-    # hash the new password
-    hashed_new_pass = hash_password(new_pass)
-    # change the password of the current user to the new hashed password
-    app.user_data.loc[app.current_user['id'], 'password'] = hashed_new_pass 
-    
-    return
-
-def login(app, username, password):
-    '''
-    Attempts to login to a users account.
-    :param app: instance of application
-    :param username: the name of the user to log in (str)
-    :param password: the attempted password of the user (str)
-    :returns: True if successful and False if not (bool), this will
-    also set the global dictionary current_user's "name" and "id"
-    keys to the value of the username and the row of the users data on the
-    dataframe.
-    '''
-    # check if user exists
-    exists = check_user_exists(app.user_data, username)
-
-    # if the user does not exist
-    if exists == False: 
-        # return that the login failed
-        return False 
-        
-    # get the row in the dataframe of the user attempting to sign in
-    row = app.user_data.index[app.user_data['username'] == username].tolist()[0] 
-    
-    # if the password matches
-    if hash_password(password) == app.user_data.loc[row, 'password']: 
-        # set current users name to the username
-        app.current_user['name'] = username 
-        
-        # set the current users ID to the row the user was found on in the dataframe
-        app.current_user['id'] = row 
-        
-        # return that the login was successful
-        return True 
-        
-    # if failed: 
-    else: 
-        # return that the credentials did not match a user on the system
-        return False 
-        
-
-def logout(app):
-    '''
-    Logs out of the current users
-    account, setting the current user values
-    of "name" and "id" to None.
-    :param app: MainApplication class
-    :returns: None
-    '''
-    # set the current_user data back to default (None)
-    app.current_user = {
-        'name': None,
-        'id' : None
-    } 
-    return
-
-def delete_user(app):
-    '''
-    Deletes the user given in the parameters
-    from the dataframe
-    :param app: instance of application
-    :returns: none
-    '''
-    # removes the current user from the dataframe, deleting them
-    app.user_data = app.user_data.drop(app.current_user['id'])
-
-    # logout of the user's account to finalise this
-    logout(app)
-    
 
 class MainApplication(tk.Tk):
     '''class for the main application (tkinter window)'''
-    def __init__(self, dataframe):
+    def __init__(self, dataframe=None, store=None):
         '''
         initialises application
         :param self: instance of application
-        :param dataframe: pandas dataframe containing user data
+        :param dataframe: pandas dataframe containing user data, used when no store is given
+        :param store: the user store shared with other copies of the application (UserStore)
         '''
         super().__init__()
         # sets the title of the application window
@@ -193,14 +49,17 @@ class MainApplication(tk.Tk):
         # sets the cursor to be ditto
         self.config(cursor="@132.cur")
 
-        # stores the csv/dataframe/user data
-        self.user_data = dataframe
+        # stores the csv/dataframe/user data, changes are journalled so other copies of the application never lose them
+        self.store = store if store is not None else UserStore(user_data=dataframe)
+
+        # check for changes made by other copies of the application every second
+        self.after(REFRESH_INTERVAL, self.refresh_user_data)
 
         # stores whether or not passwords are to be hidden on the application
         self._password_hidden = True
 
         # stores the regular expression for a valid pokedex password
-        self.password_regex = re.compile("^(?!.*[,])(?=.*[A-Za-z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$")
+        self.password_regex = password_regex
 
         # stores the current users name and row index
         self.current_user = {
@@ -208,6 +67,41 @@ class MainApplication(tk.Tk):
             'id': None
         }
 
+        # stores the local table of pokemon stats and the coverage analyzer and party builder built from it, loaded the first time they are needed
+        self.stat_table = None
+        self.coverage = None
+        self.party_builder = None
+
+        # stores the index used to find similar pokemon, loaded the first time it is needed
+        self.similar_index = None
+
+        # stores the event loop stall detector, only started when turned on with the POKEDEX_WATCHDOG environment variable
+        self.watchdog = stall_watchdog.start_from_environment(self)
+
+        # stores the memory tracker, only started when turned on with the POKEDEX_MEMTRACK environment variable
+        self.memory_tracker = memtrack.start_from_environment(self)
+
+        # stores the name of the page currently shown
+        self.current_page = None
+
+        # stores the debug overlay window, opened and closed with F12
+        self.debug_overlay = None
+        self.bind_all('<F12>', lambda event: self.toggle_debug_overlay())
+
+        # stores the sprite atlas of each display size, None for those not built with "python atlas.py" or "python thumbnails.py"
+        self.sprite_atlases = open_atlases()
+
+        # stores the display size of the sprites on the party and search pages, the largest that fits the screen
+        self.party_sprite_size = size_for(scr_width // 8)
+        self.search_sprite_size = size_for(scr_height // 3)
+
+        # stores the decoded frames of the animated sprites shown, and the single timer playing them
+        self.frame_cache = FrameCache(self)
+        self.animator = Animator(self)
+
+        # stores which showing of the party page is being fetched in the background, None when nothing is
+        self.party_refresh = None
+
         # stores pokemon image data when viewing party
         self.party = {
             'Pokemon1' : [],
@@ -218,6 +112,39 @@ class MainApplication(tk.Tk):
             'Pokemon6' : []
         }
         
+    @property
+    def user_data(self):
+        '''
+        gets the user data held by the store
+        :param self: instance of application
+        :returns: pandas dataframe
+        '''
+        return self.store.user_data
+
+    def refresh_user_data(self):
+        '''
+        subroutine to apply changes made by other copies of the application or the admin tools, which only reads
+        the changes themselves, then to check again a second later
+        :param self: instance of application
+        :returns: None
+        '''
+        self.after(REFRESH_INTERVAL, self.refresh_user_data)
+        self.store.catch_up()
+
+        # if logged in, follow the current user's row
+        if self.current_user['id'] is None:
+            return
+
+        # if another copy deleted the current user, log out and go back to the starting page
+        if self.current_user['id'] not in self.user_data.index:
+            logout(self)
+            self.clear_window()
+            self.start_page()
+            return
+
+        # if another copy renamed the current user, use the new name
+        self.current_user['name'] = self.user_data.loc[self.current_user['id'], 'username']
+
     def clear_keys(self):
         '''
         subroutine to empty the party attribute of the application
@@ -229,17 +156,106 @@ class MainApplication(tk.Tk):
             #set the key value to an empty list
             self.party[key] = []
            
+    def page_widgets(self):
+        '''
+        subroutine to get every widget on the current page, leaving
+        out the debug overlay window which stays open between pages
+        :param self: instance of application
+        :returns: list of widgets
+        '''
+        return [widget for widget in self.winfo_children() if widget is not self.debug_overlay]
+
+    def toggle_debug_overlay(self):
+        '''
+        subroutine to show or hide the debug overlay, which shows where the time
+        went during the last action, showing it turns on tracing
+        :param self: instance of application
+        :returns: None
+        '''
+        # if the overlay is open, close it
+        if self.debug_overlay is not None:
+            self.debug_overlay.destroy()
+            self.debug_overlay = None
+            return
+
+        # start recording timings
+        tracing.enable()
+
+        # create the overlay window with a label for the timings
+        self.debug_overlay = tk.Toplevel(self)
+        self.debug_overlay.title('Debug')
+        self.debug_overlay.attributes('-topmost', True)
+        self.debug_overlay.protocol('WM_DELETE_WINDOW', self.toggle_debug_overlay)
+        timings = tk.Label(self.debug_overlay, justify='left', font=('Courier', 10))
+        timings.pack()
+
+        # create a button to save the recorded timings as a chrome trace and add it to the overlay
+        ttk.Button(self.debug_overlay, text='Export Trace', command=lambda: tracing.export()).pack()
+
+        # create a drop down to change where pokemon data is fetched from and add it to the overlay
+        data_source = ttk.Combobox(self.debug_overlay, values=datasource.DATA_SOURCES, state='readonly')
+        data_source.set(datasource.DATA_SOURCE)
+        data_source.bind('<<ComboboxSelected>>', lambda event: datasource.set_data_source(data_source.get()))
+        data_source.pack()
+
+        # subroutine to show the latest timings, running twice a second while the overlay is open
+        def refresh():
+            if self.debug_overlay is None:
+                return
+            name, stages = tracing.last_action()
+            timings.configure(text=f"Last action: {name}\n" + '\n'.join(
+                f"{stage:10} {milliseconds:8.1f} ms" for stage, milliseconds in sorted(stages.items(), key=lambda item: -item[1]))
+                + f"\n{'total':10} {sum(stages.values()):8.1f} ms"
+                + ('' if self.watchdog is None else '\n\nEvent loop stalls:\n' + '\n'.join(
+                    f"{bucket:10} {count:8}" for bucket, count in self.watchdog.histogram().items()))
+                + ('' if self.memory_tracker is None or not self.memory_tracker.cleared else
+                    f"\n\nAfter last page change: {self.memory_tracker.cleared['widgets']} widgets, {self.memory_tracker.cleared['images']} images"))
+            self.debug_overlay.after(500, refresh)
+        refresh()
+
     def clear_window(self):
         '''
         subroutine for clearing all widgets currently shown
         :param self: instance of application
         :returns: None
         '''
-        # for each widget shown currently on the application
-        for widgets in self.winfo_children():
+        # record the widgets and images of the page before it is cleared
+        if self.memory_tracker is not None:
+            self.memory_tracker.leaving(self.current_page)
+
+        # for each widget shown currently on the application, apart from the debug overlay
+        for widgets in self.page_widgets():
             # destroy the widget
             widgets.destroy()
+
+        # forget the destroyed widgets and the images they showed so their memory is freed
+        self.release_page_references()
+
+        # record what is left after clearing, which should be the same after every page
+        if self.memory_tracker is not None:
+            self.memory_tracker.cleared_page(self.current_page)
+
+    def release_page_references(self):
+        '''
+        subroutine to drop the application's references to the widgets and images
+        of the page being cleared, tkinter only frees an image once nothing refers to it
+        :param self: instance of application
+        :returns: None
+        '''
+        # delete every attribute holding a widget or image, apart from the debug overlay
+        for name, value in list(vars(self).items()):
+            if isinstance(value, (tk.Misc, tk.Image)) and value is not self.debug_overlay:
+                delattr(self, name)
+
+        # empty the entry points of the stat search page and the party images, and drop any party still being fetched
+        self.stat_entries = {}
+        self.clear_keys()
+        self.party_refresh = None
+
+        # stop playing the animations of the destroyed widgets
+        self.animator.prune()
             
+    @tracing.action('replace_pokemon')
     def replace_pokemon(self, pokemon, slot):
         '''
         subroutine for replacing a party member
@@ -247,12 +263,10 @@ class MainApplication(tk.Tk):
         :param pokemon: the pokemon to add to the party
         :param slot: the party slot to replace
         '''
-        # locate the selected slot of the current user and set it equal to the pokemon to add
-        self.user_data.loc[self.current_user['id'], 'Pokemon'+str(slot)] = pokemon
-
-        # save the dataframe to the csv
-        save_data(self.user_data)
+        # locate the selected slot of the current user and set it equal to the pokemon to add, this is saved straight away
+        accounts.replace_pokemon(self, pokemon, slot)
         
+    @tracing.action('search')
     def single_search_pressed(self):
         '''
         subroutine for when a search for a single pokemon is started
@@ -260,10 +274,10 @@ class MainApplication(tk.Tk):
         :returns: None
         '''
         # clear all grid slots where pokemon data is displayed to prevent overlap
-        for widgets in self.winfo_children():
-            if int(widgets.grid_info()["row"]) not in [2,3,4]:
+        for widgets in self.page_widgets():
+            if int(widgets.grid_info()["row"]) not in [2,3,4,5]:
                 pass
-            elif int(widgets.grid_info()['column']) not in [2,3,4]:
+            elif int(widgets.grid_info()['column']) not in [2,3,4,5]:
                 pass
             else:    
                 widgets.destroy()
@@ -272,63 +286,60 @@ class MainApplication(tk.Tk):
             # get the search input and set it to lower case
             search_value = self.search_input.get().lower()
             
-            # send a request to the pokeapi and store the response
-            response = requests.get('https://pokeapi.co/api/v2/pokemon/'+search_value)
-            
-            # load the response
-            data = json.loads(response.text)
+            # request the pokemon and its pokedex entry from the data source in use
+            record, = fetch_records([search_value], flavor_text=True)
             
-            # create a request for the pokemons front facing default sprite and store the result
-            image_req = requests.get(data['sprites']['front_default'], stream=True)
+            # take the sprite from the atlas if it holds it, otherwise request the pokemons front facing default sprite
+            image_bytes = self.atlas_sprite(record.id, self.search_sprite_size)
+            if image_bytes is None:
+                with span('network', 'sprite'):
+                    image_req = requests.get(record.sprite, stream=True)
+                    image_bytes = image_req.content
             
-            # open a fresh image file
-            with open('img.png','wb') as file:
-                # write the image response content into the image file to copy the image
-                file.write(image_req.content)
+            # decode the sprite into a tkinter image straight from its bytes
+            with span('image'):
+                self.poke_image = tk.PhotoImage(data=image_bytes)
             
-            # open the image in tkinter    
-            self.poke_image = tk.PhotoImage(file='img.png')
+            # build the labels showing the pokemon's details
+            with span('widgets'):
+                # create a label to show the image
+                image = ttk.Label(self, image=self.poke_image)
             
-            # delete the image file
-            os.remove('img.png')
+                # add the label to the grid
+                image.grid(row=2,column=2)
             
-            # create a label to show the image
-            image = ttk.Label(self, image=self.poke_image)
+                # create a label of the pokemons weight and add it to the grid
+                self.weight = ttk.Label(self, text="Weight: "+str(record.weight*100)+"g")
+                self.weight.grid(row=2,column=4)
             
-            # add the label to the grid
-            image.grid(row=2,column=2)
+                # create a label of the pokemons height and add it to the grid
+                self.height = ttk.Label(self, text="Height: "+str(record.height*10)+"cm")
+                self.height.grid(row=3,column=4)
             
-            # create a label of the pokemons weight and add it to the grid
-            self.weight = ttk.Label(self, text="Weight: "+str(data['weight']*100)+"g")
-            self.weight.grid(row=2,column=4)
+                # create a label of the species name and id and add it to the grid
+                ttk.Label(self, text=str(record.id)+' - '+record.species.capitalize()).grid(row=3,column=2)
             
-            # create a label of the pokemons height and add it to the grid
-            self.height = ttk.Label(self, text="Height: "+str(data['height']*10)+"cm")
-            self.height.grid(row=3,column=4)
+                # make a label of a pokemons two types, or its singular type if it only has one
+                if len(record.types) > 1:
+                    ttk.Label(self, text=f"Types: {record.types[0]}, {record.types[1]}").grid(row=3,column=3)
+                else:
+                    ttk.Label(self, text=f"Type: {record.types[0]}").grid(row=3,column=3)
             
-            # create a label of the species name and id and add it to the grid
-            ttk.Label(self, text=str(data['id'])+' - '+data['species']['name'].capitalize()).grid(row=3,column=2)
-            
-            # attempt to make a label of a pokemons two types, if it only has one, then make a label of its singular type
-            try:
-                ttk.Label(self, text=f"Types: {data['types'][0]['type']['name']}, {data['types'][1]['type']['name']}").grid(row=3,column=3)
-            except:
-                ttk.Label(self, text=f"Type: {data['types'][0]['type']['name']}").grid(row=3,column=3)
+                # create a label of the pokemons ability
+                ttk.Label(self, text=f"Ability: {record.abilities[0]}").grid(row=4,column=3)
             
-            # create a label of the pokemons ability
-            ttk.Label(self, text=f"Ability: {data['abilities'][0]['ability']['name']}").grid(row=4,column=3)
-            
-            # create a label of the pokemons hidden ability
-            ttk.Label(self, text=f"Hidden Ability: {data['abilities'][1]['ability']['name']}").grid(row=5,column=3)
+                # create a label of the pokemons hidden ability
+                ttk.Label(self, text=f"Hidden Ability: {record.abilities[1]}").grid(row=5,column=3)
+
+                # show the pokemon most similar to this one
+                self.similar_panel(record.id)
             
+            # play the animated sprite in place of the still one if turned on, downloaded without holding up the page
+            if animation.enabled:
+                self.fetch_animation(image, record.id)
+
             # store the name of the pokemon
-            pokemon_name = data['species']['name']
-            
-            # request the species details of the current pokemon from the pokeapi and store the response
-            response = requests.get('https://pokeapi.co/api/v2/pokemon-species/'+str(data['id']))
-            
-            # load the response
-            data = json.loads(response.text)
+            pokemon_name = record.species
             
             # create a button to for adding the pokemon to the party
             self.replace_button = ttk.Button(self, text='Add To Party', command=lambda:[self.clear_window(),self.change_party_page(pokemon_name)])
@@ -337,10 +348,7 @@ class MainApplication(tk.Tk):
             self.replace_button.grid(row=4,column=2)
             
             # create a label for the english pokedex entry of the pokemon
-            for counter in range(0,len(data['flavor_text_entries'])):
-                if data['flavor_text_entries'][counter]['language']['name'] == 'en':
-                    self.dex_entry = ttk.Label(self, text=data['flavor_text_entries'][counter]['flavor_text'].replace('',' '))
-                    break
+            self.dex_entry = ttk.Label(self, text=record.flavor_text.replace('',' '))
             
             # add this label to the grid
             self.dex_entry.grid(row=2,column=3)
@@ -349,6 +357,7 @@ class MainApplication(tk.Tk):
         except:
             pass
         
+    @tracing.action('login')
     def login_button_pressed(self):
         '''
         subroutine for when the "login" button is pressed
@@ -372,7 +381,7 @@ class MainApplication(tk.Tk):
         # if the login failed or empty slots are detected
         if status == False or empty_slots == True:
             # clear the grid slot where the error message is to be displayed
-            for widgets in self.winfo_children():
+            for widgets in self.page_widgets():
                 if int(widgets.grid_info()["row"]) != 0:
                     pass
                 elif int(widgets.grid_info()['column']) != 2:
@@ -401,6 +410,7 @@ class MainApplication(tk.Tk):
             # show the now logged in user's party/party page
             self.party_page()
 
+    @tracing.action('register')
     def register_button_pressed(self):
         '''
         subroutine for when the "register" button is pressed
@@ -428,7 +438,7 @@ class MainApplication(tk.Tk):
         # if a user with the same name already exists, the password is invalid, passwords don't match or empty slots are detected
         if exists == True or valid_password == False or password != password_confirm or empty_slots == True:
             # clear the grid slot where an error will be displayed
-            for widgets in self.winfo_children():
+            for widgets in self.page_widgets():
                 if int(widgets.grid_info()["row"]) != 0:
                     pass
                 elif int(widgets.grid_info()['column']) != 2:
@@ -465,10 +475,12 @@ class MainApplication(tk.Tk):
                 self.error.grid(row=0,column=2)
                 return
 
-        # add the user to the dataframe
-        self.user_data = add_user(self.user_data, username, password)
-        # save the dataframe contents to the csv
-        save_data(self.user_data)
+        # add and save the user, unless another copy of the application took the name first
+        if not add_user(self, username, password):
+            # show an error message saying that a user with the same name was found and add it to the grid
+            self.error = ttk.Label(self, text="A user with this information already exists on the system, try logging in.", foreground="red")
+            self.error.grid(row=0,column=2)
+            return
         # login the new user
         login(self, username, password)
         # clear the windows widgets
@@ -482,7 +494,7 @@ class MainApplication(tk.Tk):
         :param self: instance of application
         :returns: None
         '''
-        for widget in self.winfo_children():
+        for widget in self.page_widgets():
             if int(widget.grid_info()["row"]) != 0:
                 pass
             elif int(widget.grid_info()["column"]) != 3:
@@ -490,6 +502,7 @@ class MainApplication(tk.Tk):
             else:
                 widget.destroy()
 
+    @tracing.action('change_username')
     def change_username_button_pressed(self):
         '''
         subroutine for when the "change username" button is pressed
@@ -532,16 +545,20 @@ class MainApplication(tk.Tk):
                 self.error.grid(row=0,column=3)
                 return
         else:
-            # rename the user
-            rename_user(self, username)
+            # rename the user, unless another user took the name first
+            if not rename_user(self, username):
+                # show an error message saying that someone with that name already exists and add it to the grid
+                self.clear_error()
+                self.error = ttk.Label(self, text="A user already exists with that name, please try again.", foreground="red")
+                self.error.grid(row=0,column=3)
+                return
             # create a message to inform the user that the name change was successful
             self.result = ttk.Label(self, text="Successfully changed your username!", foreground="green")
             # add this result message to the application grid
             self.result.grid(row=0,column=3)
-            # save the data to the csv
-            save_data(self.user_data)
             return
 
+    @tracing.action('change_password')
     def change_password_button_pressed(self):
         '''
         subroutine for when the "change password" button is pressed
@@ -593,9 +610,8 @@ class MainApplication(tk.Tk):
             self.result = ttk.Label(self, text="Successfully changed your password!", foreground="green")
             # add this message to the application grid
             self.result.grid(row=0,column=3)
-            # save the dataframe data to the csv
-            save_data(self.user_data)
 
+    @tracing.action('delete_account')
     def delete_account_button_pressed(self):
         '''
         subroutine for when the "delete account" button is pressed
@@ -654,10 +670,8 @@ class MainApplication(tk.Tk):
                 self.error = ttk.Label(self, text="This password is incorrect, please try again.", foreground="red")
                 self.error.grid(row=0,column=3)
                 return
-        # delete the user
-        delete_user(self, username)
-        # save the dataframe to the csv file
-        save_data(self.user_data)
+        # delete the user, this is saved straight away
+        delete_user(self)
         # clear the current page
         self.clear_window()
         # go back to the starting page
@@ -740,9 +754,13 @@ class MainApplication(tk.Tk):
         self.account_button = ttk.Button(self, text='Account Settings', width=30, command=lambda:[self.clear_window(),self.account_settings_page()])
         self.account_button.grid(row=3,column=0)
 
+        # add a button to run the stat search page and add it to the grid
+        self.stat_button = ttk.Button(self, text='Stat Search', width=30, command=lambda:[self.clear_window(),self.stat_search_page()])
+        self.stat_button.grid(row=4,column=0)
+
         # add a button for logging out and add it to the grid
         self.logout_button = ttk.Button(self, text='Log Out', width=30, command=lambda:[logout(self),self.clear_window(),self.start_page()])
-        self.logout_button.grid(row=4,column=0)
+        self.logout_button.grid(row=5,column=0)
 
     def account_settings_change(self, mode):
         '''
@@ -752,6 +770,9 @@ class MainApplication(tk.Tk):
         :param mode: the selected account setting
         :returns: None
         '''
+        # store the name of the page shown
+        self.current_page = 'account_settings_'+mode
+
         # generate the side bar
         self.side_bar()
 
@@ -898,6 +919,9 @@ class MainApplication(tk.Tk):
         :param self: instance of application
         :returns: None
         '''
+        # store the name of the page shown
+        self.current_page = 'account_settings'
+
         # generate the side bar
         self.side_bar()
 
@@ -931,6 +955,9 @@ class MainApplication(tk.Tk):
         # generate the images for party members
         self.party_page()
 
+        # store the name of the page shown
+        self.current_page = 'change_party'
+
         # create buttons below each party member for replacing them and add these buttons to the grid
         button_1 = ttk.Button(self, text='replace', command=lambda:[self.replace_pokemon(pokemon,1),self.clear_window(),self.party_page()])
         button_1.grid(row=4,column=2)
@@ -951,6 +978,9 @@ class MainApplication(tk.Tk):
         :param self: instance of application
         :returns: None
         '''
+        # store the name of the page shown
+        self.current_page = 'search'
+
         # generate the side bar
         self.side_bar()
 
@@ -975,6 +1005,158 @@ class MainApplication(tk.Tk):
         # add the button to the application grid
         self.searching_button.grid(row=0,column=4)
 
+        # create a label and drop down for picking the type of similar pokemon shown and add them to the grid
+        tk.Label(self, text='Similar pokemon type:').grid(row=1,column=3)
+        self.similar_type_input = ttk.Combobox(self, values=['any']+TYPE_NAMES, state='readonly', width=10)
+        self.similar_type_input.set('any')
+        self.similar_type_input.grid(row=1,column=4)
+
+    def similar_panel(self, pokedex_id):
+        '''
+        subroutine to show the pokemon with the closest base stats and types
+        to a searched pokemon
+        :param self: instance of application
+        :param pokedex_id: the pokedex ID of the searched pokemon (int)
+        :returns: None
+        '''
+        # load the similarity index the first time it is needed
+        if self.similar_index is None:
+            try:
+                self.similar_index = load_index()
+            except OSError:
+                # show nothing if the feature matrix has not been built
+                return
+
+        # find the row of the searched pokemon, showing nothing if it is not in the index
+        row = self.similar_index.find(pokedex_id)
+        if row is None:
+            return
+
+        # get the chosen type filter
+        types = None if self.similar_type_input.get() == 'any' else [self.similar_type_input.get()]
+
+        # create a frame to hold the panel and add it to the grid
+        panel = ttk.Frame(self)
+        panel.grid(row=2,column=5,rowspan=4)
+
+        # create a title label for the panel
+        ttk.Label(panel, text='Similar:').pack()
+
+        # for each similar pokemon create a button that searches for it
+        for similar in self.similar_index.nearest(row, 5, types):
+            name = str(self.similar_index.names[similar])
+            ttk.Button(panel, text=f"{self.similar_index.ids[similar]} - {name.capitalize()}", width=30,
+                       command=lambda name=name:[self.search_input.delete(0, 'end'), self.search_input.insert(0, name), self.single_search_pressed()]).pack()
+
+    def load_stat_table(self):
+        '''
+        subroutine to load the stat table, coverage analyzer and party builder the first time they are needed
+        :param self: instance of application
+        :returns: the stat table (StatTable), or None if it has not been built or was built by an older version
+        '''
+        # if the stat table has not been loaded yet
+        if self.stat_table is None:
+            try:
+                # load the stat table and build the coverage analyzer and party builder from it
+                stat_table = load_stats()
+                self.coverage = CoverageAnalyzer(stat_table)
+                self.party_builder = PartyBuilder(stat_table)
+                self.stat_table = stat_table
+            except (OSError, KeyError):
+                # the stat table has not been built, or was saved before it held every array, e.g. the types or species, and needs rebuilding
+                return None
+
+        return self.stat_table
+
+    def stat_search_page(self):
+        '''
+        subroutine to generate the stat search page
+        :param self: instance of application
+        :returns: None
+        '''
+        # store the name of the page shown
+        self.current_page = 'stat_search'
+
+        # generate the side bar
+        self.side_bar()
+
+        # add an empty label to create space
+        tk.Label(self, width=15).grid(column=1)
+
+        # create a label displaying the current page title
+        tk.Label(self, text='Stat Search:').grid(row=0,column=2)
+
+        # stores the minimum and maximum entry points of each stat
+        self.stat_entries = {}
+
+        # for each stat in the stat table
+        for counter, stat in enumerate(STAT_COLUMNS):
+            # create a label for the stat, adding the unit for weight and height
+            tk.Label(self, text={'weight': 'weight (kg)', 'height': 'height (m)'}.get(stat, stat)).grid(row=1+counter,column=2)
+
+            # create entry points for the minimum and maximum of the stat
+            self.stat_entries[stat] = (ttk.Entry(self, width=8), ttk.Entry(self, width=8))
+
+            # add them to the application grid
+            self.stat_entries[stat][0].grid(row=1+counter,column=3)
+            self.stat_entries[stat][1].grid(row=1+counter,column=4)
+
+        # create a drop down for picking the stat to sort results by and add it to the grid
+        self.sort_input = ttk.Combobox(self, values=STAT_COLUMNS, state='readonly', width=8)
+        self.sort_input.set('speed')
+        self.sort_input.grid(row=1+len(STAT_COLUMNS),column=3)
+
+        # create a button to submit the stat search and add it to the grid
+        self.stat_searching_button = ttk.Button(self, text='Search', width=30, command=self.stat_search_pressed)
+        self.stat_searching_button.grid(row=1+len(STAT_COLUMNS),column=4)
+
+        # create a label to show the results and add it to the grid
+        self.stat_results = tk.Label(self, justify='left')
+        self.stat_results.grid(row=1,column=5,rowspan=len(STAT_COLUMNS))
+
+    def stat_search_pressed(self):
+        '''
+        subroutine for when a stat search is started
+        :param self: instance of application
+        :returns: None
+        '''
+        # clear the grid slot where an error is to be placed
+        self.clear_error()
+
+        # stores the range given for each stat
+        ranges = {}
+
+        try:
+            # for each stat, read the minimum and maximum, leaving empty boxes as an open range
+            for stat, (low_entry, high_entry) in self.stat_entries.items():
+                low = float(low_entry.get()) if low_entry.get() else None
+                high = float(high_entry.get()) if high_entry.get() else None
+
+                # only filter on stats with at least one bound
+                if low is not None or high is not None:
+                    ranges[stat] = (low, high)
+        except ValueError:
+            # show an error message saying that a bound is not a number and add it to the grid
+            self.error = ttk.Label(self, text="Stat ranges must be numbers, please try again.", foreground="red")
+            self.error.grid(row=0,column=3)
+            return
+
+        # load the stat table the first time it is needed
+        if self.load_stat_table() is None:
+            # show an error message saying that the stat table has not been built and add it to the grid
+            self.error = ttk.Label(self, text="The stat table has not been built or is out of date, run stats.py first.", foreground="red")
+            self.error.grid(row=0,column=3)
+            return
+
+        # find the matching pokemon and keep the 20 highest in the chosen stat
+        rows = self.stat_table.top_k(self.sort_input.get(), 20, self.stat_table.filter(**ranges))
+
+        # show each result's ID, name and value of the sorted stat
+        self.stat_results.configure(text='\n'.join(
+            f"{row['id']} - {row['name'].capitalize()} ({row[self.sort_input.get()]:g})"
+            for row in self.stat_table.describe(rows)) or 'No pokemon found.')
+
+    @tracing.action('party_page')
     def party_page(self):
         '''
         Subroutine to generate the party page, which is also
@@ -982,6 +1164,9 @@ class MainApplication(tk.Tk):
         :param self: instance of application
         :returns: None
         '''
+        # store the name of the page shown
+        self.current_page = 'party'
+
         # clear all party slots by running the applications clear_keys subroutine
         self.clear_keys()
 
@@ -994,41 +1179,258 @@ class MainApplication(tk.Tk):
         # add a title label
         tk.Label(self, text='Your party:').grid(row=0,column=2)
 
-        # for each pokemon slot
-        for counter in range(1,7):
-            # if the dataframe has no pokemon in the current slot iteration for the current user
-            if self.user_data.loc[self.current_user['id'], 'Pokemon'+str(counter)] == 'None':
-                # create a label saying "None" to mark an empty pokemon slot
-                tk.Label(self, text='None').grid(row=2,column=1+counter)
-                # restart the loop
-                continue
-            
-            # send a request to pokeapi for the pokemon in the current slot 
-            response = requests.get('https://pokeapi.co/api/v2/pokemon/'+(self.user_data.loc[self.current_user['id'], 'Pokemon'+str(counter)]))
-            # load the response
-            data = json.loads(response.text)
-            # request the pokemons default front sprite
-            image_req = requests.get(data['sprites']['front_default'], stream=True)
+        # paint the party straight away from the snapshot saved the last time it was shown
+        party = self.user_data.loc[self.current_user['id'], PARTY_COLUMNS].tolist()
+        snapshot = load_snapshot(self.current_user['name'])
+        for counter, pokemon in enumerate(party, 1):
+            self.show_party_member(counter, pokemon, snapshot.get('Pokemon'+str(counter)))
 
-            # open an empty image file
-            with open('img.png','wb') as file:
-                # write the requests content to the image to copy it
-                file.write(image_req.content)
+        # then fetch the party in the background, redrawing only the members that changed
+        self.refresh_party(party, snapshot)
 
-            # load and add the image to the applications party attribute
-            self.party['Pokemon'+str(counter)].append(tk.PhotoImage(file='img.png'))
+        # show the type coverage of the party
+        self.party_analysis_panel()
 
-            # delete the image file
-            os.remove('img.png')
+    def atlas_sprite(self, pokedex_id, size='medium'):
+        '''
+        subroutine to get a sprite already scaled to a display size from the sprite atlases, without any network or file access,
+        falling back to the front sprite if that size has not been built
+        :param self: instance of application
+        :param pokedex_id: the pokedex ID of the pokemon (int)
+        :param size: the display size, see atlas.SIZES (str)
+        :returns: the png (bytes), or None if no atlas holds the sprite
+        '''
+        sprite = None
+        for atlas in [self.sprite_atlases[size], self.sprite_atlases['medium']]:
+            if sprite is None and atlas is not None:
+                sprite = atlas.get(pokedex_id)
 
-            # add the label to display the image to the party attribute
-            self.party['Pokemon'+str(counter)].append(tk.Label(self, image=self.party['Pokemon'+str(counter)][0]))
+        # the atlas hands out views of the mapped file, tkinter only passes bytes to tk as binary data so it is copied once here
+        return None if sprite is None else bytes(sprite)
 
-            # display the label created, showing the image
+    def show_party_member(self, counter, pokemon, member):
+        '''
+        subroutine to show a party member, replacing whatever the slot showed before
+        :param self: instance of application
+        :param counter: the party slot, from 1 to 6 (int)
+        :param pokemon: the name saved in the slot, "None" if it is empty (str)
+        :param member: the member from a snapshot, or None if it has not been fetched yet (dict)
+        :returns: None
+        '''
+        # remove what the slot showed before
+        for item in self.party['Pokemon'+str(counter)]:
+            if isinstance(item, tk.Misc):
+                item.destroy()
+        self.party['Pokemon'+str(counter)] = []
+
+        # if the slot is empty, create a label saying "None" to mark it
+        if pokemon == 'None':
+            self.party['Pokemon'+str(counter)].append(tk.Label(self, text='None'))
+            self.party['Pokemon'+str(counter)][0].grid(row=2,column=1+counter)
+            return
+
+        # get the sprite from the atlas if it holds it, otherwise from the snapshot
+        sprite = None if member is None else self.atlas_sprite(member['id'], self.party_sprite_size) or member['sprite']
+
+        # if the member has not been fetched yet, show its saved name until it has
+        if sprite is None or member['name'] != pokemon:
+            self.party['Pokemon'+str(counter)].append(tk.Label(self, text=pokemon.capitalize()))
+            self.party['Pokemon'+str(counter)][0].grid(row=3,column=1+counter)
+            return
+
+        # decode the sprite into a tkinter image, which reads the png or base64 png directly
+        with span('image'):
+            self.party['Pokemon'+str(counter)].append(tk.PhotoImage(data=sprite))
+
+        # build the labels showing the party member
+        with span('widgets'):
+            # add the label to display the image to the party attribute, and display it
+            self.party['Pokemon'+str(counter)].append(tk.Label(self, image=self.party['Pokemon'+str(counter)][0]))
             self.party['Pokemon'+str(counter)][1].grid(row=2,column=1+counter)
 
             # display the pokemons name and ID
-            tk.Label(self, text=str(data['id'])+" - "+data['species']['name'].capitalize()).grid(row=3,column=1+counter)
+            self.party['Pokemon'+str(counter)].append(tk.Label(self, text=str(member['id'])+" - "+member['species'].capitalize()))
+            self.party['Pokemon'+str(counter)][2].grid(row=3,column=1+counter)
+
+        # play the animated sprite straight away if it has already been decoded
+        if animation.enabled:
+            self.animate(self.party['Pokemon'+str(counter)][1], member['id'])
+
+    def animate(self, label, pokedex_id, data=None):
+        '''
+        subroutine to play a pokemon's animated sprite on a label, decoding its frames only the first time it is shown
+        :param self: instance of application
+        :param label: the label showing the still sprite
+        :param pokedex_id: the pokedex ID of the pokemon (int)
+        :param data: the downloaded gif (bytes), or None to only play it if it has already been decoded
+        :returns: None
+        '''
+        frames = self.frame_cache.get(pokedex_id)
+        if frames is None and data is not None:
+            with span('image', 'decode frames'):
+                frames = self.frame_cache.put(pokedex_id, data)
+        if frames is not None:
+            self.animator.play(label, *frames)
+
+    def fetch_animation(self, label, pokedex_id):
+        '''
+        subroutine to download a pokemon's animated sprite on another thread, then play it on a label once it arrives,
+        the still sprite is kept if it cannot be downloaded or the label is gone by then
+        :param self: instance of application
+        :param label: the label showing the still sprite
+        :param pokedex_id: the pokedex ID of the pokemon (int)
+        :returns: None
+        '''
+        # play it straight away if its frames have already been decoded
+        if pokedex_id in self.frame_cache:
+            self.animate(label, pokedex_id)
+            return
+        results = queue.Queue()
+
+        # fetch on another thread, handing back the gif, or None if it could not be downloaded
+        def fetch():
+            data = None
+            try:
+                with span('network', 'animated sprite'):
+                    data = download_gif(pokedex_id)
+            except requests.RequestException:
+                data = None
+            finally:
+                results.put(data)
+        threading.Thread(target=fetch, daemon=True).start()
+
+        # subroutine to check for the result without blocking, running until it arrives
+        def check():
+            try:
+                data = results.get_nowait()
+            except queue.Empty:
+                self.after(PARTY_REFRESH_POLL, check)
+                return
+
+            # the label is destroyed if another search or page was shown first
+            if data is not None and label.winfo_exists():
+                self.animate(label, pokedex_id, data)
+        self.after(PARTY_REFRESH_POLL, check)
+
+    def refresh_party(self, party, snapshot):
+        '''
+        subroutine to fetch the party on another thread, then redraw the members that differ from the snapshot
+        and save a new one, the page is never held up by the network
+        :param self: instance of application
+        :param party: the name saved in each party slot (list)
+        :param snapshot: dictionary of party column to the member painted from the snapshot
+        :returns: None
+        '''
+        # stores which showing of the party page the refresh is for, so it is dropped if the page is left first
+        token = self.party_refresh = object()
+        username = self.current_user['name']
+        results = queue.Queue()
+
+        # stores the animated sprites downloaded that have not been decoded before, decoding waits for the main thread
+        gifs = {}
+        decoded = set(self.frame_cache.animations) if animation.enabled else None
+
+        # fetch on another thread, handing back the members, or None if pokeapi could not be reached or anything else
+        # went wrong, a result is always handed back so check never waits forever
+        def fetch():
+            members = None
+            try:
+                members = fetch_members(party, snapshot, self.sprite_atlases['medium'])
+
+                # the still sprites are still shown if the animated ones cannot be downloaded
+                if decoded is not None:
+                    try:
+                        gifs.update({member['id']: download_gif(member['id']) for member in members.values() if member['id'] not in decoded})
+                    except requests.RequestException:
+                        pass
+            except (requests.RequestException, ValueError):
+                members = None
+            finally:
+                results.put(members)
+        threading.Thread(target=fetch, daemon=True).start()
+
+        # subroutine to check for the result without blocking, running until it arrives
+        def check():
+            if self.party_refresh is not token:
+                return
+            try:
+                members = results.get_nowait()
+            except queue.Empty:
+                self.after(PARTY_REFRESH_POLL, check)
+                return
+            self.party_refresh = None
+
+            # keep showing the snapshot if the party could not be fetched
+            if members is None:
+                return
+
+            # redraw the members that changed, then save the snapshot for next time
+            for counter, column in enumerate(PARTY_COLUMNS, 1):
+                if column in members and members[column] != snapshot.get(column):
+                    self.show_party_member(counter, party[counter-1], members[column])
+            if members != snapshot:
+                save_snapshot(username, members)
+
+            # play the animated sprites, all on the one timer
+            for column in PARTY_COLUMNS:
+                if gifs.get(members.get(column, {}).get('id')) is not None and len(self.party[column]) > 1:
+                    self.animate(self.party[column][1], members[column]['id'], gifs[members[column]['id']])
+        self.after(PARTY_REFRESH_POLL, check)
+
+    def party_analysis_panel(self):
+        '''
+        subroutine to show the offensive and defensive type coverage of the current user's party
+        :param self: instance of application
+        :returns: None
+        '''
+        # show nothing if the stat table has not been built
+        if self.load_stat_table() is None:
+            return
+
+        # analyze the current user's party using the names saved in the dataframe
+        summary = self.coverage.party_summary(self.user_data.loc[self.current_user['id'], PARTY_COLUMNS].tolist())
+
+        # create a label for each part of the analysis and add them to the grid below the party
+        tk.Label(self, text="Super effective against: "+(', '.join(summary['super_effective']) or 'nothing')).grid(row=5,column=2,columnspan=6)
+        tk.Label(self, text="Not covered: "+(', '.join(summary['not_covered']) or 'nothing')).grid(row=6,column=2,columnspan=6)
+        tk.Label(self, text="Party is weak to: "+(', '.join(summary['weak']) or 'nothing')).grid(row=7,column=2,columnspan=6)
+
+        # create a button to suggest pokemon for the empty party slots and add it to the grid
+        self.suggest_button = ttk.Button(self, text='Suggest Party', width=30, command=self.suggest_party_pressed)
+        self.suggest_button.grid(row=8,column=2,columnspan=2)
+
+        # create the label showing the suggestion and the button adding it, shown once the suggest button is pressed
+        # and updated on every press after, rather than stacking new widgets on top of the old ones
+        self.suggestion_label = tk.Label(self, text='')
+        self.suggestion_label.grid(row=9,column=2,columnspan=6)
+        self.add_suggestions_button = ttk.Button(self, text='Add Suggestions', width=30)
+
+    def suggest_party_pressed(self):
+        '''
+        subroutine for when the "suggest party" button is pressed, suggests pokemon
+        for the empty party slots that give the best type coverage and base stats
+        :param self: instance of application
+        :returns: None
+        '''
+        # get the current user's party
+        party = self.user_data.loc[self.current_user['id'], PARTY_COLUMNS].tolist()
+
+        # get the slots that are empty
+        empty = [counter for counter, pokemon in enumerate(party, 1) if pokemon == 'None']
+
+        # suggest pokemon for the empty slots, keeping the current party members
+        suggestion = self.party_builder.suggest(pinned=[pokemon for pokemon in party if pokemon != 'None'], exclude=party)
+
+        # show the suggestion
+        self.suggestion_label.configure(text="Suggested: "+(', '.join(name.capitalize() for name in suggestion) or 'your party is already full'))
+
+        # if there is something to add, show the button that fills the empty slots with the suggestion, otherwise hide it
+        if suggestion:
+            self.add_suggestions_button.configure(
+                command=lambda:[[self.replace_pokemon(pokemon, slot) for pokemon, slot in zip(suggestion, empty)], self.clear_window(), self.party_page()])
+            self.add_suggestions_button.grid(row=8,column=4,columnspan=2)
+        else:
+            self.add_suggestions_button.grid_remove()
 
     def register_page(self):
         '''
@@ -1036,6 +1438,9 @@ class MainApplication(tk.Tk):
         :param self: instance of application
         :returns: None
         '''
+        # store the name of the page shown
+        self.current_page = 'register'
+
         # set the application to not show passwords
         self.password_hidden = True
 
@@ -1084,6 +1489,9 @@ class MainApplication(tk.Tk):
         :param self: instance of application
         :returns: None
         '''
+        # store the name of the page shown
+        self.current_page = 'login'
+
         # set the application to not show passwords
         self.password_hidden = True
 
@@ -1129,6 +1537,9 @@ class MainApplication(tk.Tk):
         :param self: instance of application
         :returns: None
         '''
+        # store the name of the page shown
+        self.current_page = 'start'
+
         # create a spacer label
         self.spacer = ttk.Label(self, padding=150)
 
@@ -1150,17 +1561,11 @@ class MainApplication(tk.Tk):
 
 
 if __name__ == "__main__":
-    # retrieve user data from csv file
-    user_data = pd.read_csv('UserData.csv', index_col=False)
-
-    # reset index of user data
-    user_data.reset_index() 
-    
-    # fill all empty data with None
-    user_data = user_data.fillna('None')
+    # retrieve user data from csv file and every change journalled since it was written
+    store = UserStore('UserData.csv')
     
     # create an instance of the application with the retrieved user data
-    application = MainApplication(dataframe=user_data)
+    application = MainApplication(store=store)
     
     # start the application
     application.start_page()
\ No newline at end of file
@@ -0,0 +1,105 @@
+import logging
+import os
+import tracemalloc
+from collections import Counter
+
+# the logger memory reports are written to
+logger = logging.getLogger('pokedex.memory')
+
+
+def count_widgets(root):
+    '''
+    Counts every live widget below a window by class
+    :param root: the window to count from
+    :returns: Counter of widget class name to count
+    '''
+    counts = Counter()
+
+    # walk the widget tree without recursion
+    stack = list(root.winfo_children())
+    while stack:
+        widget = stack.pop()
+        counts[widget.winfo_class()] += 1
+        stack.extend(widget.winfo_children())
+
+    return counts
+
+
+class MemoryTracker:
+    '''class for reporting live widgets, images and python memory each time the page changes'''
+    def __init__(self, app, frames=10):
+        '''
+        initialises the memory tracker and starts tracemalloc
+        :param self: instance of the memory tracker
+        :param app: the tkinter application to track
+        :param frames: the number of stack frames tracemalloc keeps for each allocation (int)
+        '''
+        # stores the application
+        self.app = app
+
+        # start recording python allocations
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+        # stores the tracemalloc snapshot taken after the last page was cleared
+        self.baseline = None
+
+        # stores the widget and image counts of the last time each page was left, and after clearing it
+        self.pages = {}
+        self.cleared = {}
+
+    def leaving(self, page):
+        '''
+        Records the widgets and images of a page just before it is cleared
+        :param self: instance of the memory tracker
+        :param page: the name of the page being left (str)
+        :returns: None
+        '''
+        self.pages[page] = {'widgets': dict(count_widgets(self.app)), 'images': len(self.app.image_names())}
+
+    def cleared_page(self, page):
+        '''
+        Records what is left once a page has been cleared, which should be the same every time,
+        and logs the python memory that grew since the last page was cleared
+        :param self: instance of the memory tracker
+        :param page: the name of the page that was cleared (str)
+        :returns: None
+        '''
+        # count what survived clearing the page
+        self.cleared = {'widgets': sum(count_widgets(self.app).values()), 'images': len(self.app.image_names()),
+                        'python_bytes': tracemalloc.get_traced_memory()[0]}
+
+        # compare python memory with the last time a page was cleared
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        growth = []
+        if self.baseline is not None:
+            growth = [stat for stat in snapshot.compare_to(self.baseline, 'lineno')[:5] if stat.size_diff > 0]
+        self.baseline = snapshot
+
+        logger.info('left %s page: %s, after clearing: %s widgets, %s images, %.1f KB traced%s',
+                    page, self.pages.get(page), self.cleared['widgets'], self.cleared['images'],
+                    self.cleared['python_bytes'] / 1024, ''.join(f'\n  {stat}' for stat in growth))
+
+    def report(self):
+        '''
+        Gets the latest counts
+        :param self: instance of the memory tracker
+        :returns: dictionary with "pages", the counts of each page when it was last left,
+        and "cleared", the counts after the last page was cleared
+        '''
+        return {'pages': self.pages, 'cleared': self.cleared}
+
+
+def start_from_environment(app):
+    '''
+    Starts a memory tracker on the application if the POKEDEX_MEMTRACK environment variable is 1
+    :param app: the tkinter application to track
+    :returns: the started memory tracker, or None if it is not turned on
+    '''
+    if os.environ.get('POKEDEX_MEMTRACK') != '1':
+        return None
+
+    # make sure the reports are shown
+    logging.basicConfig(level=logging.INFO)
+
+    return MemoryTracker(app)
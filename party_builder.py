@@ -0,0 +1,155 @@
+import numpy as np
+from stats import load_stats, TYPE_NAMES
+from type_coverage import species_matchups
+
+# the number of bits used for each half of a coverage mask, one per type
+TYPE_BITS = len(TYPE_NAMES)
+
+# numpy 2 counts set bits itself, older versions use a lookup table of the number of set bits in every TYPE_BITS long mask,
+# built a bit at a time across every mask at once
+_POPCOUNT = None if hasattr(np, 'bitwise_count') else sum((np.arange(1 << TYPE_BITS, dtype=np.int64) >> bit) & 1 for bit in range(TYPE_BITS))
+
+# how many points one extra covered type is worth, larger than the highest possible party base stat total
+COVERAGE_WEIGHT = 10000
+
+
+def popcount(masks):
+    '''
+    Counts the set bits of coverage masks
+    :param masks: numpy array of masks (int64)
+    :returns: numpy array of the number of set bits in each mask
+    '''
+    if _POPCOUNT is None:
+        return np.bitwise_count(masks).astype(np.int64)
+
+    # count each half of the mask with the lookup table
+    return _POPCOUNT[masks & ((1 << TYPE_BITS) - 1)] + _POPCOUNT[masks >> TYPE_BITS]
+
+
+def coverage_masks(types):
+    '''
+    Builds the coverage bitmask of each pokemon
+    :param types: numpy array of each pokemon's two TYPE_NAMES indexes, -1 for no type
+    :returns: numpy array of int64 masks, the low TYPE_BITS bits are the types the pokemon
+    hits super effectively and the high TYPE_BITS bits are the attacking types it resists
+    '''
+    # get the offensive and defensive matchups of each pokemon
+    offense, defense = species_matchups(types)
+
+    # turn each row of booleans into bits
+    bits = np.int64(1) << np.arange(TYPE_BITS, dtype=np.int64)
+    return (offense @ bits) | ((defense < 1) @ bits) << TYPE_BITS
+
+
+class PartyBuilder:
+    '''class for suggesting the party members that give the best type coverage and base stats'''
+    def __init__(self, table):
+        '''
+        initialises the party builder
+        :param self: instance of the party builder
+        :param table: the stat table to pick pokemon from (StatTable)
+        '''
+        # stores the stat table
+        self.table = table
+
+        # stores the coverage mask of every pokemon
+        self.masks = coverage_masks(table.types)
+
+        # stores the base stat total of every pokemon
+        self.totals = sum(table.columns[stat].astype(np.int64) for stat in ['hp', 'attack', 'defense', 'sp_atk', 'sp_def', 'speed'])
+
+    def candidates(self, exclude=(), types=None, min_total=0, keep=6):
+        '''
+        Finds the pokemon worth considering for a party
+        :param self: instance of the party builder
+        :param exclude: rows that can not be picked
+        :param types: optional list of type names, only pokemon with at least one of them can be picked
+        :param min_total: the lowest base stat total a pokemon can have to be picked (int)
+        :param keep: the number of pokemon kept for each coverage mask (int)
+        :returns: numpy array of candidate rows
+        '''
+        # start with every pokemon meeting the base stat total
+        allowed = self.totals >= min_total
+
+        # remove excluded pokemon
+        allowed[list(exclude)] = False
+
+        # remove pokemon without one of the wanted types
+        if types:
+            allowed &= np.isin(self.table.types, [TYPE_NAMES.index(name) for name in types]).any(axis=1)
+
+        rows = np.flatnonzero(allowed)
+
+        # order the rows by mask, then by highest base stat total
+        rows = rows[np.lexsort((-self.totals[rows], self.masks[rows]))]
+
+        # a pokemon is never better than another with the same mask and a higher total,
+        # so only the best few of each mask are needed to fill every slot
+        first = np.searchsorted(self.masks[rows], self.masks[rows], side='left')
+        return rows[np.arange(len(rows)) - first < keep]
+
+    def suggest(self, pinned=(), slots=6, exclude=(), types=None, min_total=0, beam_width=128):
+        '''
+        Suggests pokemon to fill the empty party slots using a beam search over coverage masks
+        :param self: instance of the party builder
+        :param pinned: pokemon or species names of the party members that must be kept
+        :param slots: the size of the party (int)
+        :param exclude: names of pokemon that can not be suggested
+        :param types: optional list of type names, suggested pokemon must have at least one of them
+        :param min_total: the lowest base stat total a suggested pokemon can have (int)
+        :param beam_width: the number of partial parties kept after filling each slot (int)
+        :returns: list of suggested pokemon names for the empty slots, best first
+        '''
+        # find the rows of the pinned and excluded pokemon, ignoring names not in the table,
+        # though a pinned pokemon missing from the table still takes up its slot
+        pinned_rows = [row for row in map(self.table.find, pinned) if row is not None]
+        excluded_rows = [row for row in map(self.table.find, exclude) if row is not None]
+
+        # find the pokemon that could fill an empty slot
+        rows = self.candidates(pinned_rows + excluded_rows, types, min_total, slots)
+        masks, totals = self.masks[rows], self.totals[rows]
+
+        # start the beam with the pinned party, tracking each party's mask, total and members
+        beam_masks = np.array([np.bitwise_or.reduce(self.masks[pinned_rows]) if pinned_rows else 0], dtype=np.int64)
+        beam_totals = np.array([self.totals[pinned_rows].sum()], dtype=np.int64)
+        beam_members = np.zeros((1, 0), dtype=np.int64)
+
+        # for each empty slot
+        for _ in range(min(slots - len(pinned), len(rows))):
+            # add every candidate to every party in the beam at once
+            new_masks = beam_masks[:, None] | masks[None, :]
+            new_totals = beam_totals[:, None] + totals[None, :]
+            scores = popcount(new_masks) * COVERAGE_WEIGHT + new_totals
+
+            # a pokemon can not be added to a party it is already in
+            scores[np.arange(len(beam_members))[:, None], beam_members] = -1
+
+            # keep the best parties, over-picking because the same party can be reached in several orders
+            flat = np.flatnonzero(scores.ravel() >= 0)
+            if len(flat) == 0:
+                break
+            if len(flat) > 4 * beam_width:
+                flat = flat[np.argpartition(-scores.ravel()[flat], 4 * beam_width - 1)[:4 * beam_width]]
+            flat = flat[np.argsort(-scores.ravel()[flat], kind='stable')]
+            parent, candidate = np.unravel_index(flat, scores.shape)
+
+            # build the members of each kept party, then drop repeated parties keeping the best scored copy
+            members = np.sort(np.column_stack([beam_members[parent], candidate]), axis=1)
+            _, first = np.unique(members, axis=0, return_index=True)
+            keep = np.sort(first)[:beam_width]
+
+            # update the beam with the kept parties
+            beam_masks, beam_totals = new_masks[parent[keep], candidate[keep]], new_totals[parent[keep], candidate[keep]]
+            beam_members = members[keep]
+
+        # pick the best party found, with the strongest members first
+        best = np.argmax(popcount(beam_masks) * COVERAGE_WEIGHT + beam_totals)
+        members = rows[beam_members[best]]
+        members = members[np.argsort(-self.totals[members], kind='stable')]
+
+        return [str(self.table.names[row]) for row in members]
+
+
+if __name__ == "__main__":
+    # suggest a full party from the saved stat table
+    print(PartyBuilder(load_stats()).suggest())
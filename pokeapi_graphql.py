@@ -0,0 +1,89 @@
+import requests
+from projection import PokemonRecord
+from tracing import span
+
+# the url of pokeapi's graphql endpoint
+GRAPHQL_URL = 'https://beta.pokeapi.co/graphql/v1beta'
+
+# query for exactly the fields the application shows of many pokemon at once, matched by name or pokedex ID
+POKEMON_QUERY = '''
+query pokemon($names: [String!]!, $ids: [Int!]!) {
+  pokemon_v2_pokemon(where: {_or: [{name: {_in: $names}}, {id: {_in: $ids}}]}) {
+    id
+    name
+    height
+    weight
+    pokemon_v2_pokemonspecy {
+      name
+      pokemon_v2_pokemonspeciesflavortexts(where: {pokemon_v2_language: {name: {_eq: "en"}}}, order_by: {id: asc}, limit: 1) {
+        flavor_text
+      }
+    }
+    pokemon_v2_pokemontypes(order_by: {slot: asc}) {
+      pokemon_v2_type {
+        name
+      }
+    }
+    pokemon_v2_pokemonabilities(order_by: {slot: asc}) {
+      pokemon_v2_ability {
+        name
+      }
+    }
+    pokemon_v2_pokemonsprites {
+      sprites(path: "front_default")
+    }
+  }
+}
+'''
+
+
+def graphql_record(row):
+    '''
+    Builds a record from one pokemon of a graphql response
+    :param row: the pokemon's fields (dict)
+    :returns: the record (PokemonRecord), including its flavor text
+    '''
+    species = row['pokemon_v2_pokemonspecy']
+    flavor_texts = species['pokemon_v2_pokemonspeciesflavortexts']
+    sprites = row['pokemon_v2_pokemonsprites']
+    return PokemonRecord(
+        row['id'], row['name'], species['name'], sprites[0]['sprites'] if sprites else None,
+        tuple(entry['pokemon_v2_type']['name'] for entry in row['pokemon_v2_pokemontypes']),
+        tuple(entry['pokemon_v2_ability']['name'] for entry in row['pokemon_v2_pokemonabilities']),
+        row['weight'], row['height'], flavor_texts[0]['flavor_text'] if flavor_texts else None)
+
+
+def fetch_records(pokemon, graphql_url=GRAPHQL_URL, session=requests):
+    '''
+    Fetches the details and pokedex entries of many pokemon in a single request
+    :param pokemon: list of pokemon names or pokedex IDs, repeats are allowed (str or int)
+    :param graphql_url: the url of pokeapi's graphql endpoint (str)
+    :param session: the requests session or module to send the request with
+    :returns: list of records (PokemonRecord) in the same order as the pokemon given,
+    raises a ValueError if any of them do not exist
+    '''
+    # split the pokemon into names and pokedex IDs
+    keys = [str(key).lower() for key in pokemon]
+    names = sorted({key for key in keys if not key.isdigit()})
+    ids = sorted({int(key) for key in keys if key.isdigit()})
+
+    # send the query
+    with span('network', 'graphql'):
+        response = session.post(graphql_url, json={'query': POKEMON_QUERY, 'variables': {'names': names, 'ids': ids}})
+        response.raise_for_status()
+
+    # load the response, finding every pokemon by both its name and ID
+    with span('json', 'graphql'):
+        body = response.json()
+        if body.get('errors'):
+            raise ValueError(body['errors'][0]['message'])
+        found = {}
+        for row in body['data']['pokemon_v2_pokemon']:
+            record = graphql_record(row)
+            found[record.name] = found[str(record.id)] = record
+
+    # put the records in the order they were asked for
+    missing = [key for key in keys if key not in found]
+    if missing:
+        raise ValueError(f'pokemon not found: {", ".join(missing)}')
+    return [found[key] for key in keys]
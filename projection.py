@@ -0,0 +1,397 @@
+import json
+import re
+import requests
+from tracing import span
+
+# the number of bytes read from the network at a time
+CHUNK_SIZE = 16384
+
+# matches json whitespace
+_WHITESPACE = re.compile(rb'[ \t\n\r]*+')
+
+# matches a complete json string
+_STRING = re.compile(rb'"[^"\\]*+(?:\\.[^"\\]*+)*+"')
+
+# matches a number, true, false or null
+_SCALAR = re.compile(rb'[^,\]}\s]++')
+
+# matches a run of anything other than brackets, with strings matched whole so brackets inside them are skipped
+_ATOMS = rb'(?:[^"\[\]{}]++|"[^"\\]*+(?:\\.[^"\\]*+)*+")*+'
+
+# matches everything up to and including the next bracket outside of a string
+_NEXT_BRACKET = re.compile(_ATOMS + rb'([\[\]{}])')
+
+
+def _container_pattern(depth):
+    '''
+    Builds a regular expression matching a whole json array or object nested up to a depth,
+    so containers can be skipped in a single match without building any python objects
+    :param depth: the deepest nesting matched (int)
+    :returns: compiled regular expression
+    '''
+    pattern = rb'\[' + _ATOMS + rb'\]|\{' + _ATOMS + rb'\}'
+    for _ in range(depth - 1):
+        inner = rb'(?:[^"\[\]{}]++|"[^"\\]*+(?:\\.[^"\\]*+)*+"|' + pattern + rb')*+'
+        pattern = rb'\[' + inner + rb'\]|\{' + inner + rb'\}'
+    return re.compile(pattern)
+
+
+# matches arrays and objects up to 6 deep, which covers every pokeapi field, deeper ones are skipped bracket by bracket
+_CONTAINER = _container_pattern(6)
+
+
+class PokemonRecord:
+    '''class for the details of a pokemon shown by the application'''
+    __slots__ = ('id', 'name', 'species', 'sprite', 'types', 'abilities', 'weight', 'height', 'flavor_text')
+
+    def __init__(self, id, name, species, sprite, types, abilities, weight, height, flavor_text=None):
+        '''
+        initialises the record
+        :param self: instance of the record
+        :param id: the pokedex ID (int)
+        :param name: the pokemon's name (str)
+        :param species: the pokemon's species name (str)
+        :param sprite: the url of the front facing default sprite (str)
+        :param types: the names of the pokemon's types in slot order (tuple)
+        :param abilities: the names of the pokemon's abilities in slot order, the hidden ability last (tuple)
+        :param weight: the weight in hectograms, as given by pokeapi (int)
+        :param height: the height in decimetres, as given by pokeapi (int)
+        :param flavor_text: the first english pokedex entry, None until the species is fetched (str)
+        '''
+        self.id = id
+        self.name = name
+        self.species = species
+        self.sprite = sprite
+        self.types = types
+        self.abilities = abilities
+        self.weight = weight
+        self.height = height
+        self.flavor_text = flavor_text
+
+
+class _Stream:
+    '''class for reading json from a stream of byte chunks, pulling more only when it is needed'''
+    def __init__(self, chunks):
+        '''
+        initialises the stream
+        :param self: instance of the stream
+        :param chunks: iterable of bytes
+        '''
+        # stores the chunks still to be read
+        self.chunks = iter(chunks)
+
+        # stores the unread part of the stream and the read position within it
+        self.buf = bytearray()
+        self.pos = 0
+
+        # stores the position of a value being read, which must be kept when the buffer is trimmed
+        self.keep = None
+
+        # stores whether every chunk has been read
+        self.finished = False
+
+    def more(self):
+        '''
+        Reads the next chunk into the buffer, dropping the bytes already read
+        :param self: instance of the stream
+        :returns: False if the stream has ended, otherwise True (bool)
+        '''
+        # drop everything before the read position, or before the value being read
+        cut = self.pos if self.keep is None else self.keep
+        if cut > CHUNK_SIZE:
+            del self.buf[:cut]
+            self.pos -= cut
+            if self.keep is not None:
+                self.keep -= cut
+
+        # read the next chunk
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.finished = True
+            return False
+        self.buf += chunk
+        return True
+
+    def need(self):
+        '''
+        Reads the next chunk, raising an error if the stream ended in the middle of a value
+        :param self: instance of the stream
+        :returns: None
+        '''
+        if not self.more():
+            raise ValueError('json ended unexpectedly')
+
+    def peek(self):
+        '''
+        Skips whitespace and gets the next character without reading it
+        :param self: instance of the stream
+        :returns: the next character (bytes)
+        '''
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos+1]
+            self.need()
+
+    def expect(self, character):
+        '''
+        Reads a character, raising an error if it is not the one expected
+        :param self: instance of the stream
+        :param character: the expected character (bytes)
+        :returns: None
+        '''
+        if self.peek() != character:
+            raise ValueError(f'expected {character!r} at byte {self.pos}')
+        self.pos += 1
+
+    def match(self, pattern):
+        '''
+        Matches a pattern at the read position, reading more chunks if the match
+        fails or runs into the end of the buffer, since it may continue in the next chunk
+        :param self: instance of the stream
+        :param pattern: compiled regular expression
+        :returns: the end of the match (int)
+        '''
+        while True:
+            found = pattern.match(self.buf, self.pos)
+            if found is not None and (found.end() < len(self.buf) or self.finished):
+                return found.end()
+            if not self.more() and found is None:
+                raise ValueError(f'invalid json at byte {self.pos}')
+
+    def skip_container(self):
+        '''
+        Skips over an array or object without building it
+        :param self: instance of the stream
+        :returns: None
+        '''
+        # try to match the whole container at once, doubling the buffered bytes after each failed try
+        while True:
+            found = _CONTAINER.match(self.buf, self.pos)
+            if found is not None:
+                self.pos = found.end()
+                return
+            if self.finished:
+                break
+            wanted = 2 * (len(self.buf) - self.pos)
+            while len(self.buf) - self.pos < wanted and self.more():
+                pass
+
+        # the container is nested deeper than the pattern, so count brackets one at a time
+        depth = 0
+        while True:
+            found = _NEXT_BRACKET.match(self.buf, self.pos)
+            if found is None:
+                self.need()
+                continue
+            self.pos = found.end()
+            if found.group(1) in b'[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def skip_value(self):
+        '''
+        Skips over any json value without building it
+        :param self: instance of the stream
+        :returns: None
+        '''
+        character = self.peek()
+        if character in b'[{':
+            self.skip_container()
+        elif character == b'"':
+            self.pos = self.match(_STRING)
+        else:
+            self.pos = self.match(_SCALAR)
+
+    def read_value(self):
+        '''
+        Reads and builds a json value
+        :param self: instance of the stream
+        :returns: the value
+        '''
+        self.peek()
+
+        # find the end of the value, keeping its start when the buffer is trimmed
+        self.keep = self.pos
+        self.skip_value()
+        start, self.keep = self.keep, None
+
+        return json.loads(self.buf[start:self.pos])
+
+    def read_key(self):
+        '''
+        Reads an object key and the colon after it
+        :param self: instance of the stream
+        :returns: the key (str)
+        '''
+        key = self.read_value()
+        self.expect(b':')
+        return key
+
+    def finish_container(self):
+        '''
+        Skips the rest of the array or object the read position is inside of
+        :param self: instance of the stream
+        :returns: None
+        '''
+        depth = 1
+        while True:
+            found = _NEXT_BRACKET.match(self.buf, self.pos)
+            if found is None:
+                self.need()
+                continue
+            self.pos = found.end()
+            if found.group(1) in b'[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+
+def first_english(stream, last):
+    '''
+    Reads the text of the first english entry of an array of pokeapi flavor text or
+    effect entries, building only the entries before it
+    :param stream: the stream positioned at the array (_Stream)
+    :param last: whether nothing else is needed after this, so the rest of the array can be left unread (bool)
+    :returns: the text of the entry, or None if there is no english entry (str)
+    '''
+    stream.expect(b'[')
+    while True:
+        character = stream.peek()
+        if character == b']':
+            stream.pos += 1
+            return None
+        if character == b',':
+            stream.pos += 1
+            continue
+
+        # read one entry, stopping at the first english one
+        entry = stream.read_value()
+        if entry['language']['name'] == 'en':
+            if not last:
+                stream.finish_container()
+            return entry.get('flavor_text')
+
+
+def project_object(stream, spec, top=False):
+    '''
+    Reads only the wanted fields of a json object
+    :param stream: the stream positioned at the object (_Stream)
+    :param spec: dictionary of the wanted keys, True builds the whole value and a function reads the value itself,
+    given the stream and whether it is the last key needed
+    :param top: whether this is the outermost object, which is left unread once every wanted key is found (bool)
+    :returns: dictionary of the wanted keys found
+    '''
+    # stores the values read and the keys still wanted
+    result = {}
+    remaining = set(spec)
+
+    stream.expect(b'{')
+    while True:
+        character = stream.peek()
+        if character == b'}':
+            stream.pos += 1
+            return result
+        if character == b',':
+            stream.pos += 1
+            continue
+
+        key = stream.read_key()
+        rule = spec.get(key)
+        remaining.discard(key)
+
+        # skip unwanted values, build or read wanted ones
+        if rule is None:
+            stream.skip_value()
+        elif rule is True:
+            result[key] = stream.read_value()
+        else:
+            result[key] = rule(stream, top and not remaining)
+
+        # stop reading once everything wanted has been found
+        if top and not remaining:
+            return result
+
+
+def project(chunks, spec):
+    '''
+    Reads only the wanted fields of a json document from a stream of chunks,
+    stopping as soon as every wanted field has been found
+    :param chunks: iterable of bytes
+    :param spec: the wanted fields, see project_object
+    :returns: dictionary of the wanted fields found
+    '''
+    return project_object(_Stream(chunks), spec, top=True)
+
+
+# the fields of a /pokemon-species/ response used by the application
+SPECIES_SPEC = {
+    'flavor_text_entries': first_english
+}
+
+
+def pokemon_record(data):
+    '''
+    Builds a record from the fields of a /pokemon/ response
+    :param data: the loaded response (dict)
+    :returns: the record (PokemonRecord)
+    '''
+    return PokemonRecord(
+        data['id'], data['name'], data['species']['name'], data['sprites']['front_default'],
+        tuple(entry['type']['name'] for entry in sorted(data['types'], key=lambda entry: entry['slot'])),
+        tuple(entry['ability']['name'] for entry in sorted(data['abilities'], key=lambda entry: entry['slot'])),
+        data['weight'], data['height'])
+
+
+def stream_json(url, spec, session=requests, name=None):
+    '''
+    Requests a url and projects the wanted fields from the response as it downloads
+    :param url: the url to request (str)
+    :param spec: the wanted fields, see project_object
+    :param session: the requests session or module to send the request with
+    :param name: the name the request is shown under when tracing (str)
+    :returns: dictionary of the wanted fields found
+    '''
+    # send the request, only waiting for the headers
+    with span('network', name):
+        response = session.get(url, stream=True)
+
+    # closing the response stops the download, so the rest of the body is never read,
+    # the time spent parsing includes waiting for the chunks of the body still downloading
+    with response:
+        response.raise_for_status()
+        with span('json', name):
+            return project(response.iter_content(CHUNK_SIZE), spec)
+
+
+def fetch_pokemon(pokemon, api_url='https://pokeapi.co/api/v2/', session=requests):
+    '''
+    Fetches the details of a pokemon used by the application, the fields used are spread through the whole response
+    with the weight last, so nothing is saved by stopping early and json.loads builds it all faster than projecting
+    can skip the moves array
+    :param pokemon: the name or pokedex ID of the pokemon (str or int)
+    :param api_url: the base url of pokeapi (str)
+    :param session: the requests session or module to send the request with
+    :returns: the record (PokemonRecord), without its flavor text
+    '''
+    with span('network', 'pokemon'):
+        response = session.get(api_url+'pokemon/'+str(pokemon))
+        response.raise_for_status()
+    with span('json', 'pokemon'):
+        return pokemon_record(json.loads(response.content))
+
+
+def fetch_flavor_text(pokedex_id, api_url='https://pokeapi.co/api/v2/', session=requests):
+    '''
+    Fetches the first english pokedex entry of a pokemon, stopping the download once it is found
+    :param pokedex_id: the pokedex ID of the pokemon (int)
+    :param api_url: the base url of pokeapi (str)
+    :param session: the requests session or module to send the request with
+    :returns: the pokedex entry, or None if there is no english entry (str)
+    '''
+    return stream_json(api_url+'pokemon-species/'+str(pokedex_id), SPECIES_SPEC, session, 'species').get('flavor_text_entries')
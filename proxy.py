@@ -0,0 +1,371 @@
+import argparse
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+# the logger proxy reports are written to
+logger = logging.getLogger('pokedex.proxy')
+
+# the upstream url served under each path of the proxy
+UPSTREAMS = {
+    '/api/v2/': 'https://pokeapi.co/api/v2/',
+    '/graphql/v1beta': 'https://beta.pokeapi.co/graphql/v1beta',
+    '/sprites/': 'https://raw.githubusercontent.com/PokeAPI/sprites/master/'
+}
+
+# the path the proxy's hit rates are served from
+STATS_PATH = '/_stats'
+
+
+class ResponseCache:
+    '''class for the upstream responses kept by the proxy, dropping the least recently used once it is full'''
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        '''
+        initialises the cache
+        :param self: instance of the cache
+        :param max_bytes: the most response bytes kept at once (int)
+        '''
+        # stores each response as (status, content type, body) by its key, the least recently used first
+        self.entries = OrderedDict()
+        self.size = 0
+        self.max_bytes = max_bytes
+
+        # stores the upstream fetches in progress by their key, so identical fetches wait on one another
+        self.pending = {}
+
+        # guards the entries and pending fetches, which are used from every request thread
+        self.lock = threading.Lock()
+
+    def get_or_fetch(self, key, fetch):
+        '''
+        Gets a response from the cache, fetching it once if it is missing no matter how many threads ask for it at the same time
+        :param self: instance of the cache
+        :param key: the key of the response (str)
+        :param fetch: function called with no arguments returning (status, content type, body) and whether it may be cached
+        :returns: tuple of the response and how it was found, "hit", "miss" or "coalesced"
+        '''
+        with self.lock:
+            # serve a cached response, marking it as the most recently used
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key], 'hit'
+
+            # wait for a fetch of the same response that is already in progress
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return future.result(), 'coalesced'
+
+        # fetch the response, passing it or the error to every waiting thread
+        try:
+            response, cacheable = fetch()
+        except Exception as error:
+            with self.lock:
+                del self.pending[key]
+            future.set_exception(error)
+            raise
+
+        with self.lock:
+            del self.pending[key]
+            if cacheable:
+                self.store(key, response)
+        future.set_result(response)
+        return response, 'miss'
+
+    def store(self, key, response):
+        '''
+        Adds a response, dropping the least recently used until it fits, the lock must be held
+        :param self: instance of the cache
+        :param key: the key of the response (str)
+        :param response: tuple of status, content type and body
+        :returns: None
+        '''
+        # responses bigger than the whole cache are not kept
+        if len(response[2]) > self.max_bytes:
+            return
+        self.entries[key] = response
+        self.size += len(response[2])
+        while self.size > self.max_bytes:
+            _, dropped = self.entries.popitem(last=False)
+            self.size -= len(dropped[2])
+
+
+class CachingProxy:
+    '''class for a local http server that caches pokeapi and its sprites for every pokedex on the network'''
+    def __init__(self, upstreams=UPSTREAMS, host='0.0.0.0', port=8080, max_bytes=512 * 1024 * 1024):
+        '''
+        initialises the proxy and starts it in the background
+        :param self: instance of the proxy
+        :param upstreams: dictionary of proxy path prefix to the upstream url served under it
+        :param host: the address to listen on, 0.0.0.0 serves the whole network (str)
+        :param port: the port to listen on, 0 picks any free port (int)
+        :param max_bytes: the most response bytes cached at once (int)
+        '''
+        # stores the upstreams, longest prefix first so the most specific one is matched
+        self.upstreams = dict(sorted(upstreams.items(), key=lambda item: -len(item[0])))
+
+        # stores the cached responses
+        self.cache = ResponseCache(max_bytes)
+
+        # stores the number of requests found each way, and the bytes served and fetched
+        self.counts = {'hit': 0, 'miss': 0, 'coalesced': 0, 'error': 0, 'bytes_served': 0, 'bytes_fetched': 0}
+        self.counts_lock = threading.Lock()
+
+        # stores a requests session for each thread, so connections to the upstreams are reused
+        self.sessions = threading.local()
+
+        # start the server, serving each request on its own thread
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.host = f'http://{"127.0.0.1" if host == "0.0.0.0" else host}:{self.server.server_address[1]}'
+
+        # stores the base urls to give the application in place of pokeapi's
+        self.url = self.host + '/api/v2/'
+        self.graphql_url = self.host + '/graphql/v1beta'
+
+        # run the server in the background
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def session(self):
+        '''
+        Gets the requests session of the current thread
+        :param self: instance of the proxy
+        :returns: requests session
+        '''
+        if not hasattr(self.sessions, 'session'):
+            self.sessions.session = requests.Session()
+        return self.sessions.session
+
+    def upstream_url(self, path):
+        '''
+        Finds the upstream url of a path requested from the proxy
+        :param self: instance of the proxy
+        :param path: the requested path, including any query string (str)
+        :returns: the upstream url, or None if the path is not proxied (str)
+        '''
+        for prefix, upstream in self.upstreams.items():
+            if path.startswith(prefix):
+                return upstream + path[len(prefix):]
+        return None
+
+    def fetch(self, method, url, body):
+        '''
+        Fetches a response from an upstream
+        :param self: instance of the proxy
+        :param method: "GET" or "POST" (str)
+        :param url: the upstream url (str)
+        :param body: the request body sent with a POST (bytes)
+        :returns: tuple of the response as (status, content type, body), and whether it may be cached
+        '''
+        if method == 'POST':
+            response = self.session().post(url, data=body, headers={'Content-Type': 'application/json'})
+        else:
+            response = self.session().get(url)
+        with self.counts_lock:
+            self.counts['bytes_fetched'] += len(response.content)
+
+        # pokeapi's data never changes, so successes and not founds are kept, but server errors are retried
+        return (response.status_code, response.headers.get('Content-Type', 'application/octet-stream'),
+                response.content), response.status_code < 500
+
+    def rewrite(self, body, base):
+        '''
+        Points every upstream url in a json response at the proxy, so sprites and linked resources are fetched through it too
+        :param self: instance of the proxy
+        :param body: the response body (bytes)
+        :param base: the proxy's url as the client reached it, e.g. http://192.168.1.5:8080 (str)
+        :returns: the rewritten body (bytes)
+        '''
+        # replace the longest upstream urls first, in case one contains another
+        for prefix, upstream in sorted(self.upstreams.items(), key=lambda item: -len(item[1])):
+            target = base + prefix
+            body = body.replace(upstream.encode('utf-8'), target.encode('utf-8'))
+
+            # urls inside json may also have their slashes escaped
+            body = body.replace(upstream.replace('/', '\\/').encode('utf-8'), target.replace('/', '\\/').encode('utf-8'))
+        return body
+
+    def count(self, found, served):
+        '''
+        Counts a served request
+        :param self: instance of the proxy
+        :param found: how the response was found, "hit", "miss", "coalesced" or "error" (str)
+        :param served: the bytes sent to the client (int)
+        :returns: None
+        '''
+        with self.counts_lock:
+            self.counts[found] += 1
+            self.counts['bytes_served'] += served
+
+    def stats(self):
+        '''
+        Gets how many requests were served from the cache
+        :param self: instance of the proxy
+        :returns: dictionary of the request counts, hit rate and cache size
+        '''
+        with self.counts_lock:
+            counts = dict(self.counts)
+        requested = counts['hit'] + counts['miss'] + counts['coalesced']
+        return {
+            **counts,
+            'hit_rate': (counts['hit'] + counts['coalesced']) / requested if requested else 0.0,
+            'cached_responses': len(self.cache.entries),
+            'cached_bytes': self.cache.size
+        }
+
+    def handler(self):
+        '''
+        Creates the request handler class used by the server
+        :param self: instance of the proxy
+        :returns: request handler class
+        '''
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            '''class for handling a single request to the proxy'''
+            # keep connections open between requests
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self):
+                '''
+                Handles the requests on a connection, ignoring clients that close it part way through a response
+                :param self: instance of the request handler
+                :returns: None
+                '''
+                try:
+                    super().handle()
+                except ConnectionError:
+                    pass
+
+            def do_GET(self):
+                '''
+                Serves a request for pokemon data or a sprite, or the proxy's hit rates
+                :param self: instance of the request handler
+                :returns: None
+                '''
+                if self.path == STATS_PATH:
+                    self.send(200, 'application/json', json.dumps(proxy.stats(), indent=2).encode('utf-8'))
+                else:
+                    self.proxy('GET', self.path, b'')
+
+            def do_POST(self):
+                '''
+                Serves a graphql query, identical queries share one cached response
+                :param self: instance of the request handler
+                :returns: None
+                '''
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self.proxy('POST', self.path, body)
+
+            def proxy(self, method, path, body):
+                '''
+                Serves a request from the cache, fetching it from the upstream if it is missing
+                :param self: instance of the request handler
+                :param method: "GET" or "POST" (str)
+                :param path: the requested path (str)
+                :param body: the request body (bytes)
+                :returns: None
+                '''
+                url = proxy.upstream_url(path)
+                if url is None:
+                    self.send(404, 'text/plain', b'Not Found')
+                    return
+
+                # queries are cached by their contents as well as their path
+                key = method + ' ' + path + (' ' + hashlib.sha256(body).hexdigest() if method == 'POST' else '')
+
+                try:
+                    (status, kind, content), found = proxy.cache.get_or_fetch(key, lambda: proxy.fetch(method, url, body))
+                except requests.RequestException as error:
+                    proxy.count('error', 0)
+                    self.send(502, 'text/plain', str(error).encode('utf-8'))
+                    return
+
+                # point urls in json at the proxy, using the address this client reached it by
+                if 'json' in kind:
+                    content = proxy.rewrite(content, 'http://' + self.headers.get('Host', proxy.host[len('http://'):]))
+
+                proxy.count(found, len(content))
+                self.send(status, kind, content)
+
+            def send(self, status, kind, content):
+                '''
+                Sends a response
+                :param self: instance of the request handler
+                :param status: the http status code (int)
+                :param kind: the content type (str)
+                :param content: the response body (bytes)
+                :returns: None
+                '''
+                self.send_response(status)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                '''
+                Silences the log line printed for each request
+                '''
+                return
+
+        return Handler
+
+    def close(self):
+        '''
+        Stops the proxy
+        :param self: instance of the proxy
+        :returns: None
+        '''
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def parse_upstream(text):
+    '''
+    Reads an upstream from the command line
+    :param text: a proxy path prefix and upstream url, e.g. "/api/v2/=https://pokeapi.co/api/v2/" (str)
+    :returns: tuple of the prefix and url
+    '''
+    prefix, separator, url = text.partition('=')
+    if not separator or not prefix.startswith('/'):
+        raise argparse.ArgumentTypeError('upstreams are given as /path/prefix=https://upstream/url/')
+    return prefix, url
+
+
+if __name__ == "__main__":
+    # read the command line options
+    parser = argparse.ArgumentParser(description='Cache pokeapi and its sprites for every pokedex on the network.')
+    parser.add_argument('--host', default='0.0.0.0', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    parser.add_argument('--max-mb', type=int, default=512, help='megabytes of responses to keep cached')
+    parser.add_argument('--upstream', type=parse_upstream, action='append', help='replace an upstream, e.g. /api/v2/=http://mirror/api/v2/')
+    parser.add_argument('--report-interval', type=float, default=60.0, help='seconds between hit rate reports')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # start the proxy
+    proxy = CachingProxy({**UPSTREAMS, **dict(args.upstream or [])}, args.host, args.port, args.max_mb * 1024 * 1024)
+    print(f'Serving pokeapi at {proxy.url}, set POKEDEX_API_URL to this on each client')
+    print(f'Serving graphql at {proxy.graphql_url}, set POKEDEX_GRAPHQL_URL to this on each client')
+
+    # report the hit rates until stopped
+    stopped = threading.Event()
+    try:
+        while not stopped.wait(args.report_interval):
+            logger.info('%s', proxy.stats())
+    except KeyboardInterrupt:
+        proxy.close()
+        logger.info('%s', proxy.stats())
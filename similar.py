@@ -0,0 +1,124 @@
+import numpy as np
+from stats import load_stats, TYPE_NAMES
+
+# the file the precomputed feature matrix is saved to and loaded from
+FEATURES_FILE = 'PokemonFeatures.npz'
+
+# the base stats used to compare pokemon
+FEATURE_STATS = ['hp', 'attack', 'defense', 'sp_atk', 'sp_def', 'speed']
+
+# how much sharing a type counts for compared to one standard deviation of a stat
+TYPE_WEIGHT = 1.5
+
+
+class SimilarityIndex:
+    '''class for finding the pokemon with the closest base stats and types to another pokemon'''
+    def __init__(self, ids, names, types, features):
+        '''
+        initialises the similarity index
+        :param self: instance of the similarity index
+        :param ids: numpy array of pokedex IDs
+        :param names: numpy array of pokemon names
+        :param types: numpy array of each row's two TYPE_NAMES indexes, as held by the stat table
+        :param features: normalized feature matrix with one row per pokemon
+        '''
+        # stores the pokedex ID of each row
+        self.ids = ids
+
+        # stores the name of each row
+        self.names = names
+
+        # stores the first and second type of each row
+        self.types = types
+
+        # stores the feature vector of each row
+        self.features = features
+
+        # stores the squared length of each feature vector so distances only need one matrix-vector product
+        self.norms = np.einsum('ij,ij->i', features, features)
+
+    def find(self, pokedex_id):
+        '''
+        Finds the row of a pokemon by binary searching the IDs, which are kept in pokedex order
+        :param self: instance of the similarity index
+        :param pokedex_id: the pokedex ID of the pokemon (int)
+        :returns: the row index (int), or None if the pokemon is not in the index
+        '''
+        row = int(np.searchsorted(self.ids, pokedex_id))
+        if row < len(self.ids) and self.ids[row] == pokedex_id:
+            return row
+        return None
+
+    def nearest(self, row, k=5, types=None):
+        '''
+        Finds the pokemon most similar to a pokemon
+        :param self: instance of the similarity index
+        :param row: the row of the pokemon to compare against (int)
+        :param k: the number of similar pokemon to find (int)
+        :param types: optional list of type names, only pokemon with at least one of them are returned
+        :returns: numpy array of up to k row indices, most similar first
+        '''
+        # get the squared distance of every row to the chosen row
+        distances = self.norms - 2 * (self.features @ self.features[row]) + self.norms[row]
+
+        # never suggest the pokemon itself
+        distances[row] = np.inf
+
+        # remove every pokemon without one of the wanted types
+        if types:
+            wanted = [TYPE_NAMES.index(name) for name in types]
+            distances[~np.isin(self.types, wanted).any(axis=1)] = np.inf
+
+        # only keep rows that are still candidates
+        candidates = np.flatnonzero(np.isfinite(distances))
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(distances[candidates], k - 1)[:k]]
+
+        # sort the closest rows, nearest first
+        return candidates[np.argsort(distances[candidates], kind='stable')]
+
+    def save(self, path=FEATURES_FILE):
+        '''
+        Saves the index to a numpy archive
+        :param self: instance of the similarity index
+        :param path: the file to save to (str)
+        :returns: None
+        '''
+        np.savez(path, ids=self.ids, names=self.names, types=self.types, features=self.features)
+
+
+def build_index(table):
+    '''
+    Builds the normalized feature matrix from a stat table
+    :param table: the stat table to build from (StatTable)
+    :returns: the built similarity index (SimilarityIndex)
+    '''
+    # stack the base stats into a matrix with one row per pokemon
+    stats = np.column_stack([table.columns[stat] for stat in FEATURE_STATS]).astype(np.float32)
+
+    # scale each stat to have a mean of 0 and a standard deviation of 1 so no stat outweighs the others
+    stats = (stats - stats.mean(axis=0)) / np.maximum(stats.std(axis=0), 1e-6)
+
+    # one hot encode the types of each pokemon
+    type_matrix = np.zeros((len(table), len(TYPE_NAMES)), dtype=np.float32)
+    for slot in range(2):
+        has_type = table.types[:, slot] >= 0
+        type_matrix[np.flatnonzero(has_type), table.types[has_type, slot]] = TYPE_WEIGHT
+
+    return SimilarityIndex(table.ids, table.names, table.types, np.hstack([stats, type_matrix]))
+
+
+def load_index(path=FEATURES_FILE):
+    '''
+    Loads a similarity index saved with SimilarityIndex.save
+    :param path: the file to load from (str)
+    :returns: the loaded similarity index (SimilarityIndex)
+    '''
+    # open the archive without allowing pickled objects
+    with np.load(path, allow_pickle=False) as archive:
+        return SimilarityIndex(archive['ids'], archive['names'], archive['types'], archive['features'])
+
+
+if __name__ == "__main__":
+    # precompute the feature matrix from the saved stat table
+    build_index(load_stats()).save()
@@ -0,0 +1,85 @@
+import base64
+import hashlib
+import json
+import os
+
+import requests
+
+import datasource
+from tracing import span
+from userstore import PARTY_COLUMNS
+
+# the folder each user's party snapshot is saved in
+SNAPSHOT_DIR = 'snapshots'
+
+
+def snapshot_path(username, folder=SNAPSHOT_DIR):
+    '''
+    Gets the file a user's party snapshot is saved in, named by a hash so any username makes a valid file name
+    :param username: the user (str)
+    :param folder: the folder snapshots are saved in (str)
+    :returns: the path (str)
+    '''
+    return os.path.join(folder, hashlib.sha256(username.encode('utf-8')).hexdigest()[:32] + '.json')
+
+
+def load_snapshot(username, folder=SNAPSHOT_DIR):
+    '''
+    Loads what the party page showed the last time a user saw it
+    :param username: the user (str)
+    :param folder: the folder snapshots are saved in (str)
+    :returns: dictionary of party column to member (dict), empty if there is no snapshot
+    '''
+    try:
+        with open(snapshot_path(username, folder), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_snapshot(username, members, folder=SNAPSHOT_DIR):
+    '''
+    Saves what the party page shows, writing beside the old snapshot and swapping it in so a reader never sees half a file
+    :param username: the user (str)
+    :param members: dictionary of party column to member (dict)
+    :param folder: the folder snapshots are saved in (str)
+    :returns: None
+    '''
+    os.makedirs(folder, exist_ok=True)
+    path = snapshot_path(username, folder)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(members, file, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+def fetch_members(party, snapshot=None, atlas=None):
+    '''
+    Fetches everything the party page shows about a party, only downloading the sprites the snapshot does not already hold
+    :param party: the name saved in each party slot, "None" for an empty slot (list)
+    :param snapshot: optional dictionary of party column to member from the last time the party was shown
+    :param atlas: optional sprite atlas, the sprites it holds are never downloaded or saved (SpriteAtlas)
+    :returns: dictionary of party column to member, a dictionary with the saved "name", the pokedex "id", the "species",
+    the "sprite_url" and the "sprite" as base64 encoded png, which tkinter reads directly, or None if the atlas holds it
+    '''
+    snapshot = snapshot or {}
+
+    # fetch every pokemon in the party at once, a single request when using graphql
+    records = iter(datasource.fetch_records([pokemon for pokemon in party if pokemon != 'None']))
+
+    members = {}
+    for column, pokemon in zip(PARTY_COLUMNS, party):
+        if pokemon == 'None':
+            continue
+        record = next(records)
+
+        # reuse the sprite already saved unless it has moved
+        old = snapshot.get(column, {})
+        sprite = old.get('sprite') if old.get('sprite_url') == record.sprite else None
+        if sprite is None and (atlas is None or atlas.get(record.id) is None):
+            with span('network', 'sprite'):
+                response = requests.get(record.sprite)
+                response.raise_for_status()
+            sprite = base64.b64encode(response.content).decode('ascii')
+
+        members[column] = {'name': pokemon, 'id': record.id, 'species': record.species, 'sprite_url': record.sprite, 'sprite': sprite}
+    return members
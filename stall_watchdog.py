@@ -0,0 +1,150 @@
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+
+# the logger stalls are reported to
+logger = logging.getLogger('pokedex.watchdog')
+
+# the upper bound in milliseconds of each stall histogram bucket, the last bucket holds everything longer
+STALL_BUCKETS_MS = [100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class StallWatchdog:
+    '''class for detecting when the tkinter event loop is blocked, recording what the main thread was doing'''
+    def __init__(self, app, interval=0.05, threshold=0.2):
+        '''
+        initialises the watchdog, call start to begin watching
+        :param self: instance of the watchdog
+        :param app: the tkinter application whose event loop is watched
+        :param interval: seconds between heartbeats (float)
+        :param threshold: seconds without a heartbeat before the loop counts as stalled (float)
+        '''
+        # stores the application
+        self.app = app
+
+        # stores the heartbeat interval and stall threshold
+        self.interval = interval
+        self.threshold = threshold
+
+        # stores the perf_counter time of the last heartbeat, written by the main thread and read by the watching thread
+        self.last_beat = time.perf_counter()
+
+        # stores the id of the main thread, whose stack is captured during a stall
+        self.main_thread = threading.main_thread().ident
+
+        # stores the stack captured during the current stall, None while the loop is running normally
+        self.stall_stack = None
+
+        # stores the bucket counts of stall durations
+        self.stalls = [0] * (len(STALL_BUCKETS_MS) + 1)
+
+        # stores the duration and stack of the longest stalls
+        self.worst = []
+
+        # stores whether the watchdog is running
+        self.running = False
+
+    def start(self):
+        '''
+        Starts the heartbeat and the watching thread
+        :param self: instance of the watchdog
+        :returns: None
+        '''
+        self.running = True
+        self.last_beat = time.perf_counter()
+        self.app.after(int(self.interval * 1000), self.beat)
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def stop(self):
+        '''
+        Stops the heartbeat and the watching thread
+        :param self: instance of the watchdog
+        :returns: None
+        '''
+        self.running = False
+
+    def beat(self):
+        '''
+        The heartbeat, run by the event loop every interval, ending any stall in progress
+        :param self: instance of the watchdog
+        :returns: None
+        '''
+        now = time.perf_counter()
+
+        # the time since the last heartbeat, beyond the interval, is how long the loop was blocked
+        blocked = now - self.last_beat - self.interval
+        self.last_beat = now
+
+        # if the loop was blocked for longer than the threshold, record the stall
+        if blocked >= self.threshold:
+            self.record(blocked, self.stall_stack)
+        self.stall_stack = None
+
+        # schedule the next heartbeat
+        if self.running:
+            self.app.after(int(self.interval * 1000), self.beat)
+
+    def watch(self):
+        '''
+        Runs on a side thread, capturing the main thread's stack as soon as a stall passes the threshold
+        :param self: instance of the watchdog
+        :returns: None
+        '''
+        while self.running:
+            time.sleep(self.interval / 2)
+
+            # if the heartbeat is overdue and this stall's stack has not been captured yet
+            if self.stall_stack is None and time.perf_counter() - self.last_beat - self.interval >= self.threshold:
+                frame = sys._current_frames().get(self.main_thread)
+                if frame is not None:
+                    self.stall_stack = ''.join(traceback.format_stack(frame))
+
+    def record(self, blocked, stack):
+        '''
+        Records a finished stall and logs it with the stack captured while it was happening
+        :param self: instance of the watchdog
+        :param blocked: how long the event loop was blocked in seconds (float)
+        :param stack: the main thread's stack during the stall, None if it was not captured in time (str)
+        :returns: None
+        '''
+        milliseconds = blocked * 1000
+
+        # add the stall to the histogram
+        self.stalls[bisect_left(STALL_BUCKETS_MS, milliseconds)] += 1
+
+        # keep the ten longest stalls
+        self.worst.append((milliseconds, stack))
+        self.worst = sorted(self.worst, key=lambda stall: -stall[0])[:10]
+
+        logger.warning('event loop stalled for %.0f ms, main thread was at:\n%s', milliseconds, stack or '(stack not captured)')
+
+    def histogram(self):
+        '''
+        Gets the stall duration histogram
+        :param self: instance of the watchdog
+        :returns: dictionary of bucket label to stall count
+        '''
+        labels = [f'<={bound}ms' for bound in STALL_BUCKETS_MS] + [f'>{STALL_BUCKETS_MS[-1]}ms']
+        return dict(zip(labels, self.stalls))
+
+
+def start_from_environment(app):
+    '''
+    Starts a watchdog on the application if the POKEDEX_WATCHDOG environment variable is 1,
+    POKEDEX_STALL_MS sets the stall threshold in milliseconds
+    :param app: the tkinter application to watch
+    :returns: the started watchdog, or None if it is not turned on
+    '''
+    if os.environ.get('POKEDEX_WATCHDOG') != '1':
+        return None
+
+    # make sure the stall warnings are shown
+    logging.basicConfig(level=logging.WARNING)
+
+    watchdog = StallWatchdog(app, threshold=float(os.environ.get('POKEDEX_STALL_MS', '200')) / 1000)
+    watchdog.start()
+    return watchdog
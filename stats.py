@@ -0,0 +1,285 @@
+import numpy as np
+import requests
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# the file the stat table is saved to and loaded from
+STATS_FILE = 'PokemonStats.npz'
+
+# the names of each base stat as given by pokeapi, mapped to the column name used in the table
+API_STAT_NAMES = {
+    'hp': 'hp',
+    'attack': 'attack',
+    'defense': 'defense',
+    'special-attack': 'sp_atk',
+    'special-defense': 'sp_def',
+    'speed': 'speed'
+}
+
+# every numeric column held by the table, weight is stored in kg and height in m
+STAT_COLUMNS = ['hp', 'attack', 'defense', 'sp_atk', 'sp_def', 'speed', 'weight', 'height']
+
+# the names of every type in pokeapi order, types are stored in the table as their position in this list
+TYPE_NAMES = ['normal', 'fighting', 'flying', 'poison', 'ground', 'rock', 'bug', 'ghost', 'steel',
+              'fire', 'water', 'grass', 'electric', 'psychic', 'ice', 'dragon', 'dark', 'fairy']
+
+# pokeapi gives the default form of each species the species' pokedex ID, other forms get IDs from here up
+FORM_IDS = 10000
+
+
+class StatTable:
+    '''class for the local table of pokemon stats, holding one numpy array per stat'''
+    def __init__(self, ids, names, columns, types, species):
+        '''
+        initialises the stat table
+        :param self: instance of the stat table
+        :param ids: numpy array of pokedex IDs
+        :param names: numpy array of pokemon names
+        :param columns: dictionary of column name to numpy array, one entry per STAT_COLUMNS name
+        :param types: numpy array with two columns holding the TYPE_NAMES index of
+        each row's first and second type, -1 for pokemon with only one type
+        :param species: numpy array of the species name of each row
+        '''
+        # stores the pokedex ID of each row
+        self.ids = ids
+
+        # stores the name of each row
+        self.names = names
+
+        # stores each stat column as its own array
+        self.columns = columns
+
+        # stores the first and second type of each row
+        self.types = types
+
+        # stores the species name of each row
+        self.species = species
+
+        # stores the row of each species named differently to its default form, found the first time it is needed
+        self.species_index = None
+
+    def __len__(self):
+        '''
+        gets the number of pokemon in the table
+        :param self: instance of the stat table
+        :returns: number of rows (int)
+        '''
+        return len(self.ids)
+
+    def filter(self, rows=None, **ranges):
+        '''
+        Finds the rows where every given stat lies within its range
+        :param self: instance of the stat table
+        :param rows: optional array of row indices to filter, defaults to every row
+        :param ranges: stat name to a (minimum, maximum) tuple, both inclusive,
+        either bound can be None to leave that side open, e.g. speed=(100, None)
+        :returns: numpy array of the matching row indices
+        '''
+        # start with every row matching
+        mask = np.ones(len(self.ids), dtype=bool)
+
+        # for each stat range given
+        for stat, (low, high) in ranges.items():
+            # get the array for this stat, raises a KeyError for unknown stats
+            column = self.columns[stat]
+
+            # remove rows below the minimum
+            if low is not None:
+                mask &= column >= low
+
+            # remove rows above the maximum
+            if high is not None:
+                mask &= column <= high
+
+        # if only a subset of rows was asked for, keep the matching rows of that subset
+        if rows is not None:
+            rows = np.asarray(rows)
+            return rows[mask[rows]]
+
+        # get the indices of the rows still matching
+        return np.flatnonzero(mask)
+
+    def sort(self, stat, rows=None, descending=True):
+        '''
+        Sorts rows by a stat
+        :param self: instance of the stat table
+        :param stat: the stat to sort by (str)
+        :param rows: optional array of row indices to sort, defaults to every row
+        :param descending: whether the highest values come first (bool)
+        :returns: numpy array of row indices in sorted order
+        '''
+        # use every row if none were given
+        if rows is None:
+            rows = np.arange(len(self.ids))
+
+        # get the values of the stat for the rows being sorted
+        values = self.columns[stat][rows]
+
+        # use a stable sort so ties keep pokedex order
+        order = np.argsort(-values if descending else values, kind='stable')
+
+        return np.asarray(rows)[order]
+
+    def top_k(self, stat, k, rows=None):
+        '''
+        Gets the k rows with the highest value of a stat
+        :param self: instance of the stat table
+        :param stat: the stat to rank by (str)
+        :param k: the number of rows to return (int)
+        :param rows: optional array of row indices to rank, defaults to every row
+        :returns: numpy array of up to k row indices, highest first
+        '''
+        # use every row if none were given
+        if rows is None:
+            rows = np.arange(len(self.ids))
+        rows = np.asarray(rows)
+
+        # if every row is wanted a full sort is needed anyway
+        if k >= len(rows):
+            return self.sort(stat, rows)
+
+        # partition so the k highest values come first without sorting the rest
+        values = self.columns[stat][rows]
+        best = np.argpartition(-values, k - 1)[:k]
+
+        # sort only those k rows
+        return self.sort(stat, rows[best])
+
+    def species_rows(self):
+        '''
+        Finds the row of the default form of every species named differently to it, e.g. "giratina" for
+        "giratina-altered", parties save species names so these would otherwise never be found
+        :param self: instance of the stat table
+        :returns: dictionary of species name to row index (int)
+        '''
+        if self.species_index is None:
+            # only the default form of each species has an ID below FORM_IDS
+            rows = np.flatnonzero((self.ids < FORM_IDS) & (self.species != self.names))
+            self.species_index = {str(self.species[row]): int(row) for row in rows}
+        return self.species_index
+
+    def find(self, pokemon):
+        '''
+        Finds the row of a pokemon
+        :param self: instance of the stat table
+        :param pokemon: the pokedex ID (int) or pokemon or species name (str) of the pokemon
+        :returns: the row index (int), or None if the pokemon is not in the table
+        '''
+        # if a name was given, search the names, then the species names of default forms
+        if isinstance(pokemon, str):
+            matches = np.flatnonzero(self.names == pokemon.lower())
+            return int(matches[0]) if len(matches) > 0 else self.species_rows().get(pokemon.lower())
+
+        # otherwise binary search the IDs, which are kept in pokedex order
+        row = int(np.searchsorted(self.ids, pokemon))
+        if row < len(self.ids) and self.ids[row] == pokemon:
+            return row
+        return None
+
+    def describe(self, rows):
+        '''
+        Gets readable details for a set of rows
+        :param self: instance of the stat table
+        :param rows: array of row indices
+        :returns: list of dictionaries, one per row, containing the id, name, types and every stat
+        '''
+        # weight and height are rounded back to the single decimal place pokeapi gives them to
+        return [
+            {'id': int(self.ids[row]), 'name': str(self.names[row]),
+             'types': [TYPE_NAMES[index] for index in self.types[row] if index >= 0],
+             **{stat: round(self.columns[stat][row].item(), 1) for stat in STAT_COLUMNS}}
+            for row in rows
+        ]
+
+    def save(self, path=STATS_FILE):
+        '''
+        Saves the table as a compact binary numpy archive
+        :param self: instance of the stat table
+        :param path: the file to save to (str)
+        :returns: None
+        '''
+        np.savez(path, ids=self.ids, names=self.names, types=self.types, species=self.species, **self.columns)
+
+
+def load_stats(path=STATS_FILE):
+    '''
+    Loads a stat table saved with StatTable.save
+    :param path: the file to load from (str)
+    :returns: the loaded stat table (StatTable)
+    '''
+    # open the archive without allowing pickled objects
+    with np.load(path, allow_pickle=False) as archive:
+        # read each array out of the archive
+        return StatTable(archive['ids'], archive['names'], {stat: archive[stat] for stat in STAT_COLUMNS}, archive['types'],
+                         archive['species'])
+
+
+def stat_row(data):
+    '''
+    Gets the table values from a pokeapi /pokemon/ response
+    :param data: the loaded pokeapi response (dict)
+    :returns: dictionary of column name to value, plus "id", "name" and "species"
+    '''
+    # start with the id, name, species name, weight (hectograms to kg) and height (decimetres to m)
+    row = {
+        'id': data['id'],
+        'name': data['name'],
+        'species': data['species']['name'],
+        'weight': data['weight'] / 10,
+        'height': data['height'] / 10
+    }
+
+    # add each base stat under its column name
+    for stat in data['stats']:
+        row[API_STAT_NAMES[stat['stat']['name']]] = stat['base_stat']
+
+    # add the position of each type in TYPE_NAMES, pokeapi lists them in slot order
+    row['types'] = [TYPE_NAMES.index(entry['type']['name']) for entry in data['types']]
+
+    return row
+
+
+def build_table(rows):
+    '''
+    Builds a stat table from a list of rows made by stat_row
+    :param rows: list of row dictionaries
+    :returns: the built stat table (StatTable)
+    '''
+    # sort the rows into pokedex order
+    rows = sorted(rows, key=lambda row: row['id'])
+
+    # base stats never go above 255 so they fit in 16 bits, weight and height are decimals
+    columns = {stat: np.array([row[stat] for row in rows], dtype=np.int16) for stat in API_STAT_NAMES.values()}
+    columns['weight'] = np.array([row['weight'] for row in rows], dtype=np.float32)
+    columns['height'] = np.array([row['height'] for row in rows], dtype=np.float32)
+
+    # store both types of each row, padding single typed pokemon with -1
+    types = np.array([(row['types'] + [-1])[:2] for row in rows], dtype=np.int8).reshape(len(rows), 2)
+
+    return StatTable(np.array([row['id'] for row in rows], dtype=np.int32), np.array([row['name'] for row in rows]), columns, types,
+                     np.array([row['species'] for row in rows]))
+
+
+def fetch_table(api_url='https://pokeapi.co/api/v2/', workers=8):
+    '''
+    Downloads the stats of every pokemon from pokeapi and builds a stat table
+    :param api_url: the base url of pokeapi (str)
+    :param workers: the number of requests to send at once (int)
+    :returns: the built stat table (StatTable)
+    '''
+    # get the list of every pokemon
+    listing = json.loads(requests.get(api_url + 'pokemon?limit=100000').text)
+
+    # share one connection pool between all requests
+    session = requests.Session()
+
+    # download each pokemon's details, several at a time
+    with ThreadPoolExecutor(workers) as pool:
+        rows = list(pool.map(lambda entry: stat_row(json.loads(session.get(entry['url']).text)), listing['results']))
+
+    return build_table(rows)
+
+
+if __name__ == "__main__":
+    # download the stats of every pokemon and save them for the application to load
+    fetch_table().save()
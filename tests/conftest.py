@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# run the tests against the modules in the project folder, the same way the application is run from it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datasource
+from benchmarks.stub_server import StubPokeAPI
+
+
+@pytest.fixture(scope='session')
+def stub():
+    '''
+    Runs the stub pokeapi for every test, standing in for pokeapi so no test needs the internet
+    '''
+    server = StubPokeAPI(count=20)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def pokeapi(stub, monkeypatch):
+    '''
+    Points both data sources at the stub pokeapi, putting back the real urls and data source after the test
+    '''
+    monkeypatch.setattr(datasource, 'API_URL', stub.url)
+    monkeypatch.setattr(datasource, 'GRAPHQL_URL', stub.graphql_url)
+    monkeypatch.setattr(datasource, 'DATA_SOURCE', 'rest')
+    return stub
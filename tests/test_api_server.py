@@ -0,0 +1,187 @@
+import http.client
+
+import pytest
+import requests
+
+import api_server
+from api_server import PokedexAPI
+from userstore import UserStore
+
+PASSWORD = 'Password1!'
+
+
+@pytest.fixture
+def api(pokeapi, tmp_path):
+    '''
+    Serves the api on a free port, with its user data in a temporary folder and pokeapi stood in for by the stub
+    '''
+    api_server.search.cache_clear()
+    server = PokedexAPI(UserStore(str(tmp_path / 'UserData.csv')), port=0, workers=4)
+    yield server
+    server.close()
+
+
+def call(api, method, path, body=None, token=None):
+    '''
+    Sends a request to the api
+    :returns: tuple of the status and loaded response
+    '''
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    response = requests.request(method, api.url + path, json=body, headers=headers)
+    return response.status_code, response.json()
+
+
+def register(api, username):
+    '''
+    Registers a user and logs in
+    :returns: the session token
+    '''
+    assert call(api, 'POST', '/users', {'username': username, 'password': PASSWORD}) == (201, {'username': username})
+    status, response = call(api, 'POST', '/sessions', {'username': username, 'password': PASSWORD})
+    assert status == 200
+    return response['token']
+
+
+def test_register_and_login(api):
+    register(api, 'ash')
+    assert call(api, 'POST', '/users', {'username': 'ash', 'password': PASSWORD})[0] == 409
+    assert call(api, 'POST', '/users', {'username': 'misty', 'password': 'weak'})[0] == 400
+    assert call(api, 'POST', '/users', {'username': '', 'password': PASSWORD})[0] == 400
+    assert call(api, 'POST', '/sessions', {'username': 'ash', 'password': 'Wrong1!pass'})[0] == 401
+    assert call(api, 'POST', '/sessions', {'username': 'nobody', 'password': PASSWORD})[0] == 401
+
+
+def test_party(api):
+    token = register(api, 'ash')
+    assert call(api, 'GET', '/party', token=token) == (200, {'party': [None] * 6})
+    assert call(api, 'PUT', '/party/2', {'pokemon': '7'}, token) == (200, {'slot': 2, 'pokemon': 'pokemon-7'})
+    assert call(api, 'PUT', '/party/6', {'pokemon': 'POKEMON-3'}, token) == (200, {'slot': 6, 'pokemon': 'pokemon-3'})
+    assert call(api, 'GET', '/party', token=token) == (200, {'party': [None, 'pokemon-7', None, None, None, 'pokemon-3']})
+
+    # the change is saved for every other copy sharing the user data
+    other = UserStore(api.store.path)
+    assert other.user_data.loc[other.row('ash'), 'Pokemon2'] == 'pokemon-7'
+
+
+def test_party_needs_a_session(api):
+    assert call(api, 'GET', '/party')[0] == 401
+    assert call(api, 'GET', '/party', token='made-up')[0] == 401
+    assert call(api, 'PUT', '/party/1', {'pokemon': '1'}, 'made-up')[0] == 401
+
+
+@pytest.mark.parametrize('body', [{}, {'pokemon': ''}, {'pokemon': '   '}, {'pokemon': None}, [], ['pokemon'], 'bulbasaur', 7])
+def test_invalid_bodies(api, body):
+    token = register(api, 'ash')
+    status, response = call(api, 'PUT', '/party/1', body, token)
+    assert status == 400 and 'error' in response
+
+
+def test_invalid_json(api):
+    response = requests.post(api.url + '/sessions', data=b'{not json', headers={'Content-Type': 'application/json'})
+    assert response.status_code == 400
+
+
+def test_unknown_pokemon_and_routes(api):
+    token = register(api, 'ash')
+    assert call(api, 'PUT', '/party/1', {'pokemon': 'missingno'}, token)[0] == 404
+    assert call(api, 'PUT', '/party/7', {'pokemon': '1'}, token)[0] == 404
+    assert call(api, 'GET', '/pokemon/missingno')[0] == 404
+    assert call(api, 'GET', '/nowhere')[0] == 404
+
+
+def test_get_pokemon(api):
+    status, response = call(api, 'GET', '/pokemon/4')
+    assert status == 200
+    assert (response['id'], response['name'], response['species']) == (4, 'pokemon-4', 'pokemon-4')
+    assert response['flavor_text']
+
+
+def test_logout(api):
+    token = register(api, 'ash')
+    assert call(api, 'DELETE', '/sessions', token=token)[0] == 200
+    assert call(api, 'GET', '/party', token=token)[0] == 401
+
+
+def test_session_ends_when_user_is_deleted(api):
+    token = register(api, 'ash')
+
+    # another copy deletes the user and someone registers the name again
+    other = UserStore(api.store.path)
+    assert other.commit('delete', 'ash')
+    new_token = register(api, 'ash')
+    assert call(api, 'GET', '/party', token=token)[0] == 401
+    assert call(api, 'PUT', '/party/1', {'pokemon': '1'}, token)[0] == 401
+    assert call(api, 'GET', '/party', token=new_token)[0] == 200
+
+
+def test_session_ends_when_user_is_renamed(api):
+    token = register(api, 'ash')
+    other = UserStore(api.store.path)
+    assert other.commit('update', 'ash', {'username': 'satoshi'})
+    assert call(api, 'GET', '/party', token=token)[0] == 401
+    assert call(api, 'POST', '/sessions', {'username': 'satoshi', 'password': PASSWORD})[0] == 200
+
+
+def test_user_deleted_while_changing_party(api, monkeypatch):
+    token = register(api, 'ash')
+    other = UserStore(api.store.path)
+    account = api.account
+
+    # another copy deletes the user after the session was checked but before the party is saved
+    def racing(token):
+        result = account(token)
+        assert other.commit('delete', 'ash')
+        return result
+
+    monkeypatch.setattr(api, 'account', racing)
+    assert call(api, 'PUT', '/party/1', {'pokemon': '1'}, token)[0] == 401
+    monkeypatch.setattr(api, 'account', account)
+    assert call(api, 'GET', '/party', token=token)[0] == 401
+
+
+def test_sessions_expire(api, monkeypatch):
+    monkeypatch.setattr(api_server, 'SESSION_SECONDS', 0)
+    token = register(api, 'ash')
+    assert call(api, 'GET', '/party', token=token)[0] == 401
+
+
+def test_parallel_changes_to_different_users(api):
+    from concurrent.futures import ThreadPoolExecutor
+
+    tokens = [register(api, f'trainer{number}') for number in range(8)]
+
+    def fill(token):
+        return [call(api, 'PUT', f'/party/{slot}', {'pokemon': str(slot)}, token)[0] for slot in range(1, 7)]
+
+    with ThreadPoolExecutor(8) as pool:
+        assert all(status == 200 for statuses in pool.map(fill, tokens) for status in statuses)
+    for token in tokens:
+        assert call(api, 'GET', '/party', token=token)[1]['party'] == [f'pokemon-{slot}' for slot in range(1, 7)]
+
+
+@pytest.mark.parametrize('length', ['abc', '-1'])
+def test_invalid_content_length(api, length):
+    # send the header by hand, since requests would replace it with the real length
+    connection = http.client.HTTPConnection(api.url.removeprefix('http://'), timeout=5)
+    connection.putrequest('POST', '/sessions')
+    connection.putheader('Content-Length', length)
+    connection.endheaders(b'{}')
+    assert connection.getresponse().status == 400
+    connection.close()
+
+
+def test_conflicts_and_unexpected_errors(api, monkeypatch):
+    token = register(api, 'ash')
+
+    def conflict(*args):
+        raise api_server.ConflictError('ash')
+
+    monkeypatch.setattr(api.store, 'commit', conflict)
+    assert call(api, 'PUT', '/party/1', {'pokemon': '1'}, token)[0] == 409
+
+    def broken(*args):
+        raise RuntimeError('broken')
+
+    monkeypatch.setattr(api.store, 'commit', broken)
+    monkeypatch.setattr(api.server, 'handle_error', lambda *args: None)
+    assert call(api, 'PUT', '/party/1', {'pokemon': '1'}, token) == (500, {'error': 'Something went wrong.'})
@@ -0,0 +1,45 @@
+import pytest
+import requests
+
+import datasource
+
+
+def fetch(source, pokemon, flavor_text=False):
+    '''
+    Fetches records from one data source, returning each as a dictionary so records can be compared
+    '''
+    datasource.set_data_source(source)
+    return [{field: getattr(record, field) for field in record.__slots__}
+            for record in datasource.fetch_records(pokemon, flavor_text)]
+
+
+@pytest.mark.parametrize('pokemon', [
+    ['pokemon-1'],
+    ['7'],
+    [f'pokemon-{number}' for number in range(1, 7)],
+    ['pokemon-3', '3', 12, 'pokemon-9', 'pokemon-3']
+])
+def test_rest_and_graphql_agree(pokeapi, pokemon):
+    # graphql always fetches the pokedex entry, so compare it with rest asked for the entry too
+    rest = fetch('rest', pokemon, flavor_text=True)
+    graphql = fetch('graphql', pokemon)
+    assert rest == graphql
+    assert [record['id'] for record in rest] == [int(str(key).removeprefix('pokemon-')) for key in pokemon]
+
+
+def test_rest_without_flavor_text(pokeapi):
+    rest = fetch('rest', ['pokemon-2'])
+    graphql = fetch('graphql', ['pokemon-2'])
+    assert rest[0]['flavor_text'] is None
+    assert {**rest[0], 'flavor_text': graphql[0]['flavor_text']} == graphql[0]
+
+
+@pytest.mark.parametrize('source', datasource.DATA_SOURCES)
+def test_unknown_pokemon(pokeapi, source):
+    with pytest.raises((requests.HTTPError, ValueError)):
+        fetch(source, ['pokemon-1', 'missingno'])
+
+
+def test_unknown_data_source(pokeapi):
+    with pytest.raises(ValueError):
+        datasource.set_data_source('soap')
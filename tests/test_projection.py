@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from projection import project, first_english, pokemon_record
+
+
+def chunked(data, size):
+    '''
+    Splits a json document into chunks, like a download arriving a few bytes at a time
+    :param data: the document (dict or bytes)
+    :param size: the bytes in each chunk (int)
+    :returns: list of bytes
+    '''
+    if not isinstance(data, bytes):
+        data = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+# chunk sizes splitting values, escapes and multi-byte characters at every position
+CHUNK_SIZES = [1, 2, 3, 7, 64, 1 << 20]
+
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+def test_escapes(size):
+    document = {
+        'skip': 'quote \" backslash \\\\ brackets ] } [ { and a \\" fake end',
+        'name': 'a \"quoted\" \\\\ name with ] and }',
+        'tab': 'line\nbreak\ttab A'
+    }
+    assert project(chunked(document, size), {'name': True, 'tab': True}) == {'name': document['name'], 'tab': document['tab']}
+
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+def test_escaped_keys(size):
+    document = b'{"a\\"b": [1, {"}": "]"}], "wanted\\u0021": 1, "name": "x"}'
+    assert project(chunked(document, size), {'name': True, 'wanted!': True}) == {'wanted!': 1, 'name': 'x'}
+
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+def test_nesting(size):
+    # deeper than the container pattern matches at once, so the bracket counting fallback is used
+    deep = 'end'
+    for depth in range(20):
+        deep = [deep, {'level': depth, 'brackets': '[{'}]
+    document = {'deep': deep, 'species': {'url': 'u', 'name': 'bulbasaur', 'extra': [[], {}]}, 'weight': 69}
+    assert project(chunked(document, size), {'species': True, 'weight': True}) == {'species': document['species'], 'weight': 69}
+
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+def test_unicode(size):
+    # multi-byte characters are split across chunks at the smaller sizes
+    document = {'skip': 'pokémon ポケモン 🐉', 'name': 'nidoran♀', 'text': 'フシギダネ'}
+    assert project(chunked(document, size), {'name': True, 'text': True}) == {'name': 'nidoran♀', 'text': 'フシギダネ'}
+
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+def test_scalars(size):
+    document = b'{"a": true, "b": false, "c": null, "d": -1.5e3, "e": 0}'
+    assert project(chunked(document, size), dict.fromkeys('abcde', True)) == {'a': True, 'b': False, 'c': None, 'd': -1500.0, 'e': 0}
+
+
+@pytest.mark.parametrize('document', [
+    b'{"name": "bulba',
+    b'{"skip": [1, 2, {"a": "b"',
+    b'{"skip": "unterminated',
+    b'{"name"',
+    b''
+])
+@pytest.mark.parametrize('size', [1, 1 << 20])
+def test_truncated(document, size):
+    with pytest.raises(ValueError):
+        project(chunked(document, size), {'name': True, 'weight': True})
+
+
+def test_stops_early():
+    # the chunks after the last wanted key are never read
+    read = []
+
+    def chunks():
+        for chunk in chunked({'id': 1, 'name': 'bulbasaur', 'moves': list(range(1000))}, 16):
+            read.append(chunk)
+            yield chunk
+
+    assert project(chunks(), {'id': True, 'name': True}) == {'id': 1, 'name': 'bulbasaur'}
+    assert len(read) < 5
+
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+def test_first_english(size):
+    entries = [
+        {'flavor_text': 'フシギダネ', 'language': {'name': 'ja'}},
+        {'flavor_text': 'A strange seed was\nplanted on its back.', 'language': {'name': 'en'}},
+        {'flavor_text': 'later', 'language': {'name': 'en'}}
+    ]
+    document = {'flavor_text_entries': entries, 'name': 'bulbasaur'}
+    assert project(chunked(document, size), {'flavor_text_entries': first_english, 'name': True}) == {
+        'flavor_text_entries': entries[1]['flavor_text'], 'name': 'bulbasaur'}
+    assert project(chunked({'flavor_text_entries': entries[:1]}, size), {'flavor_text_entries': first_english}) == {'flavor_text_entries': None}
+
+
+def test_pokemon_record():
+    record = pokemon_record({
+        'id': 1, 'name': 'bulbasaur', 'species': {'name': 'bulbasaur'}, 'sprites': {'front_default': 'sprite.png'},
+        'types': [{'slot': 2, 'type': {'name': 'poison'}}, {'slot': 1, 'type': {'name': 'grass'}}],
+        'abilities': [{'slot': 3, 'ability': {'name': 'chlorophyll'}}, {'slot': 1, 'ability': {'name': 'overgrow'}}],
+        'weight': 69, 'height': 7
+    })
+    assert (record.types, record.abilities, record.weight) == (('grass', 'poison'), ('overgrow', 'chlorophyll'), 69)
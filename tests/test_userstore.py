@@ -0,0 +1,174 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import userstore
+from userstore import UserStore, COLUMNS
+
+
+def make_users(usernames):
+    '''
+    Makes user data holding the given users, each with an empty party
+    '''
+    return pd.DataFrame([{**dict.fromkeys(COLUMNS, 'None'), 'username': username, 'password': 'hash'} for username in usernames],
+                        columns=COLUMNS)
+
+
+@pytest.fixture
+def path(tmp_path):
+    '''
+    Saves a csv of three users and gets its path, the journal and lock file are made beside it
+    '''
+    path = str(tmp_path / 'UserData.csv')
+    UserStore(path).compact(make_users(['ash', 'misty', 'brock']))
+    return path
+
+
+def race(*functions):
+    '''
+    Runs functions on their own threads, all starting at once
+    :returns: list of what each function returned
+    '''
+    barrier = threading.Barrier(len(functions))
+    results = [None] * len(functions)
+
+    def run(number, function):
+        barrier.wait()
+        results[number] = function()
+
+    threads = [threading.Thread(target=run, args=item) for item in enumerate(functions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def party(store, username):
+    store.catch_up()
+    return store.user_data.loc[store.row(username), userstore.PARTY_COLUMNS].tolist()
+
+
+def test_changes_to_the_same_user_are_never_lost(path):
+    first, second = UserStore(path), UserStore(path)
+
+    # each store changes its own slots of the same user, every change must survive
+    def change(store, slots):
+        return lambda: all(store.commit('update', 'ash', {f'Pokemon{slot}': f'pokemon-{number}'})
+                           for number in range(50) for slot in slots)
+
+    assert race(change(first, [1, 2, 3]), change(second, [4, 5, 6])) == [True, True]
+    assert party(first, 'ash') == party(second, 'ash') == ['pokemon-49'] * 6
+    assert party(UserStore(path), 'ash') == ['pokemon-49'] * 6
+
+
+def test_only_one_store_adds_a_username(path):
+    first, second = UserStore(path), UserStore(path)
+    results = race(lambda: first.commit('add', 'gary', {'password': 'first'}),
+                   lambda: second.commit('add', 'gary', {'password': 'second'}))
+    assert sorted(results) == [False, True]
+
+    # both agree on which one won
+    first.catch_up(), second.catch_up()
+    winner = 'first' if results[0] else 'second'
+    assert first.user_data.loc[first.row('gary'), 'password'] == second.user_data.loc[second.row('gary'), 'password'] == winner
+
+
+def test_only_one_store_takes_a_rename_target(path):
+    first, second = UserStore(path), UserStore(path)
+    results = race(lambda: first.commit('update', 'misty', {'username': 'gary'}),
+                   lambda: second.commit('update', 'brock', {'username': 'gary'}))
+    assert sorted(results) == [False, True]
+    first.catch_up()
+    assert sorted(first.user_data['username']) == sorted(['ash', 'gary', 'brock' if results[0] else 'misty'])
+
+
+def test_changes_to_deleted_users_fail(path):
+    first, second = UserStore(path), UserStore(path)
+    label = first.row('ash')
+    assert second.commit('delete', 'ash')
+    assert not first.commit('update', 'ash', {'Pokemon1': 'pikachu'})
+    assert first.row('ash') is None
+
+    # a new account with the same name is a new row
+    assert second.commit('add', 'ash', {'password': 'new'})
+    first.catch_up()
+    assert first.row('ash') not in (None, label)
+
+
+def test_catch_up_reads_only_new_changes(path):
+    first, second = UserStore(path), UserStore(path)
+    assert first.catch_up() == {}
+    second.commit('update', 'misty', {'Pokemon1': 'staryu'})
+    assert list(first.catch_up().values()) == [True]
+    assert first.catch_up() == {}
+    assert party(first, 'misty')[0] == 'staryu'
+
+
+def test_compaction_while_another_store_writes(path):
+    writer, compactor = UserStore(path), UserStore(path)
+
+    # one store keeps adding users while the other applies a batch and compacts
+    def write():
+        return all(writer.commit('add', f'trainer{number}', {'password': 'hash'}) for number in range(200))
+
+    def compact():
+        for number in range(20):
+            with compactor.exclusive():
+                user_data = compactor.user_data.copy()
+                user_data.loc[user_data['username'] == 'brock', 'Pokemon1'] = f'onix-{number}'
+                compactor.compact(user_data)
+        return True
+
+    assert race(write, compact) == [True, True]
+
+    # nothing written by either store was lost
+    for store in [writer, compactor, UserStore(path)]:
+        store.catch_up()
+        assert len(store.user_data) == 203
+        assert party(store, 'brock')[0] == 'onix-19'
+
+
+def test_rows_keep_their_labels_through_compaction(path):
+    first, second = UserStore(path), UserStore(path)
+    labels = {username: first.row(username) for username in ['ash', 'misty', 'brock']}
+    second.commit('update', 'misty', {'username': 'kasumi'})
+    second.compact()
+    first.catch_up()
+    assert first.row('kasumi') == labels['misty']
+    assert first.row('ash') == labels['ash']
+
+
+def test_journal_is_compacted_once_large(path, monkeypatch):
+    monkeypatch.setattr(userstore, 'COMPACT_SIZE', 4096)
+    store = UserStore(path)
+    for number in range(100):
+        assert store.commit('add', f'trainer{number}', {'password': 'x' * 40})
+    assert store.offset < 4096
+    assert len(UserStore(path).user_data) == 103
+
+
+
+def test_compaction_while_opening(path, monkeypatch):
+    writer = UserStore(path)
+    assert writer.commit('update', 'misty', {'username': 'kasumi'})
+
+    # compact the rename into the csv just after the new store reads the old csv, which waits if the store holds it off
+    read_users = userstore.read_users
+    compaction = threading.Thread(target=writer.compact)
+
+    def read_then_compact(csv):
+        user_data = read_users(csv)
+        if not compaction.is_alive() and compaction.ident is None:
+            compaction.start()
+            compaction.join(0.2)
+        return user_data
+
+    monkeypatch.setattr(userstore, 'read_users', read_then_compact)
+    store = UserStore(path)
+    monkeypatch.setattr(userstore, 'read_users', read_users)
+    compaction.join()
+
+    store.catch_up()
+    assert store.row('kasumi') is not None and store.row('misty') is None
@@ -0,0 +1,107 @@
+import argparse
+import math
+import os
+import tempfile
+import tkinter as tk
+
+import atlas
+import datasource
+
+# the size of pokeapi's front sprites, display sizes above this are made from the official artwork instead
+SPRITE_PIXELS = 96
+
+# the largest factor an image is zoomed by before it is subsampled, which bounds the memory used while scaling
+MAX_ZOOM = 4
+
+
+def scale_factors(pixels, size):
+    '''
+    Finds the zoom and subsample factors that scale an image closest to a size without going over it,
+    tkinter only scales images by whole numbers so shrinking by a fraction means zooming then subsampling
+    :param pixels: the image's longest side in pixels (int)
+    :param size: the largest the longest side may be after scaling (int)
+    :returns: tuple of the zoom and subsample factors (int)
+    '''
+    best = (1, max(1, math.ceil(pixels / size)))
+    for zoom in range(1, MAX_ZOOM + 1):
+        subsample = max(1, math.ceil(pixels * zoom / size))
+        if pixels * zoom // subsample <= size and zoom / subsample > best[0] / best[1]:
+            best = (zoom, subsample)
+    return best
+
+
+def scale(image, size):
+    '''
+    Scales an image to fit a display size
+    :param image: the image (tk.PhotoImage)
+    :param size: the largest the longest side may be after scaling (int)
+    :returns: the scaled image, or the same image if it is already the right size (tk.PhotoImage)
+    '''
+    zoom, subsample = scale_factors(max(image.width(), image.height()), size)
+    if zoom == subsample:
+        return image
+    if zoom > 1:
+        image = image.zoom(zoom)
+    return image.subsample(subsample) if subsample > 1 else image
+
+
+def build_sizes(sprites, artwork, root, sizes=atlas.SIZES):
+    '''
+    Makes every display size of every pokemon, decoding each sprite and artwork once,
+    small sizes come from the sprite, which is drawn for them, and larger ones from the artwork when there is any
+    :param sprites: dictionary of pokedex ID to front sprite png (bytes)
+    :param artwork: dictionary of pokedex ID to official artwork png (bytes)
+    :param root: the tkinter window the images belong to, which may be hidden (tk.Tk)
+    :param sizes: dictionary of display size name to pixels
+    :returns: dictionary of display size name to a dictionary of pokedex ID to png (bytes)
+    '''
+    built = {size: {} for size in sizes}
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'scaled.png')
+
+        for pokedex_id in sorted(set(sprites) | set(artwork)):
+            # decode each source once for every size
+            sources = {kind: (images[pokedex_id], tk.PhotoImage(master=root, data=images[pokedex_id]))
+                       for kind, images in [('sprite', sprites), ('artwork', artwork)] if pokedex_id in images}
+
+            for size, pixels in sizes.items():
+                kind = 'artwork' if 'artwork' in sources and (pixels > SPRITE_PIXELS or 'sprite' not in sources) else 'sprite'
+                png, image = sources[kind]
+
+                # keep the original file when it is already the right size, otherwise write the scaled image
+                scaled = scale(image, pixels)
+                if scaled is image:
+                    built[size][pokedex_id] = png
+                else:
+                    scaled.write(path, format='png')
+                    with open(path, 'rb') as file:
+                        built[size][pokedex_id] = file.read()
+
+            # free the decoded images before the next pokemon, so the full size artwork is never all held at once
+            sources = image = scaled = None
+
+    return built
+
+
+if __name__ == "__main__":
+    # read the command line options
+    parser = argparse.ArgumentParser(description='Precompute every display size of every sprite into memory mapped atlases.')
+    parser.add_argument('--max-id', type=int, default=1025, help='the largest pokedex ID to download')
+    parser.add_argument('--workers', type=int, default=16, help='images downloaded at once')
+    parser.add_argument('--no-artwork', action='store_true', help='make the larger sizes from the front sprites instead of the official artwork')
+    args = parser.parse_args()
+
+    # download the sources
+    ids = range(1, args.max_id + 1)
+    sprites = atlas.download_sprites(ids, workers=args.workers)
+    artwork = {} if args.no_artwork else atlas.download_sprites(ids, datasource.ARTWORK_URL, args.workers)
+
+    # scale them using a hidden window, then pack each size into its own atlas
+    root = tk.Tk()
+    root.withdraw()
+    built = build_sizes(sprites, artwork, root)
+    root.destroy()
+    for size, images in built.items():
+        atlas.build_atlas(images, atlas.atlas_path(size))
+        print(f'{len(images)} {size} sprites ({atlas.SIZES[size]}px) packed into {atlas.atlas_path(size)}')
@@ -0,0 +1,241 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+
+# whether spans are recorded, set the POKEDEX_TRACE environment variable to 1 to record from startup
+enabled = os.environ.get('POKEDEX_TRACE') == '1'
+
+# the upper bound in milliseconds of each histogram bucket, the last bucket holds everything slower
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# stores the most recent spans as (name, stage, start ns, end ns, thread id) tuples
+_events = deque(maxlen=100000)
+
+# stores the bucket counts of each stage
+_histograms = {}
+
+# stores the name of the last user action and the milliseconds spent in each stage during it
+_last_action = {'name': None, 'stages': {}}
+
+# stores how many actions are running, so nested actions count towards the outermost one
+_depth = 0
+
+# guards the histograms and last action, which may be updated from several threads
+_lock = threading.Lock()
+
+# the time recording started, trace timestamps are given relative to it
+_origin = time.perf_counter_ns()
+
+
+class _Span:
+    '''class for a timed section of code'''
+    __slots__ = ('name', 'stage', 'start')
+
+    def __init__(self, name, stage):
+        '''
+        initialises the span
+        :param self: instance of the span
+        :param name: the name shown for the span in traces (str)
+        :param stage: the stage the time is counted towards, e.g. "network" (str)
+        '''
+        self.name = name
+        self.stage = stage
+
+    def __enter__(self):
+        # start timing
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exception):
+        # stop timing and record the span
+        record(self.name, self.stage, self.start, time.perf_counter_ns())
+
+
+class _NoSpan:
+    '''class for the span used while tracing is disabled, which does nothing'''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return None
+
+
+# the single span handed out while tracing is disabled, so disabled spans cost no allocation
+_NO_SPAN = _NoSpan()
+
+
+def span(stage, name=None):
+    '''
+    Times a section of code, used as "with span('network'):"
+    :param stage: the stage the time is counted towards, e.g. "network" (str)
+    :param name: optional name shown in traces, defaults to the stage (str)
+    :returns: a context manager
+    '''
+    if not enabled:
+        return _NO_SPAN
+    return _Span(name or stage, stage)
+
+
+def traced(stage):
+    '''
+    Decorator that times every call of a function as a span
+    :param stage: the stage the time is counted towards (str)
+    :returns: the decorator
+    '''
+    def decorator(function):
+        # lambdas have no useful name, so they are shown under their stage
+        name = stage if function.__name__ == '<lambda>' else function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            # call straight through while disabled
+            if not enabled:
+                return function(*args, **kwargs)
+            with _Span(name, stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def action(name):
+    '''
+    Decorator for a user action such as a button press, resetting the breakdown
+    shown by last_action, actions started inside another action count towards the outer one
+    :param name: the name of the action (str)
+    :returns: the decorator
+    '''
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            global _depth
+
+            # call straight through while disabled
+            if not enabled:
+                return function(*args, **kwargs)
+
+            # start a fresh breakdown if this is the outermost action
+            with _lock:
+                if _depth == 0:
+                    _last_action['name'] = name
+                    _last_action['stages'] = {}
+                _depth += 1
+
+            try:
+                with _Span(name, 'action'):
+                    return function(*args, **kwargs)
+            finally:
+                with _lock:
+                    _depth -= 1
+        return wrapper
+    return decorator
+
+
+def record(name, stage, start, end):
+    '''
+    Records a finished span
+    :param name: the name of the span (str)
+    :param stage: the stage the time is counted towards (str)
+    :param start: the perf_counter_ns time the span started (int)
+    :param end: the perf_counter_ns time the span ended (int)
+    :returns: None
+    '''
+    # store the span for trace exports
+    _events.append((name, stage, start, end, threading.get_ident()))
+
+    # actions are made of the other stages, so they are not counted towards the breakdowns
+    if stage == 'action':
+        return
+
+    milliseconds = (end - start) / 1e6
+    with _lock:
+        # add the span to its stage's histogram
+        counts = _histograms.setdefault(stage, [0] * (len(BUCKETS_MS) + 1))
+        counts[bisect_left(BUCKETS_MS, milliseconds)] += 1
+
+        # add the time to the last action's breakdown
+        _last_action['stages'][stage] = _last_action['stages'].get(stage, 0) + milliseconds
+
+
+def last_action():
+    '''
+    Gets the time spent in each stage during the last user action
+    :returns: tuple of the action name (str or None) and a dictionary of stage to milliseconds
+    '''
+    with _lock:
+        return _last_action['name'], dict(_last_action['stages'])
+
+
+def histograms():
+    '''
+    Gets the duration histogram of each stage
+    :returns: dictionary of stage to a dictionary of bucket label to span count
+    '''
+    labels = [f'<={bound}ms' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}ms']
+    with _lock:
+        return {stage: dict(zip(labels, counts)) for stage, counts in _histograms.items()}
+
+
+def chrome_trace():
+    '''
+    Builds the recorded spans in the chrome trace event format, which can be opened in chrome://tracing or perfetto
+    :returns: dictionary in the trace event format
+    '''
+    return {'traceEvents': [
+        {'name': name, 'cat': stage, 'ph': 'X', 'ts': (start - _origin) / 1000, 'dur': (end - start) / 1000,
+         'pid': os.getpid(), 'tid': thread}
+        for name, stage, start, end, thread in list(_events)
+    ], 'displayTimeUnit': 'ms'}
+
+
+def export(path='pokedex_trace.json'):
+    '''
+    Saves the recorded spans as a chrome trace and the stage histograms
+    :param path: the file to save the trace to, the histograms are saved beside it (str)
+    :returns: None
+    '''
+    with open(path, 'w') as file:
+        json.dump(chrome_trace(), file)
+    with open(os.path.splitext(path)[0]+'_histograms.json', 'w') as file:
+        json.dump(histograms(), file, indent=2)
+
+
+def enable():
+    '''
+    Starts recording spans
+    :returns: None
+    '''
+    global enabled
+    enabled = True
+
+
+def disable():
+    '''
+    Stops recording spans
+    :returns: None
+    '''
+    global enabled
+    enabled = False
+
+
+def reset():
+    '''
+    Deletes every recorded span and histogram
+    :returns: None
+    '''
+    with _lock:
+        _events.clear()
+        _histograms.clear()
+        _last_action['name'] = None
+        _last_action['stages'] = {}
+
+
+# save the recorded spans when the application closes if a file was given in the POKEDEX_TRACE_FILE environment variable
+if os.environ.get('POKEDEX_TRACE_FILE'):
+    atexit.register(lambda: export(os.environ['POKEDEX_TRACE_FILE']))
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from stats import load_stats, TYPE_NAMES
+from userstore import UserStore, PARTY_COLUMNS
+
+# the attacking types each type is super effective against, not very effective against and has no effect on
+_MATCHUPS = {
+    'normal': ([], ['rock', 'steel'], ['ghost']),
+    'fighting': (['normal', 'rock', 'steel', 'ice', 'dark'], ['flying', 'poison', 'bug', 'psychic', 'fairy'], ['ghost']),
+    'flying': (['fighting', 'bug', 'grass'], ['rock', 'steel', 'electric'], []),
+    'poison': (['grass', 'fairy'], ['poison', 'ground', 'rock', 'ghost'], ['steel']),
+    'ground': (['poison', 'rock', 'steel', 'fire', 'electric'], ['bug', 'grass'], ['flying']),
+    'rock': (['flying', 'bug', 'fire', 'ice'], ['fighting', 'ground', 'steel'], []),
+    'bug': (['grass', 'psychic', 'dark'], ['fighting', 'flying', 'poison', 'ghost', 'steel', 'fire', 'fairy'], []),
+    'ghost': (['ghost', 'psychic'], ['dark'], ['normal']),
+    'steel': (['rock', 'ice', 'fairy'], ['steel', 'fire', 'water', 'electric'], []),
+    'fire': (['bug', 'steel', 'grass', 'ice'], ['rock', 'fire', 'water', 'dragon'], []),
+    'water': (['ground', 'rock', 'fire'], ['water', 'grass', 'dragon'], []),
+    'grass': (['ground', 'rock', 'water'], ['flying', 'poison', 'bug', 'steel', 'fire', 'grass', 'dragon'], []),
+    'electric': (['flying', 'water'], ['grass', 'electric', 'dragon'], ['ground']),
+    'psychic': (['fighting', 'poison'], ['steel', 'psychic'], ['dark']),
+    'ice': (['flying', 'ground', 'grass', 'dragon'], ['steel', 'fire', 'water', 'ice'], []),
+    'dragon': (['dragon'], ['steel'], ['fairy']),
+    'dark': (['ghost', 'psychic'], ['fighting', 'dark', 'fairy'], []),
+    'fairy': (['fighting', 'dragon', 'dark'], ['poison', 'steel', 'fire'], [])
+}
+
+
+def type_chart():
+    '''
+    Builds the 18x18 type effectiveness matrix
+    :returns: numpy array where [attacking type, defending type] is the damage multiplier
+    '''
+    # start with every matchup dealing normal damage
+    chart = np.ones((len(TYPE_NAMES), len(TYPE_NAMES)), dtype=np.float32)
+
+    # for each attacking type, set its super effective, not very effective and no effect matchups
+    for attacker, (double, half, immune) in _MATCHUPS.items():
+        for multiplier, defenders in [(2, double), (0.5, half), (0, immune)]:
+            chart[TYPE_NAMES.index(attacker), [TYPE_NAMES.index(defender) for defender in defenders]] = multiplier
+
+    return chart
+
+
+# stores the type effectiveness matrix
+TYPE_CHART = type_chart()
+
+
+def species_matchups(types):
+    '''
+    Precomputes the offensive and defensive matchups of each pokemon from its types
+    :param types: numpy array of each pokemon's two TYPE_NAMES indexes, -1 for no type
+    :returns: tuple of two numpy arrays with one row per pokemon and one column per type,
+    the first is whether the pokemon has a type that is super effective against that type,
+    the second is the damage multiplier the pokemon takes from that type
+    '''
+    # add an extra row and column for a missing type, which attacks nothing and takes normal damage
+    offense_chart = np.vstack([TYPE_CHART, np.zeros(len(TYPE_NAMES), dtype=np.float32)])
+    defense_chart = np.hstack([TYPE_CHART, np.ones((len(TYPE_NAMES), 1), dtype=np.float32)])
+
+    # move the missing type index from -1 to the extra row and column
+    types = np.where(types < 0, len(TYPE_NAMES), types)
+
+    # a pokemon is super effective against a type if either of its types is
+    offense = (offense_chart[types] >= 2).any(axis=1)
+
+    # the damage a pokemon takes is the product of the multipliers against both of its types
+    defense = (defense_chart[:, types[:, 0]] * defense_chart[:, types[:, 1]]).T
+
+    return offense, defense
+
+
+class CoverageAnalyzer:
+    '''class for measuring the type coverage of parties'''
+    def __init__(self, table):
+        '''
+        initialises the coverage analyzer
+        :param self: instance of the coverage analyzer
+        :param table: the stat table holding the types of every pokemon (StatTable)
+        '''
+        # stores a lookup from pokemon name, and species name for species whose default form is named differently,
+        # to stat table row, parties save species names so "giratina" has to find "giratina-altered"
+        species = table.species_rows()
+        self.rows = pd.Index([*table.names.tolist(), *species])
+        self.positions = np.concatenate([np.arange(len(table.names)), np.fromiter(species.values(), dtype=np.intp, count=len(species))])
+
+        # precompute the matchups of every pokemon, with an extra last row for empty or unknown party slots
+        offense, defense = species_matchups(table.types)
+        self.offense = np.vstack([offense, np.zeros(len(TYPE_NAMES), dtype=bool)])
+        self.defense = np.vstack([defense, np.ones(len(TYPE_NAMES), dtype=np.float32)])
+
+    def party_rows(self, names):
+        '''
+        Gets the row of each party member from their names
+        :param self: instance of the coverage analyzer
+        :param names: 2D array of party member names, one row per party
+        :returns: numpy array of the same shape holding row indexes, empty or unknown slots point at the extra last row
+        '''
+        # look up every name at once, unknown names come back as -1
+        found = self.rows.get_indexer(np.asarray(names, dtype=object).ravel()).reshape(np.shape(names))
+
+        # point unknown names at the extra row of empty matchups
+        return np.where(found < 0, len(self.offense) - 1, self.positions[found])
+
+    def analyze(self, names):
+        '''
+        Measures the type coverage of many parties at once
+        :param self: instance of the coverage analyzer
+        :param names: 2D array of party member names, one row per party and one column per slot
+        :returns: dictionary of numpy arrays with one row per party:
+        "super_effective" - whether the party can hit each type super effectively (parties x 18),
+        "resisted" - the number of members resisting or immune to each attacking type (parties x 18),
+        "weak" - the number of members weak to each attacking type (parties x 18)
+        '''
+        # get the row of each party member
+        rows = self.party_rows(names)
+
+        # the party hits a type super effectively if any member does
+        super_effective = self.offense[rows].any(axis=1)
+
+        # get the damage each member takes from each type
+        defense = self.defense[rows]
+
+        return {
+            'super_effective': super_effective,
+            'resisted': (defense < 1).sum(axis=1),
+            'weak': (defense > 1).sum(axis=1)
+        }
+
+    def party_summary(self, party):
+        '''
+        Summarises the type coverage of a single party
+        :param self: instance of the coverage analyzer
+        :param party: list of party member names, "None" for empty slots
+        :returns: dictionary containing lists of type names:
+        "super_effective" - types the party hits super effectively,
+        "not_covered" - types the party cannot hit super effectively,
+        "weak" - attacking types more members are weak to than resist
+        '''
+        # analyze the party as a batch of one
+        result = self.analyze([party])
+
+        # find the types matching each condition
+        super_effective = result['super_effective'][0]
+        weak = result['weak'][0] > result['resisted'][0]
+
+        return {
+            'super_effective': [TYPE_NAMES[index] for index in np.flatnonzero(super_effective)],
+            'not_covered': [TYPE_NAMES[index] for index in np.flatnonzero(~super_effective)],
+            'weak': [TYPE_NAMES[index] for index in np.flatnonzero(weak)]
+        }
+
+    def score_users(self, df, chunk_size=100000):
+        '''
+        Scores the party of every user in a dataframe
+        :param self: instance of the coverage analyzer
+        :param df: pandas dataframe of user data
+        :param chunk_size: the number of users analyzed at once, limiting memory use (int)
+        :returns: pandas dataframe with the same index as df and the columns
+        "offense" (types hit super effectively), "resisted" (attacking types resisted by at least one member)
+        and "weak" (attacking types more members are weak to than resist)
+        '''
+        # stores the scores of each chunk
+        chunks = []
+
+        # for each chunk of users
+        for start in range(0, len(df), chunk_size):
+            # analyze every party in the chunk at once
+            result = self.analyze(df[PARTY_COLUMNS].iloc[start:start+chunk_size].to_numpy())
+
+            # count the matching types of each party
+            chunks.append(np.column_stack([
+                result['super_effective'].sum(axis=1),
+                (result['resisted'] > 0).sum(axis=1),
+                (result['weak'] > result['resisted']).sum(axis=1)
+            ]))
+
+        # join the chunks into one dataframe
+        scores = np.vstack(chunks) if chunks else np.zeros((0, 3), dtype=int)
+        return pd.DataFrame(scores, index=df.index, columns=['offense', 'resisted', 'weak'])
+
+
+if __name__ == "__main__":
+    # retrieve user data from the csv and its journal
+    user_data = UserStore('UserData.csv').user_data
+
+    # score every user's party and report the spread of the scores
+    print(CoverageAnalyzer(load_stats()).score_users(user_data).describe())
@@ -0,0 +1,394 @@
+import contextlib
+import json
+import os
+import threading
+import uuid
+
+import pandas as pd
+
+from tracing import span
+
+try:
+    import fcntl
+except ImportError:
+    # windows has no advisory file locks, so compaction there must only be run while no other copy is making changes
+    fcntl = None
+
+# the columns of the user data holding each party member
+PARTY_COLUMNS = ['Pokemon'+str(counter) for counter in range(1,7)]
+
+# the columns of the user data csv
+COLUMNS = ['username', 'password', *PARTY_COLUMNS]
+
+# the number of times a change that lost to another writer is tried again
+RETRIES = 10
+
+# the milliseconds between checks for changes made by other copies of the application
+REFRESH_INTERVAL = 1000
+
+# the bytes the journal grows to before a change compacts it, it also has to be larger than the csv
+# so the cost of rewriting the csv is spread over at least as many bytes of changes
+COMPACT_SIZE = 1 << 20
+
+
+class ConflictError(Exception):
+    '''class for a change that kept losing to other writers'''
+
+
+def read_users(path='UserData.csv'):
+    '''
+    Loads the user data csv, keeping every value as text so usernames such as "NA" are not read as missing
+    :param path: the user data csv (str)
+    :returns: pandas dataframe of user data, with empty party slots as "None"
+    '''
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.read_csv(path, index_col=False, dtype=str, keep_default_na=False).replace('', 'None')
+
+
+class UserStore:
+    '''class for user data shared safely between several copies of the application, each change is appended to a journal
+    beside the csv with the version of the row it was based on, and every copy replays the journal in the same order
+    so they all agree on which of two changes to the same row came first, the later one is tried again'''
+    def __init__(self, path='UserData.csv', user_data=None):
+        '''
+        initialises the store, loading the csv and every change journalled since it was written
+        :param self: instance of the store
+        :param path: the user data csv, the journal and lock file are kept beside it with .journal and .lock extensions (str)
+        :param user_data: optional pandas dataframe to start from instead of the csv
+        '''
+        # stores the files the data is kept in
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + '.journal'
+        self.lock_path = os.path.splitext(path)[0] + '.lock'
+
+        # guards the user data, row index and versions, only held while changes are applied
+        self.lock = threading.RLock()
+
+        # stores a lock for each user, so changes to different users never wait on each other
+        self.user_locks = {}
+        self.user_locks_lock = threading.Lock()
+
+        # stores the outcome of each change journalled here, whichever thread replays it first
+        self.outcomes = {}
+
+        # stores the thread holding the exclusive lock of the files, None when no thread here holds it
+        self.exclusive_owner = None
+
+        # stores the journal file being read, kept open so the end of it can still be read once compaction swaps it out
+        self.journal_file = None
+
+        # read the csv and open the journal together, holding off compaction so the two always match
+        with self.file_lock():
+            self.load(read_users(path) if user_data is None else user_data)
+            self.catch_up()
+
+    def load(self, user_data):
+        '''
+        Starts again from a full copy of the user data, with every row at version 0
+        :param self: instance of the store
+        :param user_data: pandas dataframe of user data
+        :returns: None
+        '''
+        with self.lock:
+            # keep the row labels of users already loaded, since the application remembers the row of the logged in user
+            if getattr(self, 'index', None):
+                labels = [self.index.get(username) for username in user_data['username']]
+                fresh = iter(range(self.next_label, self.next_label + labels.count(None)))
+                user_data = user_data.set_axis([next(fresh) if label is None else label for label in labels])
+
+            # stores the user data
+            self.user_data = user_data
+
+            # stores the row of each username, and the version of each row that has changed since the csv was written
+            self.index = dict(zip(user_data['username'], user_data.index))
+            self.versions = {}
+
+            # stores the label given to the next new row
+            self.next_label = max(int(user_data.index.max()) + 1 if len(user_data) else 0, getattr(self, 'next_label', 0))
+
+            # stores the journal file applied so far and how much of it has been read
+            if getattr(self, 'journal_file', None) is not None:
+                self.journal_file.close()
+            self.journal_file = None
+            self.inode = None
+            self.offset = 0
+
+    def user_lock(self, username):
+        '''
+        Gets the lock of a user, creating it the first time
+        :param self: instance of the store
+        :param username: the user (str)
+        :returns: threading lock
+        '''
+        with self.user_locks_lock:
+            return self.user_locks.setdefault(username, threading.Lock())
+
+    @contextlib.contextmanager
+    def file_lock(self, exclusive=False, wait=True):
+        '''
+        Holds the lock every copy of the application shares, writers hold it shared while journalling a change and
+        compaction holds it exclusively, so no change is journalled between compaction's catch up and its swap of the journal
+        :param self: instance of the store
+        :param exclusive: whether to wait for every other holder to let go (bool)
+        :param wait: whether to wait for the lock, otherwise BlockingIOError is raised if it is held (bool)
+        :returns: context manager
+        '''
+        # the thread holding the exclusive lock already keeps every other writer out
+        if fcntl is None or self.exclusive_owner == threading.get_ident():
+            yield
+            return
+
+        # each holder opens its own file, since threads sharing one would let go of each other's lock
+        file = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(file, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if wait else fcntl.LOCK_NB))
+            yield
+        finally:
+            # closing the file lets go of the lock
+            os.close(file)
+
+    @contextlib.contextmanager
+    def exclusive(self, wait=True):
+        '''
+        Keeps every other writer out and catches up, so a batch of changes made to the user data inside it can be compacted
+        without losing changes, used as "with store.exclusive():"
+        :param self: instance of the store
+        :param wait: whether to wait for other writers, otherwise BlockingIOError is raised if any are writing (bool)
+        :returns: context manager
+        '''
+        with self.file_lock(True, wait):
+            owner, self.exclusive_owner = self.exclusive_owner, threading.get_ident()
+            try:
+                self.catch_up()
+                yield
+            finally:
+                self.exclusive_owner = owner
+
+    def row(self, username):
+        '''
+        Finds the row of a user
+        :param self: instance of the store
+        :param username: the user (str)
+        :returns: the row label, or None if the user does not exist
+        '''
+        return self.index.get(username)
+
+    def catch_up(self):
+        '''
+        Applies every change other writers have journalled since the last catch up, only reading the end of the journal
+        added since then, so it costs nothing when there are no changes and time proportional to the changes otherwise
+        :param self: instance of the store
+        :returns: dictionary of the ID of each change read to whether it was applied
+        '''
+        with self.lock:
+            try:
+                stat = os.stat(self.journal_path)
+                inode, size = stat.st_ino, stat.st_size
+            except FileNotFoundError:
+                inode, size = None, 0
+            if inode == self.inode and size <= self.offset:
+                return {}
+
+            applied = {}
+            if inode != self.inode:
+                # the journal was compacted into the csv and a new one swapped in, so finish reading the old one first,
+                # which finds the outcome of every change journalled before compaction, then start again from the csv
+                if self.journal_file is not None:
+                    applied = self.read_journal()
+                    self.load(read_users(self.path))
+
+                # open the journal now in place, taking the inode from the open file in case it was swapped again
+                try:
+                    self.journal_file = open(self.journal_path, 'rb')
+                    self.inode = os.fstat(self.journal_file.fileno()).st_ino
+                except FileNotFoundError:
+                    self.inode = None
+
+            if self.journal_file is not None:
+                applied.update(self.read_journal())
+            return applied
+
+    def read_journal(self):
+        '''
+        Applies the changes journalled after the offset read so far, leaving any line still being written for next time
+        :param self: instance of the store
+        :returns: dictionary of the ID of each change read to whether it was applied
+        '''
+        with self.lock:
+            self.journal_file.seek(self.offset)
+            data = self.journal_file.read()
+            end = data.rfind(b'\n') + 1
+            self.offset += end
+            return self.apply([json.loads(line) for line in data[:end].splitlines()])
+
+    def apply(self, entries):
+        '''
+        Applies journalled changes in order, skipping any based on an older version of its row,
+        changed, new and deleted rows are gathered so the dataframe is only written to once for each
+        :param self: instance of the store
+        :param entries: list of journal entries (dict)
+        :returns: dictionary of the ID of each entry to whether it was applied
+        '''
+        applied = {}
+        added = {}
+        updated = {}
+        deleted = []
+
+        for entry in entries:
+            user, label = entry['user'], self.index.get(entry['user'])
+            values = entry['values']
+
+            # a change only applies to the version of the row it was based on, and a new user only if the name is free
+            if entry['op'] == 'add':
+                ok = label is None
+            else:
+                ok = label is not None and entry['base'] == self.versions.get(user, 0)
+                if ok and values.get('username', user) != user:
+                    ok = values['username'] not in self.index
+            applied[entry['id']] = ok
+            if entry['id'] in self.outcomes:
+                self.outcomes[entry['id']] = ok
+            if not ok:
+                continue
+
+            match entry['op']:
+                case 'add':
+                    label, self.next_label = self.next_label, self.next_label + 1
+                    added[label] = {**dict.fromkeys(COLUMNS, 'None'), 'username': user, **values}
+                    self.index[user] = label
+                    self.versions[user] = 1
+                case 'update':
+                    if label in added:
+                        added[label].update(values)
+                    else:
+                        updated.setdefault(label, {}).update(values)
+
+                    # follow the row to its new name when renamed
+                    version = self.versions.pop(user, 0) + 1
+                    user = values.get('username', user)
+                    self.index[user] = self.index.pop(entry['user'])
+                    self.versions[user] = version
+                case 'delete':
+                    updated.pop(label, None)
+                    if added.pop(label, None) is None:
+                        deleted.append(label)
+                    del self.index[user]
+                    self.versions.pop(user, None)
+
+        # write each changed column once, then rebuild the dataframe once for every row added and deleted
+        for column in {column for values in updated.values() for column in values}:
+            labels = [label for label, values in updated.items() if column in values]
+            self.user_data.loc[labels, column] = [updated[label][column] for label in labels]
+        if deleted:
+            self.user_data = self.user_data.drop(deleted)
+        if added:
+            new_rows = pd.DataFrame(list(added.values()), index=list(added), columns=self.user_data.columns)
+            self.user_data = pd.concat([self.user_data, new_rows])
+        return applied
+
+    def append(self, entry):
+        '''
+        Adds a change to the end of the journal, appends of a single line are never interleaved with other writers
+        :param self: instance of the store
+        :param entry: the journal entry (dict)
+        :returns: None
+        '''
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+
+        # timed as the "save_data" stage when tracing, which is all the saving a change does
+        with span('save_data', 'journal append'):
+            file = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(file, line)
+            finally:
+                os.close(file)
+
+    def commit(self, op, username, values=None):
+        '''
+        Journals a change to a user, trying again with the latest version of the row whenever another writer changed it first
+        :param self: instance of the store
+        :param op: "add", "update" or "delete" (str)
+        :param username: the user to change (str)
+        :param values: dictionary of column to new value, a new "username" renames the user
+        :returns: True if the change was made, False if the user does not exist, or already exists when adding (bool)
+        '''
+        values = values or {}
+        with self.user_lock(username):
+            for _ in range(RETRIES):
+                # hold off compaction until the change is journalled, so it is never based on a journal that was swapped out
+                with self.file_lock():
+                    # see every change made so far, then base this change on the latest version of the row
+                    self.catch_up()
+                    with self.lock:
+                        exists = username in self.index
+                        taken = values.get('username', username) != username and values['username'] in self.index
+                        base = self.versions.get(username, 0)
+                    if exists == (op == 'add') or taken:
+                        return False
+
+                    # journal the change
+                    entry = {'id': uuid.uuid4().hex, 'op': op, 'user': username, 'base': base, 'values': values}
+                    with self.lock:
+                        self.outcomes[entry['id']] = None
+                    self.append(entry)
+
+                # then replay the journal up to it to find out if another change to the row came first
+                self.catch_up()
+                with self.lock:
+                    applied = self.outcomes.pop(entry['id'])
+                if applied:
+                    self.compact_if_large()
+                    return True
+        raise ConflictError(f'could not change {username}, other writers kept changing it first')
+
+    def compact(self, user_data=None):
+        '''
+        Writes the user data to the csv and empties the journal, holding the exclusive lock so no change is lost,
+        a batch of changes must be made inside exclusive() to the user data read inside it, otherwise the changes
+        other copies made before the batch was saved are lost
+        :param self: instance of the store
+        :param user_data: optional pandas dataframe to save in place of the current user data
+        :returns: None
+        '''
+        with self.exclusive(), self.lock:
+            if user_data is not None:
+                self.load(user_data)
+
+            # write the csv beside the old one and swap it in, so a reader never sees half a file
+            user_data = self.user_data
+            user_data.to_csv(self.path + '.tmp', encoding='utf-8', index=False)
+            os.replace(self.path + '.tmp', self.path)
+
+            # then swap in an empty journal, which tells the other copies to reload the csv
+            open(self.journal_path + '.tmp', 'w').close()
+            os.replace(self.journal_path + '.tmp', self.journal_path)
+
+            # every row starts again at version 0 from the new csv
+            self.load(user_data)
+            self.journal_file = open(self.journal_path, 'rb')
+            self.inode = os.fstat(self.journal_file.fileno()).st_ino
+
+    def compact_if_large(self):
+        '''
+        Compacts the journal once it is larger than COMPACT_SIZE and the csv, so it never grows without limit,
+        this is skipped while another copy is writing and tried again after the next change, and on windows,
+        which has no lock to keep the other copies out
+        :param self: instance of the store
+        :returns: whether the journal was compacted (bool)
+        '''
+        try:
+            csv_size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            csv_size = 0
+        if fcntl is None or self.offset < max(COMPACT_SIZE, csv_size):
+            return False
+        try:
+            with self.exclusive(wait=False):
+                # another copy may have compacted it first, which the catch up found
+                if self.offset < COMPACT_SIZE:
+                    return False
+                self.compact()
+                return True
+        except BlockingIOError:
+            return False